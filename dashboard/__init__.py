@@ -0,0 +1 @@
+"""Data access and statistics helpers shared by the dashboard pages."""
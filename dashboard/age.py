@@ -0,0 +1,51 @@
+"""Age of the people at a given date.
+
+Subtracting the years of the dates is off by one for everyone whose birthday
+has not happened yet that year. :func:`age_at` compares the month and the day
+too, over whole arrays at once, and ``queries.sql_function(dialect, "age", ...)``
+is the same computation done by the database.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _year_month_day(dates: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    years = dates.astype("datetime64[Y]")
+    months = dates.astype("datetime64[M]")
+    return (
+        years.astype(np.int64),
+        (months - years).astype(np.int64),
+        (dates - months).astype(np.int64),
+    )
+
+
+def age_at(date_of_birth, reference_date) -> pd.Series:
+    """Age in whole years of each person at the reference date
+
+    A person born on February 29 turns one year older on March 1 of the years
+    that are not leap years, as ``TIMESTAMPDIFF(YEAR, ...)`` does in MySQL.
+
+    :param date_of_birth: The dates of birth, anything ``pd.to_datetime`` accepts
+    :param reference_date: The date to compute the age at, either one date for
+        everyone or one date per person
+    :return: The ages, ``<NA>`` where any of the dates is missing
+    :rtype: pd.Series"""
+
+    birth = pd.to_datetime(pd.Series(date_of_birth)).to_numpy("datetime64[D]")
+    reference = pd.to_datetime(reference_date)
+    if isinstance(reference, pd.Timestamp):
+        reference = np.full(len(birth), reference.to_datetime64(), dtype="datetime64[D]")
+    else:
+        reference = pd.Series(reference).to_numpy("datetime64[D]")
+
+    birth_year, birth_month, birth_day = _year_month_day(birth)
+    year, month, day = _year_month_day(reference)
+
+    before_birthday = (month < birth_month) | ((month == birth_month) & (day < birth_day))
+    ages = year - birth_year - before_birthday
+
+    missing = np.isnat(birth) | np.isnat(reference)
+    return pd.Series(
+        pd.arrays.IntegerArray(np.where(missing, 0, ages).astype(np.int16), missing),
+        index=date_of_birth.index if isinstance(date_of_birth, pd.Series) else None,
+    )
@@ -0,0 +1,540 @@
+"""Statistics of an event date as pure functions, without Streamlit or a database.
+
+The pages get the counts of an event date from a cube: the registrations
+counted by attendance, gender, age, reaction and hour of arrival, from the
+grouped query of :mod:`dashboard.stats` or from the registrations loaded by
+:mod:`dashboard.dataset`. The counts of every chart are slices of the cube
+(:func:`cube_counts`), filtered by the values selected in the other charts.
+This module turns those counts into the
+numbers the pages show: the attendance split, the shares of every gender and
+reaction, the summary and the boxplot of the ages and the busiest and mean
+hour of arrival. Every function returns plain numbers in a ``NamedTuple``, so
+the pages only render them, and the same reports can be computed for every
+event date from the raw registrations in a process pool::
+
+    python -m dashboard.analysis --jobs 4 --output reports.jsonl
+
+The registrations are the rows of ``queries.REGISTRATIONS`` converted by
+:func:`typed`: the enums are categoricals, the ids and the ages the smallest
+integers that fit them and the dates and times are parsed once.
+"""
+import argparse
+import json
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, floor
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Engine, create_engine, text
+
+from dashboard import cli, queries, rollup
+from dashboard.age import age_at
+
+GENDERS = ("MALE", "FEMALE", "OTHER")
+REACTIONS = ("LIKE", "DISLIKE", "NO_REACTION")
+
+
+class EventCounts(NamedTuple):
+    """The counts of an event date every statistic is computed from"""
+
+    registered: int
+    attended: int
+    # Attendees by gender, indexed by the ``gender`` enum value
+    genders: pd.Series
+    # Registrations by reaction, indexed by the ``reaction`` enum value
+    reactions: pd.Series
+    # Attendees by age at the date of the event, sorted by age
+    ages: pd.Series
+    # Attendees by hour of arrival, sorted by hour
+    arrival_hours: pd.Series
+
+
+class AttendanceSplit(NamedTuple):
+    """The people who attended and who did not"""
+
+    registered: int
+    attended: int
+    absent: int
+    # Percentage of the registered people who attended, None without registrations
+    rate: float | None
+
+
+class CategoryCounts(NamedTuple):
+    """The count and the percentage of every value of a category, in a fixed order"""
+
+    categories: tuple[str, ...]
+    counts: tuple[int, ...]
+    percentages: tuple[float, ...]
+    total: int
+
+    def count(self, category: str) -> int:
+        return self.counts[self.categories.index(category)]
+
+
+class AgeSummary(NamedTuple):
+    """Summary of the ages of the attendees, used by the metrics and the boxplot"""
+
+    mean: float
+    median: float
+    min: int
+    max: int
+    q1: float
+    q3: float
+
+
+class Boxplot(NamedTuple):
+    """The box and the whiskers of a boxplot"""
+
+    q1: float
+    median: float
+    q3: float
+    lower: float
+    upper: float
+
+
+class ArrivalSummary(NamedTuple):
+    """When the attendees arrived, ``None`` if nobody arrived yet"""
+
+    mean_hour: float | None
+    busiest_hour: int | None
+
+
+class ReturningPeople(NamedTuple):
+    """The people of an event who registered to or attended previous events"""
+
+    registered: int
+    returning: int
+    new: int
+    attendees: int
+    returning_attendees: int
+
+
+class EventReport(NamedTuple):
+    """Every statistic of an event date shown by the specific event page"""
+
+    attendance: AttendanceSplit
+    genders: CategoryCounts
+    reactions: CategoryCounts
+    ages: AgeSummary
+    age_boxplot: Boxplot
+    arrival: ArrivalSummary
+
+
+# region Registrations
+################################################################################
+# The counts of an event date from its registrations
+################################################################################
+
+def typed(frame: pd.DataFrame, day_date) -> pd.DataFrame:
+    """Convert the rows returned by ``queries.REGISTRATIONS`` to compact types
+
+    The same types are used for every load and every refresh, so the frames
+    can be concatenated without losing the categoricals.
+
+    :param frame: The rows as returned by the driver
+    :type frame: pd.DataFrame
+    :param day_date: The date of the event, the ages are computed at this date
+    :return: The registrations, with the age instead of the date of birth
+    :rtype: pd.DataFrame"""
+
+    return pd.DataFrame({
+        "registration_id": pd.to_numeric(frame["registration_id"], downcast="unsigned"),
+        "companion_id": pd.to_numeric(frame["companion_id"], downcast="unsigned"),
+        "registration_created_at": pd.to_datetime(frame["registration_created_at"]),
+        "reaction": pd.Categorical(frame["reaction"], categories=REACTIONS),
+        "reaction_date": pd.to_datetime(frame["reaction_date"]),
+        "gender": pd.Categorical(frame["gender"], categories=GENDERS),
+        "age": age_at(frame["date_of_birth"], day_date),
+        # MySQL returns TIME columns as timedeltas and SQLite as strings
+        "arrival_time": pd.to_timedelta(frame["arrival_time"].astype("string")),
+        "day_date": pd.to_datetime(frame["day_date"]),
+    })
+
+
+def event_counts(registrations: pd.DataFrame) -> EventCounts:
+    """The counts of an event date from its registrations, the same the
+    grouped query of :mod:`dashboard.stats` returns
+
+    :param registrations: The registrations of the date, as returned by :func:`typed`
+    :type registrations: pd.DataFrame
+    :return: The counts
+    :rtype: EventCounts"""
+
+    return cube_counts(cube(registrations))
+
+# endregion
+
+
+# region Cube
+################################################################################
+# The attendees of an event date counted by every dimension at once, and the
+# counts of every chart as slices of it
+################################################################################
+
+# The dimensions of the cube, every combination of values is one row with its ``total``
+CUBE_DIMENSIONS = ("attended", "gender", "age", "reaction", "hour")
+
+
+class CubeFilter(NamedTuple):
+    """The values of the dimensions to keep, an empty selection keeps every value"""
+
+    genders: tuple[str, ...] = ()
+    # Names of ``rollup.AGE_BANDS``
+    age_bands: tuple[str, ...] = ()
+    reactions: tuple[str, ...] = ()
+    # The first and the last hour of arrival, both included. It leaves out
+    # the people who did not attend.
+    hours: tuple[int, int] | None = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self.genders or self.age_bands or self.reactions or self.hours is not None)
+
+
+NO_FILTER = CubeFilter()
+
+
+def typed_cube(frame: pd.DataFrame) -> pd.DataFrame:
+    """Convert the rows of ``queries.attendee_cube`` to the types of :func:`cube`
+
+    :param frame: The rows as returned by the driver
+    :type frame: pd.DataFrame
+    :return: The cube
+    :rtype: pd.DataFrame"""
+
+    return pd.DataFrame({
+        "attended": frame["attended"].astype(bool),
+        "gender": pd.Categorical(frame["gender"], categories=GENDERS),
+        "age": pd.to_numeric(frame["age"]).astype("Int16"),
+        "reaction": pd.Categorical(frame["reaction"], categories=REACTIONS),
+        "hour": pd.to_numeric(frame["hour"]).astype("Int8"),
+        "total": frame["total"].astype(np.int64),
+    })
+
+
+def cube(registrations: pd.DataFrame) -> pd.DataFrame:
+    """The registrations counted by every combination of ``CUBE_DIMENSIONS``,
+    the same rows ``queries.attendee_cube`` returns
+
+    :param registrations: The registrations of the date, as returned by :func:`typed`
+    :type registrations: pd.DataFrame
+    :return: One row per combination with its ``total``, the ages and the
+        hours are ``<NA>`` for the people without date of birth or arrival
+    :rtype: pd.DataFrame"""
+
+    arrival = registrations["arrival_time"]
+    dimensions = pd.DataFrame({
+        "attended": arrival.notna(),
+        "gender": registrations["gender"],
+        "age": registrations["age"].astype("Int16"),
+        "reaction": registrations["reaction"],
+        "hour": arrival.dt.components.hours.astype("Int8").where(arrival.notna()),
+    })
+    counted = dimensions.groupby(list(CUBE_DIMENSIONS), dropna=False, observed=True).size()
+    return typed_cube(counted.rename("total").reset_index())
+
+
+def _kept(cube: pd.DataFrame, filters: CubeFilter, dimension: str | None = None) -> pd.Series:
+    """The rows of the cube kept by every filter but the one of ``dimension``"""
+
+    kept = pd.Series(True, index=cube.index)
+    if filters.genders and dimension != "gender":
+        kept &= cube["gender"].isin(filters.genders)
+    if filters.reactions and dimension != "reaction":
+        kept &= cube["reaction"].isin(filters.reactions)
+    if filters.age_bands and dimension != "age":
+        in_bands = pd.Series(False, index=cube.index)
+        for name, lowest, highest in rollup.AGE_BANDS:
+            if name in filters.age_bands:
+                in_bands |= cube["age"].between(
+                    -1 if lowest is None else lowest, 999 if highest is None else highest
+                ).fillna(False)
+        kept &= in_bands
+    if filters.hours is not None and dimension != "hour":
+        kept &= cube["hour"].between(*filters.hours).fillna(False)
+    return kept
+
+
+def _dimension_counts(rows: pd.DataFrame, dimension: str) -> pd.Series:
+    counts = rows.dropna(subset=[dimension]).groupby(dimension, observed=True)["total"].sum()
+    return counts[counts > 0].sort_index().rename("total")
+
+
+def cube_counts(cube: pd.DataFrame, filters: CubeFilter = NO_FILTER) -> EventCounts:
+    """The counts of every chart as slices of the cube.
+
+    Every chart is filtered by the selections of the other dimensions but not
+    by its own, so it still shows the values that can be selected.
+
+    :param cube: The cube of the date, as returned by :func:`cube` or :func:`typed_cube`
+    :type cube: pd.DataFrame
+    :param filters: The selected values of every dimension
+    :type filters: CubeFilter
+    :return: The counts
+    :rtype: EventCounts"""
+
+    attended = cube["attended"]
+    every_filter = _kept(cube, filters)
+    ages = _dimension_counts(cube[_kept(cube, filters, "age") & attended], "age")
+    hours = _dimension_counts(cube[_kept(cube, filters, "hour") & attended], "hour")
+    ages.index = ages.index.astype(int)
+    hours.index = hours.index.astype(int)
+
+    return EventCounts(
+        registered=int(cube.loc[every_filter, "total"].sum()),
+        attended=int(cube.loc[every_filter & attended, "total"].sum()),
+        genders=_dimension_counts(cube[_kept(cube, filters, "gender") & attended], "gender"),
+        reactions=_dimension_counts(cube[_kept(cube, filters, "reaction")], "reaction"),
+        ages=ages,
+        arrival_hours=hours,
+    )
+
+# endregion
+
+
+# region Statistics
+################################################################################
+# The numbers shown by the pages, from the counts
+################################################################################
+
+def attendance_split(registered: int, attended: int) -> AttendanceSplit:
+    """The people who attended and who did not, and the attendance rate
+
+    :param registered: The people registered
+    :type registered: int
+    :param attended: The people who attended
+    :type attended: int
+    :return: The split
+    :rtype: AttendanceSplit"""
+
+    return AttendanceSplit(
+        registered=registered,
+        attended=attended,
+        absent=registered - attended,
+        rate=attended / registered * 100 if registered else None,
+    )
+
+
+def category_counts(counts: pd.Series, categories: tuple[str, ...]) -> CategoryCounts:
+    """The count and the percentage of every category, 0 for the missing ones
+
+    :param counts: The counts, indexed by category
+    :type counts: pd.Series
+    :param categories: The categories, in the order they are shown
+    :type categories: tuple[str, ...]
+    :return: The counts and percentages, the percentages are 0 if the total is 0
+    :rtype: CategoryCounts"""
+
+    values = tuple(int(counts.get(category, 0)) for category in categories)
+    total = sum(values)
+    return CategoryCounts(
+        categories=categories,
+        counts=values,
+        percentages=tuple(value / total * 100 if total else 0.0 for value in values),
+        total=total,
+    )
+
+
+def weighted_quantile(counts: pd.Series, q: float) -> float:
+    """Quantile of the values in the index of ``counts``, each repeated as many
+    times as its count. It matches ``pd.Series.quantile`` over the raw values.
+
+    :param counts: The number of occurrences of each value, sorted by value
+    :type counts: pd.Series
+    :param q: The quantile to compute, between 0 and 1
+    :type q: float
+    :return: The quantile, or NaN if there are no values
+    :rtype: float"""
+
+    total = int(counts.sum())
+    if total == 0:
+        return float("nan")
+
+    values = counts.index.to_numpy(dtype=float)
+    cumulative = np.cumsum(counts.to_numpy())
+    position = (total - 1) * q
+
+    lower = values[np.searchsorted(cumulative, floor(position), side="right")]
+    upper = values[np.searchsorted(cumulative, ceil(position), side="right")]
+    return float(lower + (position - floor(position)) * (upper - lower))
+
+
+def age_summary(counts: pd.Series) -> AgeSummary:
+    """Mean, median, extremes and quartiles of the ages in an age histogram
+
+    :param counts: The number of attendees by age, sorted by age
+    :type counts: pd.Series
+    :return: The summary of the ages
+    :rtype: AgeSummary"""
+
+    total = int(counts.sum())
+    if total == 0:
+        nan = float("nan")
+        return AgeSummary(nan, nan, nan, nan, nan, nan)
+
+    return AgeSummary(
+        mean=float((counts.index.to_numpy() * counts.to_numpy()).sum() / total),
+        median=weighted_quantile(counts, 0.5),
+        min=int(counts.index.min()),
+        max=int(counts.index.max()),
+        q1=weighted_quantile(counts, 0.25),
+        q3=weighted_quantile(counts, 0.75),
+    )
+
+
+def boxplot(summary: AgeSummary) -> Boxplot:
+    """The boxplot of the ages, the whiskers reach 1.5 times the interquartile
+    range without going past the youngest and the oldest attendee
+
+    :param summary: The summary of the ages
+    :type summary: AgeSummary
+    :return: The box and the whiskers
+    :rtype: Boxplot"""
+
+    iqr = summary.q3 - summary.q1
+    return Boxplot(
+        q1=summary.q1,
+        median=summary.median,
+        q3=summary.q3,
+        lower=max(summary.min, summary.q1 - 1.5 * iqr),
+        upper=min(summary.max, summary.q3 + 1.5 * iqr),
+    )
+
+
+def arrival_summary(hour_counts: pd.Series) -> ArrivalSummary:
+    """The mean hour of arrival and the hour most people arrived
+
+    :param hour_counts: The number of attendees by hour of arrival
+    :type hour_counts: pd.Series
+    :return: The hours, ``None`` if nobody arrived
+    :rtype: ArrivalSummary"""
+
+    if hour_counts.sum() == 0:
+        return ArrivalSummary(None, None)
+
+    return ArrivalSummary(
+        mean_hour=float((hour_counts.index * hour_counts).sum() / hour_counts.sum()),
+        busiest_hour=int(hour_counts.idxmax()),
+    )
+
+
+def returning_people(previous_registrations: pd.Series, previous_attendances: pd.Series) -> ReturningPeople:
+    """How many people of an event came to previous events
+
+    :param previous_registrations: The number of previous events every person
+        registered to, one row per person registered to the event
+    :type previous_registrations: pd.Series
+    :param previous_attendances: The number of previous events every person
+        attended, one row per person who attended the event
+    :type previous_attendances: pd.Series
+    :return: The counts
+    :rtype: ReturningPeople"""
+
+    returning = int((previous_registrations > 0).sum())
+    return ReturningPeople(
+        registered=len(previous_registrations),
+        returning=returning,
+        new=len(previous_registrations) - returning,
+        attendees=len(previous_attendances),
+        returning_attendees=int((previous_attendances > 0).sum()),
+    )
+
+
+def report(counts: EventCounts) -> EventReport:
+    """Every statistic of an event date
+
+    :param counts: The counts of the date
+    :type counts: EventCounts
+    :return: The report
+    :rtype: EventReport"""
+
+    ages = age_summary(counts.ages)
+    return EventReport(
+        attendance=attendance_split(counts.registered, counts.attended),
+        genders=category_counts(counts.genders, GENDERS),
+        reactions=category_counts(counts.reactions, REACTIONS),
+        ages=ages,
+        age_boxplot=boxplot(ages),
+        arrival=arrival_summary(counts.arrival_hours),
+    )
+
+# endregion
+
+
+# region Batch
+################################################################################
+# The reports of every event date, computed in a process pool
+################################################################################
+
+# The engine of each process of the pool
+_engine: Engine | None = None
+
+
+def _start_worker(url: str) -> None:
+    global _engine
+    _engine = create_engine(url)
+
+
+def plain(value):
+    """A report as dicts, lists and numbers that can be written as JSON, NaN as ``None``"""
+
+    if isinstance(value, tuple) and hasattr(value, "_asdict"):
+        return {field: plain(item) for field, item in value._asdict().items()}
+    if isinstance(value, tuple):
+        return [plain(item) for item in value]
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def date_report(event_id: int, day_date: str) -> dict:
+    """The report of an event date, from its registrations in the database of the worker
+
+    :param event_id: The id of the event
+    :type event_id: int
+    :param day_date: The date of the event
+    :type day_date: str
+    :return: The report as plain values, with the event and the date
+    :rtype: dict"""
+
+    with _engine.connect() as connection:
+        rows = pd.read_sql(
+            text(queries.REGISTRATIONS), connection,
+            params={"event_id": event_id, "day_date": day_date},
+        )
+    event_report = report(event_counts(typed(rows, day_date)))
+    return {"event_id": event_id, "day_date": str(day_date), **plain(event_report)}
+
+# endregion
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m dashboard.analysis",
+        description="Compute the statistics of every event date, as JSON lines.",
+    )
+    cli.add_database_arguments(parser)
+    parser.add_argument("--events", type=int, nargs="+", help="Only these events")
+    parser.add_argument("--jobs", type=int, default=None, help="Processes, one per CPU by default")
+    parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    args = parser.parse_args()
+
+    engine = cli.database_engine(args)
+    with engine.connect() as connection:
+        dates = pd.read_sql(text("SELECT event_id, day_date FROM eventdate ORDER BY event_id, day_date"), connection)
+    if args.events:
+        dates = dates[dates["event_id"].isin(args.events)]
+
+    url = engine.url.render_as_string(hide_password=False)
+    with ProcessPoolExecutor(args.jobs, initializer=_start_worker, initargs=(url,)) as pool:
+        event_ids = dates["event_id"].astype(int).tolist()
+        day_dates = dates["day_date"].astype(str).tolist()
+        for date_report_values in pool.map(date_report, event_ids, day_dates, chunksize=16):
+            args.output.write(json.dumps(date_report_values) + "\n")
+
+
+if __name__ == "__main__":
+    main()
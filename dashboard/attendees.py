@@ -0,0 +1,199 @@
+"""Paginated table of the people registered to an event.
+
+Only the rows of the current page are fetched, with keyset pagination: each
+page starts after the sort value and the id of the last row of the previous
+one, so fetching page 100 costs the same as fetching page 1. Searching,
+sorting and choosing the columns are done by the query.
+
+The attendance matrix of a multi-day event is built from one query too, with
+a single crosstab of the attended dates of every person.
+
+:func:`export_file` writes every row with the same filters to a file, fetched in
+chunks (:mod:`dashboard.export`).
+"""
+import tempfile
+from typing import Any, NamedTuple
+
+import pandas as pd
+from streamlit.connections import SQLConnection
+
+from dashboard import db, export, queries
+
+# Columns shown by default, without the contact and identification data
+DEFAULT_COLUMNS = [
+    "registration_id",
+    "first_name",
+    "last_name",
+    "gender",
+    "date_of_birth",
+    "reaction",
+    "arrival_time",
+]
+
+
+class Cursor(NamedTuple):
+    """The position of the last row of a page"""
+
+    sort_value: Any
+    registration_id: int
+
+
+def _bindable(value: Any) -> Any:
+    """Convert the pandas and NumPy scalars of a frame to types the drivers can bind"""
+
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+def fetch_page(
+    conn: SQLConnection,
+    event_id: int,
+    day_date,
+    *,
+    columns: list[str],
+    sort_column: str = "registration_id",
+    descending: bool = False,
+    attended_only: bool = False,
+    search: str = "",
+    after: Cursor | None = None,
+    page_size: int = 50,
+) -> tuple[pd.DataFrame, Cursor | None]:
+    """Fetch one page of the people registered to an event
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param event_id: The id of the event
+    :type event_id: int
+    :param day_date: The date of the event
+    :param columns: The columns to show, from ``queries.ATTENDEE_COLUMNS``
+    :type columns: list[str]
+    :param sort_column: The column to sort by, from ``queries.ATTENDEE_SORT_COLUMNS``
+    :type sort_column: str
+    :param descending: Whether to sort in descending order
+    :type descending: bool
+    :param attended_only: Whether to show only the people who attended
+    :type attended_only: bool
+    :param search: Text to look for in the names, email and id number
+    :type search: str
+    :param after: The cursor returned with the previous page, ``None`` for the first one
+    :type after: Cursor | None
+    :param page_size: The number of rows of the page
+    :type page_size: int
+    :return: The rows of the page and the cursor of the next page, ``None`` if it is the last one
+    :rtype: tuple[pd.DataFrame, Cursor | None]"""
+
+    search = search.strip()
+    sql = queries.attendees_page(
+        conn.engine.dialect.name,
+        columns,
+        sort_column,
+        descending,
+        attended_only,
+        search=bool(search),
+        after=after is not None,
+    )
+
+    # One extra row tells whether there is a next page
+    params = db.event_params(event_id, day_date) | {"page_size": page_size + 1}
+    if search:
+        params["search"] = f"%{search}%"
+    if after is not None:
+        params["after_value"] = after.sort_value
+        params["after_id"] = after.registration_id
+
+    rows = db.run_query(conn, sql, params, ttl=db.ATTENDEES_TTL)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows.iloc[:page_size]
+        last = rows.iloc[-1]
+        next_cursor = Cursor(
+            _bindable(last[sort_column]), int(last["registration_id"])
+        )
+
+    return rows[[column for column in rows.columns if column in columns]], next_cursor
+
+
+def attendance_matrix(conn: SQLConnection, event_id: int, day_dates) -> pd.DataFrame:
+    """Which dates of an event each registered person attended
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param event_id: The id of the event
+    :type event_id: int
+    :param day_dates: The dates of the event, one column each
+    :return: The names of the people and one boolean column per date, indexed
+        by ``registration_id``
+    :rtype: pd.DataFrame"""
+
+    rows = db.run_query(
+        conn, queries.ATTENDED_DATES, db.event_params(event_id), ttl=db.ATTENDEES_TTL
+    )
+    rows = rows.assign(day_date=pd.to_datetime(rows["day_date"]))
+
+    people = rows.drop_duplicates("registration_id").set_index("registration_id")
+    attended = pd.crosstab(rows["registration_id"], rows["day_date"]).astype(bool)
+    attended = attended.reindex(
+        index=people.index,
+        columns=pd.to_datetime(pd.Series(day_dates)).sort_values(),
+        fill_value=False,
+    )
+    attended.columns = attended.columns.strftime("%Y-%m-%d")
+    return people[["first_name", "last_name"]].join(attended)
+
+
+def export_file(
+    conn: SQLConnection,
+    event_id: int,
+    day_date,
+    *,
+    columns: list[str],
+    format: str,
+    attended_only: bool = False,
+    search: str = "",
+    ages: tuple[int, int] | None = None,
+) -> bytes:
+    """Write the people registered to an event to a file, fetched in chunks
+
+    The file is written to a temporary file on disk, only the finished file
+    is read into memory, for ``st.download_button``.
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param event_id: The id of the event
+    :type event_id: int
+    :param day_date: The date of the event, of the attendance and the ages
+    :param columns: The columns to export, from ``queries.ATTENDEE_COLUMNS``
+    :type columns: list[str]
+    :param format: The format of the file, a key of ``export.FORMATS``
+    :type format: str
+    :param attended_only: Whether to export only the people who attended
+    :type attended_only: bool
+    :param search: Text to look for in the names, email and id number
+    :type search: str
+    :param ages: The youngest and the oldest age to export, ``None`` for everyone
+    :type ages: tuple[int, int] | None
+    :return: The contents of the file
+    :rtype: bytes"""
+
+    search = search.strip()
+    sql = queries.attendees_export(
+        conn.engine.dialect.name, columns, attended_only, search=bool(search), ages=ages is not None
+    )
+
+    params = db.event_params(event_id, day_date)
+    if search:
+        params["search"] = f"%{search}%"
+    if ages is not None:
+        params["min_age"], params["max_age"] = ages
+
+    with tempfile.TemporaryFile() as file:
+        with db.connect(conn) as connection, db.timings().measure("query", "attendees_export") as timer:
+            export.write(
+                export.chunks(connection, sql, params, columns), columns, format, file, on_chunk=timer.count
+            )
+        file.seek(0)
+        return file.read()
@@ -0,0 +1,348 @@
+"""Benchmark of the specific event page on synthetic databases.
+
+Every scenario is a database of :mod:`dashboard.synthetic` with a number of
+registrations, built once in ``--data`` and reused by the next runs. The page
+is opened with Streamlit's ``AppTest`` in a new process per scenario, so the
+caches and the memory of a scenario do not affect the next one. The process
+selects the event with the most registrations and its first date and
+measures:
+
+- ``cold_seconds``: selecting the event and the date with empty caches
+- ``warm_seconds``: the median of the reruns of the page with that selection
+- ``peak_memory_mb``: the peak resident memory of the process
+- ``query_seconds``, ``pandas_seconds``, ``figure_seconds`` and
+  ``other_seconds``: the time of the cold run spent in the database drivers
+  and SQLAlchemy, in pandas and NumPy, in Bokeh and in the rest, measured
+  with ``cProfile`` in another process. They are the sum over all the threads
+  (the prefetched queries run in parallel) and include the overhead of the
+  profiler, they are comparable with each other, not with the wall times.
+
+Every run appends one JSON line per scenario to ``--output``, with the
+commit, so the results of two versions can be compared::
+
+    python -m dashboard.benchmark --scenarios 1000 100000 1000000 --output bench.jsonl
+    python -m dashboard.benchmark --scenarios 1000 100000 --compare bench.jsonl
+
+With ``--compare`` the command fails if a metric is worse than the last
+result of the same scenario in the file by more than ``--threshold``.
+"""
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+from dashboard import synthetic
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGE = ROOT / "pages" / "specific_event.py"
+
+# Metrics compared with --compare, the wall times and the memory, the
+# profiled times change too much from one run to another
+COMPARED_METRICS = ("cold_seconds", "warm_seconds", "peak_memory_mb")
+
+# Differences below these are noise, whatever the threshold
+MIN_DIFFERENCE = {"cold_seconds": 0.1, "warm_seconds": 0.05, "peak_memory_mb": 10}
+
+# Where the time of a function is counted, by the path of its module or the
+# name of the built-in function
+CATEGORIES = {
+    "query": ("sqlalchemy", "sqlite3", "pymysql", "MySQLdb", "pandas/io/sql.py"),
+    "figure": ("bokeh", "streamlit_bokeh"),
+    "pandas": ("pandas", "numpy"),
+}
+
+# Threads waiting for work or for another thread, not counted
+IDLE = ("_queue.SimpleQueue", "time.sleep", "'_thread.lock'", "'_thread.RLock'")
+
+LARGEST_EVENT = """
+SELECT e.id, e.name, MIN(ed.day_date) AS day_date, COUNT(DISTINCT r.id) AS registrations
+FROM event e
+JOIN registration r ON r.event_id = e.id
+JOIN eventdate ed ON ed.event_id = e.id
+GROUP BY e.id, e.name
+ORDER BY registrations DESC
+LIMIT 1
+"""
+
+
+def scenario_name(registrations: int) -> str:
+    """``1k``, ``100k`` or ``1M`` for a number of registrations"""
+
+    for size, suffix in ((1_000_000, "M"), (1_000, "k")):
+        if registrations >= size and registrations % size == 0:
+            return f"{registrations // size}{suffix}"
+    return str(registrations)
+
+
+def database(data: Path, registrations: int, seed: int) -> Path:
+    """The SQLite database of a scenario, built if it does not exist
+
+    :param data: The directory of the databases
+    :type data: Path
+    :param registrations: The number of registrations
+    :type registrations: int
+    :param seed: The seed of the synthetic data
+    :type seed: int
+    :return: The path of the database
+    :rtype: Path"""
+
+    path = data / f"registrations-{registrations}-seed-{seed}.db"
+    if not path.exists():
+        data.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".partial")
+        partial.unlink(missing_ok=True)
+        synthetic.build(
+            create_engine(f"sqlite:///{partial}"), synthetic.generate(registrations, seed=seed)
+        )
+        partial.rename(path)
+    return path
+
+
+# region Measurements
+################################################################################
+# The measurements run in the process started for each scenario
+################################################################################
+
+def _category(function: tuple[str, int, str]) -> str | None:
+    filename, _, name = function
+    if filename == "~" and any(idle in name for idle in IDLE):
+        return None
+    location = name if filename == "~" else filename.replace(os.sep, "/")
+    for category, modules in CATEGORIES.items():
+        if any(module in location for module in modules):
+            return category
+    return "other"
+
+
+def _open_event(app, event: dict) -> None:
+    """Select the event and its date, the name is searched because only some
+    events are offered in the selectbox"""
+
+    app.sidebar.text_input[0].set_value(event["name"]).run()
+    app.sidebar.selectbox[0].set_value(event["id"]).run()
+    app.sidebar.selectbox[1].set_value(event["day_date"]).run()
+    if app.exception:
+        raise RuntimeError(f"The page failed: {app.exception[0].value}")
+
+
+def measure(url: str, reruns: int, profile: bool) -> dict:
+    """Open the page on the largest event of a database
+
+    The ``sql`` connection of the secrets must point to the same database.
+
+    :param url: The URL of the database
+    :type url: str
+    :param reruns: The number of warm reruns
+    :type reruns: int
+    :param profile: Whether to profile the cold run instead of timing the runs
+    :type profile: bool
+    :return: The metrics
+    :rtype: dict"""
+
+    from streamlit.testing.v1 import AppTest
+
+    with create_engine(url).connect() as connection:
+        event = dict(connection.execute(text(LARGEST_EVENT)).mappings().one())
+        sizes = {
+            table: connection.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar_one()
+            for table in ("event", "registration", "attendance")
+        }
+
+    metrics = {
+        "events": sizes["event"],
+        "registrations": sizes["registration"],
+        "attendances": sizes["attendance"],
+        "event_registrations": event["registrations"],
+    }
+
+    app = AppTest.from_file(str(PAGE), default_timeout=3600)
+    app.run()
+
+    if profile:
+        # The page runs in a new thread on every run and the queries in a
+        # thread pool, every thread gets its own profiler
+        profiles = []
+
+        def start_profile(*args) -> None:
+            thread_profile = cProfile.Profile()
+            profiles.append(thread_profile)
+            thread_profile.enable()
+
+        threading.setprofile(start_profile)
+        _open_event(app, event)
+        threading.setprofile(None)
+
+        times = dict.fromkeys(["query", "pandas", "figure", "other"], 0.0)
+        for function, (_, _, total_time, _, _) in pstats.Stats(*profiles).stats.items():
+            category = _category(function)
+            if category is not None:
+                times[category] += total_time
+        return {f"{category}_seconds": round(seconds, 3) for category, seconds in times.items()}
+
+    start = time.perf_counter()
+    _open_event(app, event)
+    metrics["cold_seconds"] = round(time.perf_counter() - start, 3)
+
+    warm = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        warm.append(time.perf_counter() - start)
+    metrics["warm_seconds"] = round(statistics.median(warm), 3)
+
+    # Kilobytes on Linux
+    metrics["peak_memory_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return metrics
+
+
+def _run_measure(path: Path, reruns: int, profile: bool) -> dict:
+    """Run :func:`measure` in a new process with the secrets of the scenario"""
+
+    with tempfile.TemporaryDirectory() as directory:
+        secrets = Path(directory) / ".streamlit" / "secrets.toml"
+        secrets.parent.mkdir()
+        secrets.write_text(f'[connections.sql]\nurl = "sqlite:///{path.resolve()}"\n')
+
+        command = [sys.executable, "-m", "dashboard.benchmark", "--measure", str(path.resolve())]
+        command += ["--reruns", str(reruns)] + (["--profile"] if profile else [])
+        result = subprocess.run(
+            command,
+            cwd=directory,
+            env=os.environ | {"PYTHONPATH": str(ROOT)},
+            capture_output=True,
+            text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"The benchmark of {path.name} failed:\n{result.stderr}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+# endregion
+
+
+# region Results
+################################################################################
+# Saving and comparing the results
+################################################################################
+
+def _commit() -> str | None:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+    )
+    return result.stdout.strip() or None
+
+
+def run_scenario(data: Path, registrations: int, seed: int, reruns: int) -> dict:
+    """Build the database of a scenario if needed and measure the page
+
+    :param data: The directory of the databases
+    :type data: Path
+    :param registrations: The number of registrations
+    :type registrations: int
+    :param seed: The seed of the synthetic data
+    :type seed: int
+    :param reruns: The number of warm reruns
+    :type reruns: int
+    :return: The result, with the scenario, the commit and the metrics
+    :rtype: dict"""
+
+    path = database(data, registrations, seed)
+    return {
+        "scenario": scenario_name(registrations),
+        "seed": seed,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": sys.version.split()[0],
+        **_run_measure(path, reruns, profile=False),
+        **_run_measure(path, reruns, profile=True),
+    }
+
+
+def regressions(result: dict, baseline: list[dict], threshold: float) -> list[str]:
+    """The metrics of a result worse than the last baseline of its scenario
+
+    :param result: The result of a scenario
+    :type result: dict
+    :param baseline: The saved results
+    :type baseline: list[dict]
+    :param threshold: The relative increase allowed, ``0.2`` is 20 %
+    :type threshold: float
+    :return: The description of every regression, empty if there is none
+        or there is no baseline for the scenario
+    :rtype: list[str]"""
+
+    previous = [
+        saved for saved in baseline
+        if (saved["scenario"], saved["seed"]) == (result["scenario"], result["seed"])
+    ]
+    if not previous:
+        return []
+
+    found = []
+    for metric in COMPARED_METRICS:
+        before, after = previous[-1][metric], result[metric]
+        if after > before * (1 + threshold) and after - before > MIN_DIFFERENCE[metric]:
+            found.append(
+                f"{result['scenario']}: {metric} {before} -> {after} "
+                f"(+{(after / before - 1):.0%}, baseline {previous[-1]['commit']})"
+            )
+    return found
+
+# endregion
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m dashboard.benchmark",
+        description="Measure the specific event page on synthetic databases.",
+    )
+    parser.add_argument(
+        "--scenarios", type=int, nargs="+", default=[1_000, 100_000],
+        help="Number of registrations of each scenario",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reruns", type=int, default=5, help="Warm reruns of each scenario")
+    parser.add_argument("--data", type=Path, default=Path(".benchmark"), help="Directory of the databases")
+    parser.add_argument("--output", type=Path, help="Append the results to this JSON lines file")
+    parser.add_argument("--compare", type=Path, help="Fail on regressions against this JSON lines file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative increase")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    parser.add_argument("--profile", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(f"sqlite:///{args.measure}", args.reruns, args.profile)))
+        return
+
+    baseline = []
+    if args.compare:
+        with args.compare.open() as file:
+            baseline = [json.loads(line) for line in file if line.strip()]
+
+    found = []
+    for registrations in args.scenarios:
+        result = run_scenario(args.data, registrations, args.seed, args.reruns)
+        print(json.dumps(result))
+        if args.output:
+            with args.output.open("a") as file:
+                file.write(json.dumps(result) + "\n")
+        found += regressions(result, baseline, args.threshold)
+
+    if found:
+        print("\nRegressions:\n" + "\n".join(found), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""A cache of query results shared by all the sessions, with one load in flight per key."""
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Hashable, NamedTuple
+
+import pandas as pd
+
+
+class Snapshot(NamedTuple):
+    """A value of the cache, with its version and when it was loaded, shared by
+    the sessions and not to be modified in place"""
+
+    value: Any
+    version: int
+    loaded_at: datetime
+
+
+class CacheStats(NamedTuple):
+    """Counters of the cache, since the server started"""
+
+    entries: int
+    bytes: int
+    max_bytes: int | None
+    hits: int
+    misses: int
+    evictions: int
+
+
+class EntryInfo(NamedTuple):
+    """The description of an entry, for the debug panel"""
+
+    key: Hashable
+    bytes: int
+    version: int
+    loaded_at: datetime
+
+
+def sizeof(value: Any) -> int:
+    """The memory used by a cached value, in bytes
+
+    :param value: The value
+    :type value: Any
+    :return: The deep memory usage of frames and series, ``sys.getsizeof`` otherwise
+    :rtype: int"""
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    """A cached value and the lock held while it is loaded"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.snapshot: Snapshot | None = None
+        self.ttl: timedelta | None = None
+        self.expires_at: datetime | None = None
+        self.size = 0
+
+    def set(self, value: Any, ttl: timedelta | None) -> Snapshot:
+        now = datetime.now()
+        version = 1 if self.snapshot is None else self.snapshot.version + 1
+        self.snapshot = Snapshot(value, version, now)
+        self.ttl = ttl
+        self.expires_at = None if ttl is None else now + ttl
+        return self.snapshot
+
+    def expired(self, now: datetime) -> bool:
+        return self.expires_at is not None and now >= self.expires_at
+
+
+class SharedCache:
+    """Cache with one load in flight per key, the least recently used entries
+    are dropped past ``max_entries`` entries or ``max_bytes`` bytes"""
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int | None = None) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _entry(self, key: Hashable) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+                self._drop_stale()
+            else:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _remove(self, key: Hashable) -> None:
+        self._bytes -= self._entries.pop(key).size
+
+    def _drop_stale(self) -> None:
+        """Drop the expired entries, then the least recently used ones.
+
+        The most recently used entry is kept even if it is over the budget."""
+
+        now = datetime.now()
+        for key in [key for key, entry in self._entries.items() if entry.expired(now)]:
+            self._remove(key)
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def _set(self, key: Hashable, entry: _Entry, value: Any, ttl: timedelta | None) -> None:
+        """Store a new value of an entry, its lock must be held"""
+
+        entry.set(value, ttl)
+        size = sizeof(value)
+        with self._lock:
+            # The entry could have been dropped while it was loaded
+            if self._entries.get(key) is entry:
+                self._bytes += size - entry.size
+                entry.size = size
+                self._drop_stale()
+            else:
+                entry.size = size
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether the key is loaded or being loaded, and not expired"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not entry.expired(datetime.now())
+
+    def get(
+        self, key: Hashable, load: Callable[[], Any], ttl: timedelta | None = None
+    ) -> Snapshot:
+        """The cached value of a key, loading it if it is missing or expired
+
+        :param key: The key of the value
+        :type key: Hashable
+        :param load: The function that loads the value
+        :type load: Callable[[], Any]
+        :param ttl: How long the value is kept, forever by default
+        :type ttl: timedelta | None
+        :return: The value
+        :rtype: Snapshot"""
+
+        entry = self._entry(key)
+        with entry.lock:
+            if entry.snapshot is None or entry.expired(datetime.now()):
+                with self._lock:
+                    self._misses += 1
+                try:
+                    value = load()
+                except Exception:
+                    # An entry that was never loaded is not kept, the next
+                    # get or prefetch of the key loads it again
+                    with self._lock:
+                        if entry.snapshot is None and self._entries.get(key) is entry:
+                            self._remove(key)
+                    raise
+                self._set(key, entry, value, ttl)
+            else:
+                with self._lock:
+                    self._hits += 1
+            return entry.snapshot
+
+    def refresh(
+        self,
+        key: Hashable,
+        refresh: Callable[[Any], Any],
+        max_age: timedelta | None = None,
+    ) -> Snapshot | None:
+        """Replace a loaded value with ``refresh(value)``
+
+        The version only increases if ``refresh`` returns a different object,
+        which is kept for the ``ttl`` the value was loaded with.
+
+        :param key: The key of the value
+        :type key: Hashable
+        :param refresh: The function that returns the new value from the current one
+        :type refresh: Callable[[Any], Any]
+        :param max_age: Skip the refresh if the value was loaded more recently
+        :type max_age: timedelta | None
+        :return: The new value, ``None`` if the key was not loaded or is recent
+        :rtype: Snapshot | None"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        with entry.lock:
+            snapshot = entry.snapshot
+            if snapshot is None:
+                return None
+            if max_age is not None and datetime.now() - snapshot.loaded_at < max_age:
+                return None
+
+            value = refresh(snapshot.value)
+            if value is snapshot.value:
+                # Keep the version, only the time of the refresh changes
+                entry.snapshot = snapshot._replace(loaded_at=datetime.now())
+            else:
+                self._set(key, entry, value, entry.ttl)
+            return entry.snapshot
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop the entries whose key matches the predicate
+
+        :param predicate: Whether to drop the entry of a key
+        :type predicate: Callable[[Hashable], bool]"""
+
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._remove(key)
+
+    def stats(self) -> CacheStats:
+        """The size of the cache and its counters
+
+        :return: The counters
+        :rtype: CacheStats"""
+
+        with self._lock:
+            return CacheStats(
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+            )
+
+    def entries(self) -> list[EntryInfo]:
+        """The loaded entries, from the most recently used to the least
+
+        :return: The description of the entries
+        :rtype: list[EntryInfo]"""
+
+        with self._lock:
+            return [
+                EntryInfo(key, entry.size, entry.snapshot.version, entry.snapshot.loaded_at)
+                for key, entry in reversed(self._entries.items())
+                if entry.snapshot is not None
+            ]
@@ -0,0 +1,74 @@
+"""Helpers shared by the Bokeh figures of the pages."""
+from bokeh.models import ColumnDataSource, CustomJS, RangeSlider
+from bokeh.plotting import figure
+
+
+def figure_config(figure: figure):
+    """The basic configuration of all the figures in the app
+
+    :param figure: The figure to configure
+    :type figure: figure"""
+
+    figure.toolbar.logo = None
+    figure.toolbar.autohide = True
+    figure.toolbar_location = "below"
+
+
+def range_slider(
+    title: str,
+    start: int,
+    end: int,
+    bar_chart: figure,
+    source: ColumnDataSource,
+    column_name: str,
+    linked_figures: tuple[figure, ...] = (),
+) -> RangeSlider:
+    """A slider that filters the bars of a chart in the browser, without rerunning the app.
+
+    The source has every bar of the chart, the slider only changes which of
+    them are shown. The x range of the linked figures follows the slider.
+
+    :param title: The title of the slider
+    :type title: str
+    :param start: The lowest value of the slider
+    :type start: int
+    :param end: The highest value of the slider
+    :type end: int
+    :param bar_chart: The bar chart to filter, with a categorical x range
+    :type bar_chart: figure
+    :param source: The data of the bar chart
+    :type source: ColumnDataSource
+    :param column_name: The column of the source with the (numeric) categories
+    :type column_name: str
+    :param linked_figures: Figures with a numeric x range to zoom to the slider
+    :type linked_figures: tuple[figure, ...]
+    :return: The slider, to be shown in the same layout as the figures
+    :rtype: RangeSlider"""
+
+    slider = RangeSlider(
+        title=title,
+        start=start,
+        end=end,
+        value=(start, end),
+        step=1,
+        sizing_mode="stretch_width",
+    )
+    slider.js_on_change("value", CustomJS(
+        args=dict(
+            x_range=bar_chart.x_range,
+            source=source,
+            column_name=column_name,
+            linked_ranges=[linked_figure.x_range for linked_figure in linked_figures],
+        ),
+        code="""
+            const [low, high] = cb_obj.value
+            x_range.factors = source.data[column_name].filter(
+                (value) => low <= Number(value) && Number(value) <= high
+            )
+            for (const linked_range of linked_ranges) {
+                linked_range.start = low
+                linked_range.end = high
+            }
+        """,
+    ))
+    return slider
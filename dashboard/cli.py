@@ -0,0 +1,65 @@
+"""Helpers of the commands that run without Streamlit (``python -m dashboard.…``).
+
+The commands connect to the same database as the dashboard: by default they
+read the ``sql`` connection of ``.streamlit/secrets.toml``, or the URL given
+with ``--url``.
+"""
+import argparse
+import tomllib
+from pathlib import Path
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.engine import URL
+
+
+def add_database_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the ``--url`` and ``--secrets`` options to a command
+
+    :param parser: The parser of the command
+    :type parser: argparse.ArgumentParser"""
+
+    parser.add_argument("--url", help="URL of the database, by default the one of the secrets")
+    parser.add_argument(
+        "--secrets",
+        type=Path,
+        default=Path(".streamlit/secrets.toml"),
+        help="Secrets of the dashboard, used without --url",
+    )
+
+
+def secrets_url(path: Path) -> URL | str:
+    """The URL of the ``sql`` connection in the secrets of the dashboard
+
+    :param path: The path of ``secrets.toml``
+    :type path: Path
+    :return: The URL of the database
+    :rtype: URL | str"""
+
+    with path.open("rb") as file:
+        secrets = tomllib.load(file)["connections"]["sql"]
+
+    if "url" in secrets:
+        return secrets["url"]
+
+    dialect = secrets["dialect"]
+    if "driver" in secrets:
+        dialect = f"{dialect}+{secrets['driver']}"
+    return URL.create(
+        drivername=dialect,
+        username=secrets.get("username"),
+        password=secrets.get("password"),
+        host=secrets.get("host"),
+        port=secrets.get("port"),
+        database=secrets.get("database"),
+    )
+
+
+def database_engine(args: argparse.Namespace) -> Engine:
+    """The engine of the database chosen with :func:`add_database_arguments`
+
+    :param args: The parsed arguments of the command
+    :type args: argparse.Namespace
+    :return: The engine
+    :rtype: Engine"""
+
+    return create_engine(args.url or secrets_url(args.secrets))
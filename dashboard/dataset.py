@@ -0,0 +1,165 @@
+"""The registrations of an event, kept up to date incrementally.
+
+During an event the check-in desk keeps adding attendance rows, and reloading
+the whole registration join for every refresh is wasteful. The loaded frames
+are kept in the cache shared by all the sessions (:func:`dashboard.db.shared_cache`),
+so each event date is loaded and refreshed once for all of them, and every
+refresh is a new version of the frame. The changes are found with the
+high-water marks of the columns that change: ``registration_created_at`` for new
+registrations, ``reaction_date`` for new reactions and ``arrival_time`` for new
+check-ins. A refresh only fetches the rows past those marks and merges them
+into the frame by ``registration_id``.
+
+Deleted registrations and attendances with a backdated ``arrival_time`` are
+not seen by an incremental refresh; :func:`discard_event` drops the frames so
+the next load is a full one.
+
+The frames only have the columns used by the statistics, with the compact
+types of :func:`dashboard.analysis.typed`.
+"""
+from datetime import datetime, timedelta
+from typing import Any
+
+import pandas as pd
+from streamlit.connections import SQLConnection
+
+from dashboard import db, queries
+from dashboard.analysis import typed
+from dashboard.cache import Snapshot
+
+_NO_DATETIME = datetime(1970, 1, 1)
+_NO_TIME = "00:00:00"
+
+
+def _key(event_id: int, day_date) -> tuple:
+    return ("registrations", int(event_id), day_date)
+
+
+def _fetch(conn: SQLConnection, sql: str, params: dict[str, Any]) -> pd.DataFrame:
+    return typed(db.read_sql(conn, sql, params), params["day_date"])
+
+
+def _datetime_mark(values: pd.Series) -> datetime:
+    """The greatest datetime of a column, in a type every driver can bind"""
+
+    mark = values.max()
+    if pd.isna(mark):
+        return _NO_DATETIME
+    return mark.to_pydatetime()
+
+
+def _time_mark(values: pd.Series) -> str:
+    """The greatest time of a column as ``HH:MM:SS``, to compare it with ``TIME`` columns"""
+
+    mark = values.max()
+    if pd.isna(mark):
+        return _NO_TIME
+    seconds = int(mark.total_seconds())
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def watermarks(frame: pd.DataFrame) -> dict[str, Any]:
+    """The high-water marks of a frame of registrations
+
+    :param frame: The registrations, the value of :func:`snapshot`
+    :type frame: pd.DataFrame
+    :return: The parameters of ``REGISTRATIONS_CHANGES``
+    :rtype: dict[str, Any]"""
+
+    return {
+        "created_since": _datetime_mark(frame["registration_created_at"]),
+        "reaction_since": _datetime_mark(frame["reaction_date"]),
+        "arrival_since": _time_mark(frame["arrival_time"]),
+    }
+
+
+def merge_changes(frame: pd.DataFrame, changes: pd.DataFrame) -> pd.DataFrame:
+    """Replace the rows of ``frame`` that are in ``changes`` and add the new ones
+
+    The marks fetch the last loaded rows again, the rows of ``changes`` equal
+    to the loaded ones are ignored.
+
+    :param frame: The loaded registrations
+    :type frame: pd.DataFrame
+    :param changes: The new or changed registrations
+    :type changes: pd.DataFrame
+    :return: The updated registrations, ``frame`` itself if nothing changed
+    :rtype: pd.DataFrame"""
+
+    new = changes.set_index("registration_id")
+    old = frame.set_index("registration_id").reindex(new.index)
+    unchanged = (old.eq(new).fillna(False) | (old.isna() & new.isna())).all(axis=1)
+    changes = changes[~unchanged.to_numpy()]
+
+    if changes.empty:
+        return frame
+
+    kept = frame[~frame["registration_id"].isin(changes["registration_id"])]
+    return pd.concat([kept, changes], ignore_index=True)
+
+
+def snapshot(conn: SQLConnection, event_id: int, day_date) -> Snapshot:
+    """The registrations of an event with their attendance to the given date,
+    with the version of the frame.
+
+    The first call loads all the rows, the following ones return the stored
+    frame until it is refreshed or discarded.
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param event_id: The id of the event
+    :type event_id: int
+    :param day_date: The date of the event
+    :return: The registrations, the frame must not be modified in place
+    :rtype: Snapshot"""
+
+    return db.shared_cache().get(
+        _key(event_id, day_date),
+        lambda: _fetch(conn, queries.REGISTRATIONS, db.event_params(event_id, day_date)),
+    )
+
+
+def refresh_registrations(
+    conn: SQLConnection,
+    event_id: int,
+    day_date,
+    max_age: timedelta | None = None,
+) -> int:
+    """Fetch the registrations that changed since the last load and merge them
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param event_id: The id of the event
+    :type event_id: int
+    :param day_date: The date of the event
+    :param max_age: Skip the refresh if the frame was refreshed more recently,
+        so many sessions refreshing the same event share one query
+    :type max_age: timedelta | None
+    :return: The number of rows fetched, 0 if the frame was not loaded yet
+    :rtype: int"""
+
+    fetched = 0
+
+    def merged(frame: pd.DataFrame) -> pd.DataFrame:
+        nonlocal fetched
+        changes = _fetch(
+            conn,
+            queries.REGISTRATIONS_CHANGES,
+            db.event_params(event_id, day_date) | watermarks(frame),
+        )
+        fetched = len(changes)
+        return merge_changes(frame, changes)
+
+    db.shared_cache().refresh(_key(event_id, day_date), merged, max_age=max_age)
+    return fetched
+
+
+def discard_event(event_id: int) -> None:
+    """Drop the loaded registrations of every date of an event
+
+    :param event_id: The id of the event
+    :type event_id: int"""
+
+    db.shared_cache().discard(
+        lambda key: key[0] == "registrations" and key[1] == int(event_id)
+    )
@@ -0,0 +1,276 @@
+"""Cached access to the ``sql`` connection.
+
+``conn.query`` caches every result in a single ``st.cache_data`` function, so
+the only way to refresh the data of one event is ``st.cache_data.clear()``,
+which drops the cache of every event for every user. :func:`run_query` caches
+the results by ``(query, params, generation)`` instead, where the generation
+is a counter kept per event and shared by all the sessions. Reloading an
+event increments its counter, so the following queries of that event miss
+the cache while the cached results of the other events are kept. The stale
+entries are dropped by their TTL, by ``MAX_ENTRIES`` or by the memory budget.
+
+The results are kept in a :class:`dashboard.cache.SharedCache` for the whole
+server: when many sessions ask for the same query at once it runs only once,
+and every session gets the same frame instead of a copy.
+
+Every query takes a connection of a configured pool with :func:`connect`,
+which counts the waits and the errors of the pool (:mod:`dashboard.pool`).
+
+:func:`prefetch` starts a query on a small thread pool, so the queries that do
+not depend on each other run at the same time. A :func:`run_query` with the
+same arguments waits for the query in flight instead of running it again.
+
+Every query that reaches the database is measured by :func:`timings`, with
+the rows and bytes it fetched (:mod:`dashboard.timing`).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager
+from datetime import timedelta
+from typing import Any
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+from streamlit.connections import SQLConnection
+
+from dashboard import queries, snapshot
+from dashboard.cache import SharedCache
+from dashboard.pool import PoolMetrics
+from dashboard.timing import Timings
+
+# How long each kind of query is kept in the cache
+EVENTS_TTL = timedelta(minutes=10)
+EVENT_DATES_TTL = timedelta(minutes=10)
+STATS_TTL = timedelta(minutes=5)
+ATTENDEES_TTL = timedelta(minutes=5)
+
+# Maximum number of results kept, stale generations included
+MAX_ENTRIES = 1000
+
+# Options of the connection pool. The pool keeps enough connections for the
+# sessions of the busiest hour, checks every connection before using it and
+# replaces the connections before MySQL closes them for being idle.
+POOL_OPTIONS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_recycle": 1800,
+    "pool_pre_ping": True,
+}
+
+# Connections opened when the server starts
+WARM_CONNECTIONS = 3
+
+# Queries run at the same time in the background, each one takes a
+# connection of the pool of ``st.connection("sql")``
+QUERY_WORKERS = 4
+
+# Memory the cached results can use, it can be changed with
+# ``[cache] max_megabytes`` in the secrets
+CACHE_MEGABYTES = 512
+
+
+@st.cache_resource
+def _event_generations() -> dict[int | None, int]:
+    """The generation of the cached data of every event, shared by all the sessions"""
+
+    return {}
+
+
+@st.cache_resource
+def pool_metrics() -> PoolMetrics:
+    """The counters of the connection pool, shared by all the sessions"""
+
+    return PoolMetrics()
+
+
+@st.cache_resource
+def timings() -> Timings:
+    """The timings of the queries and sections, shared by all the sessions
+
+    ``[timing] log = true`` in the secrets writes every measurement to the log
+    and ``[timing] prometheus_file`` the totals to a Prometheus text file."""
+
+    options = st.secrets.get("timing", {})
+    return Timings(
+        log=options.get("log", False),
+        prometheus_file=options.get("prometheus_file"),
+        dump_interval=options.get("dump_interval", 15),
+    )
+
+
+def get_connection() -> SQLConnection:
+    """The connection to the database of the registration app
+
+    The options of ``POOL_OPTIONS`` can be changed in
+    ``[connections.sql.create_engine_kwargs]`` in the secrets. The first time
+    an engine is used some connections are opened, so the first sessions do
+    not wait for them.
+
+    With ``[snapshot] enabled = true`` in the secrets the dashboard reads the
+    Parquet files of ``[snapshot] path`` with DuckDB instead of the database
+    (:mod:`dashboard.snapshot`)."""
+
+    options = st.secrets.get("snapshot", {})
+    if options.get("enabled", False):
+        # Every connection of the pool is a DuckDB database in memory with
+        # the views of the snapshot
+        conn = st.connection(
+            "snapshot",
+            type="sql",
+            url="duckdb:///:memory:",
+            poolclass=QueuePool,
+            **POOL_OPTIONS,
+        )
+        snapshot.attach(conn.engine, options.get("path", "snapshots"))
+    else:
+        configured = st.secrets.get("connections", {}).get("sql", {}).get("create_engine_kwargs", {})
+        conn = st.connection(
+            "sql",
+            **{option: value for option, value in POOL_OPTIONS.items() if option not in configured},
+        )
+
+    metrics = pool_metrics()
+    if metrics.attach(conn.engine):
+        metrics.warm_up(conn.engine, WARM_CONNECTIONS)
+    return conn
+
+
+def connect(conn: SQLConnection) -> AbstractContextManager[Connection]:
+    """``conn.connect()``, counted by :func:`pool_metrics`
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :return: The connection, closed when the ``with`` block ends
+    :rtype: AbstractContextManager[Connection]"""
+
+    metrics = pool_metrics()
+    # ``conn.reset()`` creates a new engine
+    metrics.attach(conn.engine)
+    return metrics.connect(conn.engine)
+
+
+def event_params(event_id: int, day_date=None) -> dict[str, Any]:
+    """The bound parameters of the queries of an event
+
+    :param event_id: The id of the event
+    :type event_id: int
+    :param day_date: The date of the event, if the query needs one
+    :return: The parameters to pass to :func:`run_query`
+    :rtype: dict[str, Any]"""
+
+    params: dict[str, Any] = {"event_id": int(event_id)}
+    if day_date is not None:
+        params["day_date"] = day_date
+    return params
+
+
+def invalidate_event(event_id: int | None) -> None:
+    """Make the next queries of an event skip the cached results
+
+    :param event_id: The id of the event to reload, ``None`` for the queries
+        that are not scoped to an event
+    :type event_id: int | None"""
+
+    generations = _event_generations()
+    key = None if event_id is None else int(event_id)
+    generations[key] = generations.get(key, 0) + 1
+
+
+@st.cache_resource
+def shared_cache() -> SharedCache:
+    """The cache of the results of the queries, shared by all the sessions"""
+
+    megabytes = st.secrets.get("cache", {}).get("max_megabytes", CACHE_MEGABYTES)
+    return SharedCache(max_entries=MAX_ENTRIES, max_bytes=int(megabytes * 2**20))
+
+
+@st.cache_resource
+def _executor() -> ThreadPoolExecutor:
+    """The threads that run the prefetched queries, shared by all the sessions"""
+
+    return ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="query")
+
+
+def _key(sql: str, params: dict[str, Any]) -> tuple:
+    generation = _event_generations().get(params.get("event_id"), 0)
+    return sql, tuple(sorted(params.items())), generation
+
+
+def read_sql(conn: SQLConnection, sql: str, params: dict[str, Any]) -> pd.DataFrame:
+    """Run a query without the cache, measured by :func:`timings`
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param sql: The query
+    :type sql: str
+    :param params: The parameters of the query
+    :type params: dict[str, Any]
+    :return: The result of the query
+    :rtype: pd.DataFrame"""
+
+    with timings().measure("query", queries.query_name(sql)) as timer, connect(conn) as connection:
+        rows = pd.read_sql(text(sql), connection, params=params)
+        timer.count(rows)
+    return rows
+
+
+def _read(conn: SQLConnection, sql: str, params: dict[str, Any]) -> pd.DataFrame:
+    try:
+        return read_sql(conn, sql, params)
+    except OperationalError:
+        # The server closed the connection, retry once with a new engine
+        conn.reset()
+        return read_sql(conn, sql, params)
+
+
+def run_query(
+    conn: SQLConnection,
+    sql: str,
+    params: dict[str, Any] | None = None,
+    ttl: timedelta = STATS_TTL,
+) -> pd.DataFrame:
+    """Run a read-only query with bound parameters, caching the result
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param sql: The query, with ``:name`` placeholders for the parameters
+    :type sql: str
+    :param params: The parameters of the query, usually from :func:`event_params`
+    :type params: dict[str, Any] | None
+    :param ttl: How long the result is kept in the cache
+    :type ttl: timedelta
+    :return: The result of the query, it must not be modified in place
+    :rtype: pd.DataFrame"""
+
+    params = params or {}
+    return shared_cache().get(
+        _key(sql, params), lambda: _read(conn, sql, params), ttl=ttl
+    ).value
+
+
+def prefetch(
+    conn: SQLConnection,
+    sql: str,
+    params: dict[str, Any] | None = None,
+    ttl: timedelta = STATS_TTL,
+) -> None:
+    """Start running a query in the background, unless it is already cached
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param sql: The query, as passed to :func:`run_query`
+    :type sql: str
+    :param params: The parameters of the query
+    :type params: dict[str, Any] | None
+    :param ttl: How long the result is kept in the cache
+    :type ttl: timedelta"""
+
+    params = params or {}
+    key = _key(sql, params)
+    cache = shared_cache()
+    if key not in cache:
+        _executor().submit(cache.get, key, lambda: _read(conn, sql, params), ttl)
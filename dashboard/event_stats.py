@@ -0,0 +1,183 @@
+"""The ``event_stats`` table, the rollup of every event date stored in the database.
+
+The pages compute their statistics from the raw rows of ``registration``,
+``attendance`` and ``assistant``. This module stores the rollup of
+:mod:`dashboard.rollup` in a summary table, one row per event date, so reports
+and other tools can read the statistics of a finished event with a single
+lookup.
+
+The table is written by a headless command, meant to be run from cron::
+
+    python -m dashboard.event_stats
+
+Every row keeps the signature of its event when it was computed, so each run
+only computes again the events whose registrations, attendances or reactions
+changed, and replaces their rows in one transaction. A run that fails leaves
+the table as it was. Changes to the dates or the capacity of an event are not
+part of the signature, ``--full`` computes every event again.
+
+Without ``--url`` the connection of ``.streamlit/secrets.toml`` is used, the
+same one the dashboard uses.
+"""
+import argparse
+import logging
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import (
+    Column, Date, DateTime, Engine, Float, Integer, MetaData, Table, create_engine,
+    delete, select,
+)
+from sqlalchemy.engine import Connection
+
+from dashboard import cli, rollup
+
+TABLE = "event_stats"
+
+SIGNATURE_COLUMNS = {
+    "registrations": "signature_registrations",
+    "attendances": "signature_attendances",
+    "last_registration": "signature_last_registration",
+    "last_reaction": "signature_last_reaction",
+}
+
+COUNT_COLUMNS = (
+    "capacity",
+    "registered",
+    "attended",
+    *rollup.GENDER_COLUMNS.values(),
+    *(column for column, _, _ in rollup.AGE_BANDS),
+    *rollup.HOUR_COLUMNS,
+    *rollup.REACTION_COLUMNS.values(),
+)
+
+metadata = MetaData()
+
+event_stats = Table(
+    TABLE,
+    metadata,
+    Column("event_id", Integer, primary_key=True, autoincrement=False),
+    Column("day_date", Date, primary_key=True),
+    *(Column(column, Integer, nullable=False) for column in COUNT_COLUMNS),
+    Column("attendance_rate", Float),
+    Column("capacity_utilization", Float),
+    Column(SIGNATURE_COLUMNS["registrations"], Integer),
+    Column(SIGNATURE_COLUMNS["attendances"], Integer),
+    Column(SIGNATURE_COLUMNS["last_registration"], DateTime),
+    Column(SIGNATURE_COLUMNS["last_reaction"], DateTime),
+    Column("refreshed_at", DateTime, nullable=False),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def stored_signatures(connection: Connection) -> pd.DataFrame:
+    """The signatures of the events in the table, like :func:`dashboard.rollup.signatures`
+
+    :param connection: The connection to the database with the table
+    :type connection: Connection
+    :return: The signatures, indexed by event id
+    :rtype: pd.DataFrame"""
+
+    columns = [event_stats.c[column] for column in SIGNATURE_COLUMNS.values()]
+    frame = pd.read_sql(
+        select(event_stats.c.event_id, *columns).distinct(), connection
+    ).rename(columns={stored: name for name, stored in SIGNATURE_COLUMNS.items()})
+    frame["last_registration"] = pd.to_datetime(frame["last_registration"])
+    frame["last_reaction"] = pd.to_datetime(frame["last_reaction"])
+    return frame.set_index("event_id").sort_index()
+
+
+def with_rates(frame: pd.DataFrame, signatures: pd.DataFrame) -> pd.DataFrame:
+    """Add the rates and the signatures of the events to a rollup
+
+    :param frame: The rollup, as returned by :func:`dashboard.rollup.compute`
+    :type frame: pd.DataFrame
+    :param signatures: The signatures the rollup was computed with
+    :type signatures: pd.DataFrame
+    :return: The rows of the table
+    :rtype: pd.DataFrame"""
+
+    frame = frame.copy()
+    frame["attendance_rate"] = frame["attended"] / frame["registered"].where(frame["registered"] > 0)
+    frame["capacity_utilization"] = frame["attended"] / frame["capacity"].where(frame["capacity"] > 0)
+    frame = frame.join(signatures.rename(columns=SIGNATURE_COLUMNS), on="event_id")
+    frame["refreshed_at"] = datetime.now()
+    return frame
+
+
+def _records(frame: pd.DataFrame) -> list[dict]:
+    frame = frame.assign(day_date=frame["day_date"].dt.date)
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+
+def refresh(source: Engine, target: Engine | None = None, full: bool = False) -> list[int] | None:
+    """Compute the events that changed and replace their rows in the table
+
+    :param source: The database of the registration app
+    :type source: Engine
+    :param target: The database where the table is stored, the source by default
+    :type target: Engine | None
+    :param full: Whether to compute every event again
+    :type full: bool
+    :return: The ids of the events computed again, ``None`` if all of them were
+    :rtype: list[int] | None"""
+
+    target = target or source
+    metadata.create_all(target, checkfirst=True)
+
+    with source.connect() as connection:
+        current = rollup.signatures(connection)
+
+        changed = None
+        if not full:
+            with target.connect() as target_connection:
+                stored = stored_signatures(target_connection)
+            if not stored.empty:
+                changed = rollup.changed_events(stored, current)
+
+        if changed is None or len(changed) > rollup.MAX_INCREMENTAL_EVENTS:
+            changed = None
+            frame = rollup.compute(connection)
+        elif changed:
+            frame = rollup.compute(connection, changed)
+        else:
+            return changed
+
+    rows = _records(with_rates(frame, current))
+
+    with target.begin() as connection:
+        if changed is None:
+            connection.execute(delete(event_stats))
+        else:
+            connection.execute(delete(event_stats).where(event_stats.c.event_id.in_(changed)))
+        if rows:
+            connection.execute(event_stats.insert(), rows)
+
+    return changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m dashboard.event_stats",
+        description=f"Refresh the {TABLE} table with the statistics of the events that changed.",
+    )
+    cli.add_database_arguments(parser)
+    parser.add_argument("--target-url", help="URL of the database where the table is stored")
+    parser.add_argument("--full", action="store_true", help="Compute every event again")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    source = cli.database_engine(args)
+    target = create_engine(args.target_url) if args.target_url else None
+
+    changed = refresh(source, target, full=args.full)
+    if changed is None:
+        logger.info("Computed every event")
+    else:
+        logger.info("Computed %d changed events: %s", len(changed), changed)
+
+
+if __name__ == "__main__":
+    main()
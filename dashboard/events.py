@@ -0,0 +1,100 @@
+"""Index of the events, to find the event to analyze.
+
+It only has the id, the name, the status and the first and last date of each
+event, so it stays small with tens of thousands of events, and it is searched
+in memory while the user types.
+"""
+from datetime import date
+
+import pandas as pd
+from streamlit.connections import SQLConnection
+
+from dashboard import db, queries
+
+# Maximum number of events offered in the selectbox, the rest are found by searching
+MAX_OPTIONS = 500
+
+
+def event_index(conn: SQLConnection) -> pd.DataFrame:
+    """The events with their status and their first and last date
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :return: One row per event, indexed by its id
+    :rtype: pd.DataFrame"""
+
+    index = db.run_query(conn, queries.EVENT_INDEX, ttl=db.EVENTS_TTL)
+    return index.assign(
+        is_published=index["is_published"].astype(bool),
+        is_cancelled=index["is_cancelled"].astype(bool),
+        first_date=pd.to_datetime(index["first_date"]),
+        last_date=pd.to_datetime(index["last_date"]),
+    ).set_index("id")
+
+
+def search_events(
+    index: pd.DataFrame,
+    text: str = "",
+    *,
+    published_only: bool = False,
+    include_cancelled: bool = True,
+    upcoming_only: bool = False,
+    today: date | None = None,
+) -> pd.DataFrame:
+    """Filter the event index
+
+    The events whose name starts with the text come first, then the ones that
+    contain it, each group sorted from the most recent event to the oldest.
+
+    :param index: The events, as returned by :func:`event_index`
+    :type index: pd.DataFrame
+    :param text: Text to look for in the name of the events, ignoring case
+    :type text: str
+    :param published_only: Whether to keep only the published events
+    :type published_only: bool
+    :param include_cancelled: Whether to keep the cancelled events
+    :type include_cancelled: bool
+    :param upcoming_only: Whether to keep only the events with a date from today on
+    :type upcoming_only: bool
+    :param today: The date used by ``upcoming_only``, today by default
+    :type today: date | None
+    :return: The matching events
+    :rtype: pd.DataFrame"""
+
+    keep = pd.Series(True, index=index.index)
+    if published_only:
+        keep &= index["is_published"]
+    if not include_cancelled:
+        keep &= ~index["is_cancelled"]
+    if upcoming_only:
+        keep &= index["last_date"] >= pd.Timestamp(today or date.today())
+
+    names = index["name"].str.casefold()
+    text = text.strip().casefold()
+    if text:
+        keep &= names.str.contains(text, regex=False)
+
+    matches = index[keep]
+    return matches.assign(
+        _prefix=names[keep].str.startswith(text)
+    ).sort_values(
+        ["_prefix", "first_date"], ascending=False, na_position="last"
+    ).drop(columns="_prefix")
+
+
+def event_label(event: pd.Series) -> str:
+    """The text that identifies an event in the selectbox
+
+    Events with the same name are told apart by their first date and their id.
+
+    :param event: A row of the event index
+    :type event: pd.Series
+    :return: The label of the event
+    :rtype: str"""
+
+    label = event["name"]
+    if pd.notna(event["first_date"]):
+        label += f" ({event['first_date']:%Y-%m-%d})"
+    if event["is_cancelled"]:
+        label += " [cancelado]"
+    return f"{label} #{event.name}"
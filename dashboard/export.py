@@ -0,0 +1,168 @@
+"""Export of the attendees of an event to CSV, Parquet or Excel files, in chunks."""
+import datetime
+from typing import IO, Callable, Iterator, NamedTuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from dashboard.snapshot import ARROW_TYPES, arrow_array
+
+# Rows fetched from the database at a time
+CHUNK_ROWS = 10_000
+
+# Rows of a sheet, without the header
+XLSX_MAX_ROWS = 1_048_575
+
+# The kinds of the columns of ``queries.ATTENDEE_COLUMNS``, the others are strings
+COLUMN_KINDS = {
+    "registration_id": "int",
+    "date_of_birth": "date",
+    "registration_created_at": "datetime",
+    "reaction_date": "datetime",
+    "arrival_time": "time",
+}
+
+
+class ExportFormat(NamedTuple):
+    """A file format the attendees can be exported to"""
+
+    label: str
+    extension: str
+    mime: str
+
+
+FORMATS = {
+    "csv": ExportFormat("CSV", "csv", "text/csv"),
+    "parquet": ExportFormat("Parquet", "parquet", "application/vnd.apache.parquet"),
+    "xlsx": ExportFormat(
+        "Excel", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    ),
+}
+
+
+def schema(columns: list[str]) -> pa.Schema:
+    """The types of the exported columns
+
+    :param columns: The names of the columns, from ``queries.ATTENDEE_COLUMNS``
+    :type columns: list[str]
+    :return: The schema of the file
+    :rtype: pa.Schema"""
+
+    return pa.schema([(column, ARROW_TYPES[COLUMN_KINDS.get(column, "str")]) for column in columns])
+
+
+def chunks(
+    connection: Connection, sql: str, params: dict, columns: list[str], chunk_rows: int = CHUNK_ROWS
+) -> Iterator[pa.Table]:
+    """Fetch the rows of a query in chunks, with a server-side cursor
+
+    :param connection: The connection to the database, it can not run other
+        queries until every chunk is fetched
+    :type connection: Connection
+    :param sql: The query, it selects ``columns``
+    :type sql: str
+    :param params: The parameters of the query
+    :type params: dict
+    :param columns: The names of the selected columns
+    :type columns: list[str]
+    :param chunk_rows: The maximum number of rows of a chunk
+    :type chunk_rows: int
+    :return: The chunks, in the types of :func:`schema`
+    :rtype: Iterator[pa.Table]"""
+
+    file_schema = schema(columns)
+    streamed = connection.execution_options(stream_results=True, max_row_buffer=chunk_rows)
+    for frame in pd.read_sql(text(sql), streamed, params=params, chunksize=chunk_rows):
+        yield pa.Table.from_arrays(
+            [arrow_array(frame[column], COLUMN_KINDS.get(column, "str")) for column in columns],
+            schema=file_schema,
+        )
+
+
+def _write_csv(tables: Iterator[pa.Table], file_schema: pa.Schema, file: IO[bytes]) -> None:
+    # Whole seconds, as the database stores them
+    seconds = pa.schema([
+        field.with_type(pa.time32("s")) if pa.types.is_time(field.type)
+        else field.with_type(pa.timestamp("s")) if pa.types.is_timestamp(field.type)
+        else field
+        for field in file_schema
+    ])
+    with pa_csv.CSVWriter(file, seconds) as writer:
+        for table in tables:
+            writer.write_table(table.cast(seconds))
+
+
+def _write_parquet(tables: Iterator[pa.Table], file_schema: pa.Schema, file: IO[bytes]) -> None:
+    with pq.ParquetWriter(file, file_schema, compression="zstd") as writer:
+        for table in tables:
+            writer.write_table(table)
+
+
+def _write_xlsx(tables: Iterator[pa.Table], file_schema: pa.Schema, file: IO[bytes]) -> None:
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(file, {"constant_memory": True, "remove_timezone": True})
+    sheet = workbook.add_worksheet("Asistentes")
+    formats = {
+        datetime.datetime: workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"}),
+        datetime.date: workbook.add_format({"num_format": "yyyy-mm-dd"}),
+        datetime.time: workbook.add_format({"num_format": "hh:mm:ss"}),
+    }
+
+    sheet.write_row(0, 0, file_schema.names)
+    row = 0
+    for table in tables:
+        if row + table.num_rows > XLSX_MAX_ROWS:
+            raise ValueError(f"An Excel sheet can not have more than {XLSX_MAX_ROWS} rows")
+        for values in zip(*(column.to_pylist() for column in table.columns)):
+            row += 1
+            for column, value in enumerate(values):
+                if value is not None:
+                    sheet.write(row, column, value, formats.get(type(value)))
+    workbook.close()
+
+
+_WRITERS = {"csv": _write_csv, "parquet": _write_parquet, "xlsx": _write_xlsx}
+
+
+def write(
+    tables: Iterator[pa.Table],
+    columns: list[str],
+    format: str,
+    file: IO[bytes],
+    on_chunk: Callable[[pa.Table], None] | None = None,
+) -> int:
+    """Write the chunks of :func:`chunks` to a file, one at a time
+
+    :param tables: The chunks
+    :type tables: Iterator[pa.Table]
+    :param columns: The names of the columns, the header of an empty file
+    :type columns: list[str]
+    :param format: The format of the file, a key of ``FORMATS``
+    :type format: str
+    :param file: The binary file to write to
+    :type file: IO[bytes]
+    :param on_chunk: Called with every chunk, before it is written
+    :type on_chunk: Callable[[pa.Table], None] | None
+    :return: The number of rows written
+    :rtype: int"""
+
+    if format not in _WRITERS:
+        raise ValueError(f"Can not export to {format!r}")
+
+    rows = 0
+
+    def counted() -> Iterator[pa.Table]:
+        nonlocal rows
+        for table in tables:
+            rows += table.num_rows
+            if on_chunk is not None:
+                on_chunk(table)
+            yield table
+
+    _WRITERS[format](counted(), schema(columns), file)
+    return rows
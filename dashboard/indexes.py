@@ -0,0 +1,257 @@
+"""Indexes the queries of the dashboard need, and a command to check them.
+
+The queries filter the registrations by ``r.event_id``, join them with
+``assistant`` and ``user`` and LEFT JOIN ``attendance`` and ``eventdate`` by
+registration and date. Without an index on each of those paths every query
+scans the whole table, and nothing in the schema of the registration app
+guarantees them. The command compares :data:`REQUIRED_INDEXES` with the
+indexes of the database (the primary keys and the indexes created for the
+foreign keys count), shows the plan of every query of the dashboard and
+writes the migration that creates the missing indexes::
+
+    python -m dashboard.indexes --explain --migration indexes.sql
+
+The migration only has the indexes that are missing when it is generated, and
+every statement checks by name that the index does not exist yet, as
+``--apply`` does, so running either one again does nothing.
+"""
+import argparse
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+from sqlalchemy import Column, Index, Integer, MetaData, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex
+
+from dashboard import cli, membership, queries, rollup
+
+
+class RequiredIndex(NamedTuple):
+    """An index the dashboard needs, any index starting with its columns works"""
+
+    table: str
+    columns: tuple[str, ...]
+    reason: str
+
+    @property
+    def name(self) -> str:
+        return f"ix_{self.table}_{'_'.join(self.columns)}"
+
+
+REQUIRED_INDEXES = (
+    RequiredIndex(
+        "registration", ("event_id", "companion_id"),
+        "WHERE r.event_id = :event_id and the join with assistant",
+    ),
+    RequiredIndex(
+        "attendance", ("registration_id", "event_date_id"),
+        "LEFT JOIN attendance from the registrations of an event",
+    ),
+    RequiredIndex(
+        "attendance", ("event_date_id",),
+        "the attendances of every date, from eventdate",
+    ),
+    RequiredIndex(
+        "eventdate", ("event_id", "day_date"),
+        "the dates of an event and the join with the selected date",
+    ),
+    RequiredIndex("assistant", ("user_id",), "JOIN assistant ON a.user_id = r.companion_id"),
+)
+
+
+def _existing_indexes(connection: Connection, table: str) -> list[tuple[str, ...]]:
+    """The columns of every index of a table, the primary key included"""
+
+    inspector = inspect(connection)
+    existing = [tuple(index["column_names"]) for index in inspector.get_indexes(table)]
+    existing += [
+        tuple(constraint["column_names"])
+        for constraint in inspector.get_unique_constraints(table)
+    ]
+    primary_key = inspector.get_pk_constraint(table)["constrained_columns"]
+    if primary_key:
+        existing.append(tuple(primary_key))
+    return existing
+
+
+def missing_indexes(connection: Connection) -> list[RequiredIndex]:
+    """The required indexes that no index of the database covers
+
+    :param connection: The connection to the database
+    :type connection: Connection
+    :return: The missing indexes
+    :rtype: list[RequiredIndex]"""
+
+    missing = []
+    for required in REQUIRED_INDEXES:
+        existing = _existing_indexes(connection, required.table)
+        if not any(columns[:len(required.columns)] == required.columns for columns in existing):
+            missing.append(required)
+    return missing
+
+
+def _index(required: RequiredIndex) -> Index:
+    # Only the names of the columns are needed to create the index
+    table = Table(
+        required.table, MetaData(), *(Column(column, Integer) for column in required.columns)
+    )
+    return Index(required.name, *(table.c[column] for column in required.columns))
+
+
+def _create_statement(engine: Engine, required: RequiredIndex) -> str:
+    """The statement that creates an index unless one with its name exists"""
+
+    dialect = engine.dialect
+    if dialect.name != "mysql" or getattr(dialect, "is_mariadb", False):
+        return f"{CreateIndex(_index(required), if_not_exists=True).compile(dialect=dialect)};"
+
+    # MySQL has no CREATE INDEX IF NOT EXISTS, the statement is prepared only
+    # when information_schema does not have the index
+    create = str(CreateIndex(_index(required)).compile(dialect=dialect)).replace("'", "''")
+    return (
+        "SET @statement = IF(\n"
+        "    (SELECT COUNT(*) FROM information_schema.statistics\n"
+        f"     WHERE table_schema = DATABASE() AND table_name = '{required.table}'"
+        f" AND index_name = '{required.name}') = 0,\n"
+        f"    '{create}',\n"
+        "    'DO 0'\n"
+        ");\n"
+        "PREPARE statement FROM @statement;\n"
+        "EXECUTE statement;\n"
+        "DEALLOCATE PREPARE statement;"
+    )
+
+
+def migration(engine: Engine, indexes: list[RequiredIndex]) -> str:
+    """The SQL that creates the indexes, in the dialect of the database
+
+    Every statement is skipped when the index already exists, so the migration
+    can be run more than once.
+
+    :param engine: The database the migration is for
+    :type engine: Engine
+    :param indexes: The indexes to create
+    :type indexes: list[RequiredIndex]
+    :return: The statements, one per index
+    :rtype: str"""
+
+    statements = [
+        f"-- {required.reason}\n{_create_statement(engine, required)}\n" for required in indexes
+    ]
+    return "\n".join(statements)
+
+
+def apply(engine: Engine, indexes: list[RequiredIndex]) -> None:
+    """Create the indexes that do not exist yet
+
+    :param engine: The database
+    :type engine: Engine
+    :param indexes: The indexes to create
+    :type indexes: list[RequiredIndex]"""
+
+    with engine.begin() as connection:
+        for required in indexes:
+            _index(required).create(connection, checkfirst=True)
+
+
+def dashboard_queries(dialect: str) -> dict[str, str]:
+    """Every query the dashboard runs, by name
+
+    :param dialect: The SQLAlchemy dialect name
+    :type dialect: str
+    :return: The queries
+    :rtype: dict[str, str]"""
+
+    return {
+        "event index": queries.EVENT_INDEX,
+        "event dates": queries.EVENT_DATES,
+        "attendee cube": queries.attendee_cube(dialect),
+        "date counts": queries.date_counts(dialect),
+        "attended dates": queries.ATTENDED_DATES,
+        "registrations": queries.REGISTRATIONS,
+        "registration changes": queries.REGISTRATIONS_CHANGES,
+        "attendees page": queries.attendees_page(
+            dialect, ["first_name", "last_name"], "registration_id", False, False, search=False, after=False
+        ),
+        "rollup signatures": rollup.SIGNATURES,
+        "rollup dates": rollup.dates_query(dialect, filtered=False),
+        "rollup registrations": rollup.registrations_query(filtered=False),
+        "membership registrations": membership.REGISTRATIONS,
+        "membership attendances": membership.ATTENDANCES,
+    }
+
+
+def _sample_params(connection: Connection) -> dict:
+    """Parameters for every query, with the date of an event of the database"""
+
+    row = connection.execute(text("SELECT event_id, day_date FROM eventdate LIMIT 1")).first()
+    event_id, day_date = row if row is not None else (0, "1970-01-01")
+    return {
+        "event_id": event_id,
+        "day_date": day_date,
+        "created_since": "1970-01-01 00:00:00",
+        "reaction_since": "1970-01-01 00:00:00",
+        "arrival_since": "00:00:00",
+        "page_size": 50,
+        "after_id": 0,
+        "since": "1970-01-01",
+    }
+
+
+def explain(connection: Connection, sql: str, params: dict) -> pd.DataFrame:
+    """The plan of a query
+
+    :param connection: The connection to the database
+    :type connection: Connection
+    :param sql: The query
+    :type sql: str
+    :param params: The parameters of the query, the unused ones are ignored
+    :type params: dict
+    :return: The rows of ``EXPLAIN`` (MySQL) or ``EXPLAIN QUERY PLAN`` (SQLite)
+    :rtype: pd.DataFrame"""
+
+    prefix = "EXPLAIN QUERY PLAN" if connection.dialect.name == "sqlite" else "EXPLAIN"
+    statement = text(f"{prefix} {sql}")
+    used = {name: value for name, value in params.items() if name in statement.compile().params}
+    return pd.read_sql(statement, connection, params=used)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m dashboard.indexes",
+        description="Check the indexes the queries of the dashboard need.",
+    )
+    cli.add_database_arguments(parser)
+    parser.add_argument("--explain", action="store_true", help="Show the plan of every query")
+    parser.add_argument("--migration", type=Path, help="Write the SQL of the missing indexes to this file")
+    parser.add_argument("--apply", action="store_true", help="Create the missing indexes")
+    args = parser.parse_args()
+
+    engine = cli.database_engine(args)
+
+    with engine.connect() as connection:
+        missing = missing_indexes(connection)
+
+        for required in REQUIRED_INDEXES:
+            status = "MISSING" if required in missing else "ok"
+            print(f"{status:8} {required.table}({', '.join(required.columns)}): {required.reason}")
+
+        if args.explain:
+            params = _sample_params(connection)
+            with pd.option_context("display.width", 200, "display.max_colwidth", 120):
+                for name, sql in dashboard_queries(engine.dialect.name).items():
+                    print(f"\n== {name}")
+                    print(explain(connection, sql, params).to_string(index=False))
+
+    if args.migration:
+        args.migration.write_text(migration(engine, missing))
+        print(f"\nWrote {len(missing)} indexes to {args.migration}")
+
+    if args.apply:
+        apply(engine, missing)
+        print(f"\nCreated {len(missing)} indexes")
+
+
+if __name__ == "__main__":
+    main()
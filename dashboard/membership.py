@@ -0,0 +1,167 @@
+"""The people of every event as sorted arrays of ids, to find repeat attendees."""
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+_NO_DATE = date(1970, 1, 1)
+_EMPTY = np.array([], dtype=np.int64)
+
+REGISTRATIONS = """
+    SELECT r.id AS registration_id, r.event_id, r.companion_id
+    FROM registration AS r
+    WHERE r.id > :after_id
+"""
+
+ATTENDANCES = """
+    SELECT DISTINCT ed.event_id, r.companion_id
+    FROM attendance AS att
+    JOIN eventdate AS ed ON ed.id = att.event_date_id
+    JOIN registration AS r ON r.id = att.registration_id
+    WHERE ed.day_date >= :since
+"""
+
+
+def _merge(people: dict[int, np.ndarray], pairs: pd.DataFrame) -> None:
+    """Add the ``(event_id, companion_id)`` pairs to the sorted arrays of each event"""
+
+    for event_id, companions in pairs.groupby("event_id")["companion_id"]:
+        new = companions.to_numpy(dtype=np.int64)
+        people[int(event_id)] = np.union1d(people.get(int(event_id), _EMPTY), new)
+
+
+class MembershipIndex:
+    """The people of every event, kept up to date with :meth:`refresh`"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the loaded people, the next refresh loads all of them again"""
+
+        with self.lock:
+            self.registered: dict[int, np.ndarray] = {}
+            self.attended: dict[int, np.ndarray] = {}
+            self.last_registration_id = 0
+            self.refreshed_at: datetime | None = None
+            # The results of previous_event_counts, by event, kind and previous events
+            self._previous_counts: dict[tuple, pd.Series] = {}
+
+    def is_recent(self, max_age: timedelta | None) -> bool:
+        """Whether the index was refreshed less than ``max_age`` ago, a refresh
+        with that ``max_age`` would do nothing
+
+        :param max_age: The age of the index a refresh skips, ``None`` never skips it
+        :type max_age: timedelta | None
+        :return: Whether the index is recent
+        :rtype: bool"""
+
+        refreshed_at = self.refreshed_at
+        return (
+            max_age is not None
+            and refreshed_at is not None
+            and datetime.now() - refreshed_at < max_age
+        )
+
+    def refresh(self, connection: Connection, max_age: timedelta | None = None) -> int:
+        """Load the registrations and attendances since the last refresh
+
+        :param connection: The connection to the database
+        :type connection: Connection
+        :param max_age: Skip the refresh if the index was refreshed more recently
+        :type max_age: timedelta | None
+        :return: The number of rows fetched
+        :rtype: int"""
+
+        with self.lock:
+            now = datetime.now()
+            if self.is_recent(max_age):
+                return 0
+
+            since = _NO_DATE if self.refreshed_at is None else self.refreshed_at.date()
+
+            registrations = pd.read_sql(
+                text(REGISTRATIONS), connection,
+                params={"after_id": self.last_registration_id},
+            )
+            attendances = pd.read_sql(text(ATTENDANCES), connection, params={"since": since})
+
+            _merge(self.registered, registrations)
+            _merge(self.attended, attendances)
+            if not registrations.empty or not attendances.empty:
+                self._previous_counts.clear()
+            if not registrations.empty:
+                self.last_registration_id = int(registrations["registration_id"].max())
+            self.refreshed_at = now
+            return len(registrations) + len(attendances)
+
+    def people(self, event_id: int, attended: bool = False) -> np.ndarray:
+        """The sorted ids of the people of an event
+
+        :param event_id: The id of the event
+        :type event_id: int
+        :param attended: Whether to return the people who attended instead of
+            the people who registered
+        :type attended: bool
+        :return: The ``companion_id`` of the people
+        :rtype: np.ndarray"""
+
+        people = self.attended if attended else self.registered
+        return people.get(int(event_id), _EMPTY)
+
+    def overlap(self, event_id: int, other_event_id: int, attended: bool = False) -> int:
+        """Number of people in both events
+
+        :param event_id: The id of an event
+        :type event_id: int
+        :param other_event_id: The id of the other event
+        :type other_event_id: int
+        :param attended: Whether to compare the people who attended
+        :type attended: bool
+        :return: The number of people in both events
+        :rtype: int"""
+
+        return len(np.intersect1d(
+            self.people(event_id, attended),
+            self.people(other_event_id, attended),
+            assume_unique=True,
+        ))
+
+    def previous_event_counts(
+        self, event_id: int, previous_event_ids, attended: bool = False
+    ) -> pd.Series:
+        """Number of previous events of each person of an event
+
+        The counts are computed once per event and kept until a refresh loads
+        new rows.
+
+        :param event_id: The id of the event
+        :type event_id: int
+        :param previous_event_ids: The ids of the events that happened before
+        :param attended: Whether to count the events the people attended,
+            for the people who attended the event, instead of the registrations
+        :type attended: bool
+        :return: The number of previous events, indexed by ``companion_id``
+        :rtype: pd.Series"""
+
+        previous_event_ids = tuple(sorted(map(int, previous_event_ids)))
+        key = (int(event_id), attended, previous_event_ids)
+
+        with self.lock:
+            counts = self._previous_counts.get(key)
+            if counts is None:
+                people = self.people(event_id, attended)
+                events = np.zeros(len(people), dtype=np.int64)
+                for previous_event_id in previous_event_ids:
+                    previous_people = self.people(previous_event_id, attended)
+                    if len(previous_people):
+                        events += np.isin(people, previous_people, assume_unique=True)
+                counts = pd.Series(
+                    events, index=pd.Index(people, name="companion_id"), name="events"
+                )
+                self._previous_counts[key] = counts
+            return counts
@@ -0,0 +1,129 @@
+"""Health of the connection pool of the database."""
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+
+class PoolStatus(NamedTuple):
+    """The state of the pool and its counters, since the server started"""
+
+    size: int | None
+    checked_out: int | None
+    overflow: int | None
+    connections_opened: int
+    checkouts: int
+    errors: int
+    mean_wait: float
+    max_wait: float
+
+
+class PoolMetrics:
+    """Counters of the connection pools of the engines attached to it"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._engines: weakref.WeakSet[Engine] = weakref.WeakSet()
+        self.connections_opened = 0
+        self.checkouts = 0
+        self.errors = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def attach(self, engine: Engine) -> bool:
+        """Count the events of the pool of an engine
+
+        :param engine: The engine
+        :type engine: Engine
+        :return: Whether the engine was not attached yet
+        :rtype: bool"""
+
+        with self._lock:
+            if engine in self._engines:
+                return False
+            self._engines.add(engine)
+
+        event.listen(engine.pool, "connect", lambda *args: self._count("connections_opened"))
+        event.listen(engine.pool, "checkout", lambda *args: self._count("checkouts"))
+        event.listen(
+            engine,
+            "handle_error",
+            lambda context: self._count("errors") if context.is_disconnect else None,
+        )
+        return True
+
+    @contextmanager
+    def connect(self, engine: Engine) -> Iterator[Connection]:
+        """``engine.connect()``, measuring how long it waits for a connection
+
+        :param engine: The engine
+        :type engine: Engine
+        :return: The connection, closed when the block ends
+        :rtype: Iterator[Connection]"""
+
+        start = time.perf_counter()
+        try:
+            connection = engine.connect()
+        except Exception:
+            self._count("errors")
+            raise
+
+        wait = time.perf_counter() - start
+        with self._lock:
+            self.waits += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        with connection:
+            yield connection
+
+    def warm_up(self, engine: Engine, connections: int) -> None:
+        """Open some connections and leave them in the pool
+
+        :param engine: The engine
+        :type engine: Engine
+        :param connections: The number of connections to open
+        :type connections: int"""
+
+        opened = []
+        try:
+            for _ in range(connections):
+                opened.append(engine.connect())
+        except Exception:
+            # The first queries will open the connections, and fail if the
+            # database is really down
+            self._count("errors")
+        finally:
+            for connection in opened:
+                connection.close()
+
+    def status(self, engine: Engine) -> PoolStatus:
+        """The state of the pool of an engine and the counters
+
+        :param engine: The engine
+        :type engine: Engine
+        :return: The status, the size of the pool is ``None`` if the pool
+            does not have one
+        :rtype: PoolStatus"""
+
+        pool = engine.pool
+        with self._lock:
+            return PoolStatus(
+                size=pool.size() if hasattr(pool, "size") else None,
+                checked_out=pool.checkedout() if hasattr(pool, "checkedout") else None,
+                overflow=pool.overflow() if hasattr(pool, "overflow") else None,
+                connections_opened=self.connections_opened,
+                checkouts=self.checkouts,
+                errors=self.errors,
+                mean_wait=self.total_wait / self.waits if self.waits else 0.0,
+                max_wait=self.max_wait,
+            )
@@ -0,0 +1,337 @@
+"""SQL used by the dashboard pages.
+
+Every statement uses bound parameters (``:event_id``, ``:day_date``) so the
+text of the query is the same for every event and date. The few expressions
+that are not portable between MySQL (production), SQLite (local copies of
+the database) and DuckDB (snapshots) are rendered with :func:`sql_function`.
+"""
+import functools
+
+_DIALECT_FUNCTIONS = {
+    "mysql": {
+        "hour": "HOUR({0})",
+        # Age in whole years of a person born on {0} at the date {1}
+        "age": "TIMESTAMPDIFF(YEAR, {0}, {1})",
+        # Case-insensitive with the default collations of MySQL and SQLite
+        "like": "{0} LIKE {1}",
+    },
+    "sqlite": {
+        "hour": "CAST(strftime('%H', {0}) AS INTEGER)",
+        "age": (
+            "(CAST(strftime('%Y', {1}) AS INTEGER) - CAST(strftime('%Y', {0}) AS INTEGER)"
+            " - (strftime('%m-%d', {1}) < strftime('%m-%d', {0})))"
+        ),
+        "like": "{0} LIKE {1}",
+    },
+    # The snapshots of :mod:`dashboard.snapshot`
+    "duckdb": {
+        "hour": "hour({0})",
+        "age": (
+            "(year(CAST({1} AS DATE)) - year(CAST({0} AS DATE))"
+            " - CAST(strftime(CAST({1} AS DATE), '%m-%d') < strftime(CAST({0} AS DATE), '%m-%d') AS INTEGER))"
+        ),
+        # LIKE is case-sensitive in DuckDB
+        "like": "{0} ILIKE {1}",
+    },
+}
+
+
+def sql_function(dialect: str, name: str, *columns: str) -> str:
+    """Render a SQL function call for the given dialect
+
+    :param dialect: The SQLAlchemy dialect name, e.g. ``"mysql"``
+    :type dialect: str
+    :param name: The name of the function in ``_DIALECT_FUNCTIONS``
+    :type name: str
+    :param columns: The columns (or expressions) passed to the function
+    :type columns: str
+    :return: The SQL expression
+    :rtype: str"""
+
+    functions = _DIALECT_FUNCTIONS.get(dialect, _DIALECT_FUNCTIONS["mysql"])
+    return functions[name].format(*columns)
+
+
+# Only the columns needed to find an event, the description is not loaded
+EVENT_INDEX = """
+    SELECT
+        e.id,
+        e.name,
+        e.is_published,
+        e.is_cancelled,
+        MIN(ed.day_date) AS first_date,
+        MAX(ed.day_date) AS last_date
+    FROM event AS e
+    LEFT JOIN eventdate AS ed ON ed.event_id = e.id
+    GROUP BY e.id, e.name, e.is_published, e.is_cancelled
+"""
+
+EVENT_DATES = "SELECT * FROM eventdate WHERE event_id = :event_id"
+
+
+# Registrations of an event together with their attendance to the selected
+# date. The date is part of the joins, not of the WHERE, so the people who
+# attended another date of the event are kept as not attended to this one.
+REGISTRATIONS_FROM = """
+    FROM registration AS r
+    JOIN assistant AS a ON a.user_id = r.companion_id
+    LEFT JOIN eventdate AS ed ON ed.event_id = r.event_id AND ed.day_date = :day_date
+    LEFT JOIN attendance AS att ON att.registration_id = r.id AND att.event_date_id = ed.id
+    WHERE r.event_id = :event_id
+"""
+
+
+def attendee_cube(dialect: str) -> str:
+    """Number of registrations by attendance, gender, age at the date of the
+    event, reaction and hour of arrival, every chart of a date is a slice of it"""
+
+    return f"""
+    SELECT
+        att.arrival_time IS NOT NULL AS attended,
+        a.gender,
+        {sql_function(dialect, "age", "a.date_of_birth", ":day_date")} AS age,
+        r.reaction,
+        {sql_function(dialect, "hour", "att.arrival_time")} AS hour,
+        COUNT(*) AS total
+    {REGISTRATIONS_FROM}
+    GROUP BY attended, a.gender, age, r.reaction, hour
+    """
+
+
+def date_counts(dialect: str) -> str:
+    """Number of attendees of every date of an event by gender, age and hour of arrival"""
+
+    return f"""
+    SELECT
+        ed.day_date,
+        a.gender,
+        {sql_function(dialect, "age", "a.date_of_birth", "ed.day_date")} AS age,
+        {sql_function(dialect, "hour", "att.arrival_time")} AS hour,
+        COUNT(*) AS total
+    FROM attendance AS att
+    JOIN eventdate AS ed ON ed.id = att.event_date_id
+    JOIN registration AS r ON r.id = att.registration_id
+    JOIN assistant AS a ON a.user_id = r.companion_id
+    WHERE r.event_id = :event_id
+    GROUP BY ed.day_date, a.gender, age, hour
+    """
+
+
+# Every registration of an event with the dates it attended, one row per
+# attended date and one row without date for the people who did not attend
+ATTENDED_DATES = """
+    SELECT
+        r.id AS registration_id,
+        u.first_name,
+        u.last_name,
+        ed.day_date
+    FROM registration AS r
+    JOIN user AS u ON u.id = r.companion_id
+    JOIN assistant AS a ON a.user_id = u.id
+    LEFT JOIN attendance AS att ON att.registration_id = r.id
+    LEFT JOIN eventdate AS ed ON ed.id = att.event_date_id
+    WHERE r.event_id = :event_id
+"""
+
+
+# The columns of the registrations used by the statistics, without the
+# contact and identification data of the people
+REGISTRATIONS = f"""
+    SELECT
+        r.id AS registration_id,
+        r.companion_id,
+        r.created_at AS registration_created_at,
+        r.reaction,
+        r.reaction_date,
+        a.gender,
+        a.date_of_birth,
+        att.arrival_time,
+        ed.day_date
+    {REGISTRATIONS_FROM}
+"""
+
+# Rows of REGISTRATIONS that are new or changed since the last load: new
+# registrations, new reactions and new check-ins. The marks use ``>=`` because
+# a row can be written in the same second as the last loaded one, the rows
+# fetched again are replaced by ``dataset.merge_changes``.
+REGISTRATIONS_CHANGES = REGISTRATIONS + """
+    AND (
+        r.created_at >= :created_since
+        OR r.reaction_date >= :reaction_since
+        OR att.arrival_time >= :arrival_since
+    )
+"""
+
+
+# Columns that can be shown in the table of attendees, by name
+ATTENDEE_COLUMNS = {
+    "registration_id": "r.id",
+    "first_name": "u.first_name",
+    "last_name": "u.last_name",
+    "email": "u.email",
+    "phone": "a.phone",
+    "id_number_type": "a.id_number_type",
+    "id_number": "a.id_number",
+    "gender": "a.gender",
+    "date_of_birth": "a.date_of_birth",
+    "companion_type": "r.companion_type",
+    "registration_created_at": "r.created_at",
+    "reaction": "r.reaction",
+    "reaction_date": "r.reaction_date",
+    "arrival_time": "att.arrival_time",
+}
+
+# Columns the table can be sorted by. They can not be NULL, the keyset
+# pagination would skip the rows with NULL otherwise.
+ATTENDEE_SORT_COLUMNS = (
+    "registration_id",
+    "registration_created_at",
+    "first_name",
+    "last_name",
+    "email",
+)
+
+ATTENDEE_SEARCH_COLUMNS = ("u.first_name", "u.last_name", "u.email", "a.id_number")
+
+ATTENDEES_FROM = """FROM registration AS r
+    JOIN user AS u ON u.id = r.companion_id
+    JOIN assistant AS a ON a.user_id = u.id
+    LEFT JOIN eventdate AS ed ON ed.event_id = r.event_id AND ed.day_date = :day_date
+    LEFT JOIN attendance AS att ON att.registration_id = r.id AND att.event_date_id = ed.id
+    WHERE r.event_id = :event_id"""
+
+
+def _attendee_conditions(dialect: str, attended_only: bool, search: bool) -> str:
+    conditions = ""
+    if attended_only:
+        conditions += "\n    AND att.arrival_time IS NOT NULL"
+    if search:
+        matches = " OR ".join(
+            sql_function(dialect, "like", column, ":search") for column in ATTENDEE_SEARCH_COLUMNS
+        )
+        conditions += f"\n    AND ({matches})"
+    return conditions
+
+
+def attendees_page(
+    dialect: str,
+    columns: list[str],
+    sort_column: str,
+    descending: bool,
+    attended_only: bool,
+    search: bool,
+    after: bool,
+) -> str:
+    """One page of attendees, using keyset pagination on ``(sort_column, r.id)``.
+
+    The values come from bound parameters: ``:search`` is a case-insensitive
+    ``LIKE`` pattern, ``:after_value`` and ``:after_id`` are the sort value and
+    the id of the last row of the previous page and ``:page_size`` the number
+    of rows to return.
+
+    :param dialect: The SQLAlchemy dialect name
+    :type dialect: str
+    :param columns: The names of the columns to select, from ``ATTENDEE_COLUMNS``
+    :type columns: list[str]
+    :param sort_column: The column to sort by, from ``ATTENDEE_SORT_COLUMNS``
+    :type sort_column: str
+    :param descending: Whether to sort in descending order
+    :type descending: bool
+    :param attended_only: Whether to return only the people who attended
+    :type attended_only: bool
+    :param search: Whether to filter by ``:search``
+    :type search: bool
+    :param after: Whether to start after ``:after_value`` and ``:after_id``
+    :type after: bool
+    :return: The query
+    :rtype: str"""
+
+    if sort_column not in ATTENDEE_SORT_COLUMNS:
+        raise ValueError(f"Can not sort the attendees by {sort_column!r}")
+
+    # The id and the sort column are always selected, they are the cursor
+    selected = dict.fromkeys(["registration_id", *columns, sort_column])
+    select = ",\n        ".join(
+        f"{ATTENDEE_COLUMNS[column]} AS {column}" for column in selected
+    )
+    sort = ATTENDEE_COLUMNS[sort_column]
+    direction, comparison = ("DESC", "<") if descending else ("ASC", ">")
+
+    conditions = _attendee_conditions(dialect, attended_only, search)
+    if after:
+        conditions += (
+            f"\n    AND ({sort} {comparison} :after_value"
+            f" OR ({sort} = :after_value AND r.id {comparison} :after_id))"
+        )
+
+    return f"""
+    SELECT
+        {select}
+    {ATTENDEES_FROM}{conditions}
+    ORDER BY {sort} {direction}, r.id {direction}
+    LIMIT :page_size
+    """
+
+
+def attendees_export(
+    dialect: str,
+    columns: list[str],
+    attended_only: bool,
+    search: bool,
+    ages: bool,
+) -> str:
+    """Every attendee of an event, in the order of registration, to be fetched in chunks.
+
+    The filters are the ones of :func:`attendees_page`, and ``:min_age`` and
+    ``:max_age`` the ages at the date of the event, both included.
+
+    :param dialect: The SQLAlchemy dialect name
+    :type dialect: str
+    :param columns: The names of the columns to select, from ``ATTENDEE_COLUMNS``
+    :type columns: list[str]
+    :param attended_only: Whether to return only the people who attended
+    :type attended_only: bool
+    :param search: Whether to filter by ``:search``
+    :type search: bool
+    :param ages: Whether to filter by ``:min_age`` and ``:max_age``, the people
+        without date of birth are left out
+    :type ages: bool
+    :return: The query
+    :rtype: str"""
+
+    select = ",\n        ".join(f"{ATTENDEE_COLUMNS[column]} AS {column}" for column in columns)
+    conditions = _attendee_conditions(dialect, attended_only, search)
+    if ages:
+        age = sql_function(dialect, "age", "a.date_of_birth", ":day_date")
+        conditions += f"\n    AND {age} BETWEEN :min_age AND :max_age"
+
+    return f"""
+    SELECT
+        {select}
+    {ATTENDEES_FROM}{conditions}
+    ORDER BY r.id
+    """
+
+
+@functools.lru_cache(maxsize=256)
+def query_name(sql: str) -> str:
+    """A short name of a query of this module, for the timings
+
+    :param sql: The query
+    :type sql: str
+    :return: The name of its constant or function in lower case, or the
+        beginning of the query if it is not one of this module
+    :rtype: str"""
+
+    for name, value in globals().items():
+        if name.isupper() and value == sql:
+            return name.lower()
+    for dialect in _DIALECT_FUNCTIONS:
+        for function in (attendee_cube, date_counts):
+            if function(dialect) == sql:
+                return function.__name__
+    if sql.rstrip().endswith("LIMIT :page_size"):
+        return attendees_page.__name__
+    if sql.rstrip().endswith("ORDER BY r.id"):
+        return attendees_export.__name__
+    return " ".join(sql.split())[:60]
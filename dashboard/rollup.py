@@ -0,0 +1,235 @@
+"""Summary of every event and date, refreshed incrementally, for the statistics across events."""
+import threading
+from datetime import datetime, timedelta
+from typing import Any
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+
+from dashboard.queries import sql_function
+
+# Age bands of the attendees, as (column, lowest age, highest age)
+AGE_BANDS = (
+    ("age_under_18", None, 17),
+    ("age_18_25", 18, 25),
+    ("age_26_35", 26, 35),
+    ("age_36_50", 36, 50),
+    ("age_51_64", 51, 64),
+    ("age_65_plus", 65, None),
+)
+
+GENDER_COLUMNS = {"MALE": "male", "FEMALE": "female", "OTHER": "other"}
+REACTION_COLUMNS = {"LIKE": "likes", "DISLIKE": "dislikes", "NO_REACTION": "no_reaction"}
+
+# Attendees by hour of arrival, one column per hour of the day
+HOUR_COLUMNS = tuple(f"hour_{hour:02d}" for hour in range(24))
+
+# Computing the changed events one by one is slower than computing all of
+# them again when most of them changed
+MAX_INCREMENTAL_EVENTS = 200
+
+SIGNATURES = """
+    SELECT
+        r.event_id,
+        COUNT(*) AS registrations,
+        COUNT(att.registration_id) AS attendances,
+        MAX(r.created_at) AS last_registration,
+        MAX(r.reaction_date) AS last_reaction
+    FROM registration AS r
+    LEFT JOIN attendance AS att ON att.registration_id = r.id
+    GROUP BY r.event_id
+"""
+
+
+def _count_when(condition: str, column: str) -> str:
+    return f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) AS {column}"
+
+
+def _age_condition(age: str, lowest: int | None, highest: int | None) -> str:
+    if lowest is None:
+        return f"{age} <= {highest}"
+    if highest is None:
+        return f"{age} >= {lowest}"
+    return f"{age} BETWEEN {lowest} AND {highest}"
+
+
+def dates_query(dialect: str, filtered: bool) -> str:
+    """Attendances of each event date, by gender, age band and hour of arrival
+
+    :param dialect: The SQLAlchemy dialect name
+    :type dialect: str
+    :param filtered: Whether to compute only the events in ``:event_ids``
+    :type filtered: bool
+    :return: The query
+    :rtype: str"""
+
+    age = sql_function(dialect, "age", "a.date_of_birth", "ed.day_date")
+    hour = sql_function(dialect, "hour", "att.arrival_time")
+    counts = [
+        _count_when(f"a.gender = '{gender}'", column)
+        for gender, column in GENDER_COLUMNS.items()
+    ] + [
+        _count_when(_age_condition(age, lowest, highest), column)
+        for column, lowest, highest in AGE_BANDS
+    ] + [
+        _count_when(f"{hour} = {number}", column)
+        for number, column in enumerate(HOUR_COLUMNS)
+    ]
+    columns = ",\n        ".join(counts)
+    where = "WHERE ed.event_id IN :event_ids" if filtered else ""
+
+    return f"""
+    SELECT
+        ed.event_id,
+        ed.day_date,
+        e.capacity,
+        COUNT(att.registration_id) AS attended,
+        {columns}
+    FROM eventdate AS ed
+    JOIN event AS e ON e.id = ed.event_id
+    LEFT JOIN attendance AS att ON att.event_date_id = ed.id
+    LEFT JOIN registration AS r ON r.id = att.registration_id
+    LEFT JOIN assistant AS a ON a.user_id = r.companion_id
+    {where}
+    GROUP BY ed.event_id, ed.day_date, e.capacity
+    """
+
+
+def registrations_query(filtered: bool) -> str:
+    """Registrations of each event, by reaction
+
+    :param filtered: Whether to compute only the events in ``:event_ids``
+    :type filtered: bool
+    :return: The query
+    :rtype: str"""
+
+    columns = ",\n        ".join(
+        _count_when(f"r.reaction = '{reaction}'", column)
+        for reaction, column in REACTION_COLUMNS.items()
+    )
+    where = "WHERE r.event_id IN :event_ids" if filtered else ""
+
+    return f"""
+    SELECT
+        r.event_id,
+        COUNT(*) AS registered,
+        {columns}
+    FROM registration AS r
+    JOIN assistant AS a ON a.user_id = r.companion_id
+    {where}
+    GROUP BY r.event_id
+    """
+
+
+def _read(connection: Connection, sql: str, event_ids: list[int] | None) -> pd.DataFrame:
+    statement = text(sql)
+    params: dict[str, Any] = {}
+    if event_ids is not None:
+        statement = statement.bindparams(bindparam("event_ids", expanding=True))
+        params["event_ids"] = event_ids
+    return pd.read_sql(statement, connection, params=params)
+
+
+def compute(connection: Connection, event_ids: list[int] | None = None) -> pd.DataFrame:
+    """Compute the rollup of some events, or of all of them
+
+    The registrations and the reactions belong to the event, so they are the
+    same in every date of the event. A capacity of 0 means the event has none.
+
+    :param connection: The connection to the database
+    :type connection: Connection
+    :param event_ids: The events to compute, ``None`` for all of them
+    :type event_ids: list[int] | None
+    :return: One row per event date
+    :rtype: pd.DataFrame"""
+
+    dialect = connection.dialect.name
+    filtered = event_ids is not None
+
+    dates = _read(connection, dates_query(dialect, filtered), event_ids)
+    registrations = _read(connection, registrations_query(filtered), event_ids)
+
+    rollup = dates.merge(registrations, on="event_id", how="left")
+    counts = [column for column in rollup.columns if column not in ("event_id", "day_date")]
+    rollup[counts] = rollup[counts].fillna(0).astype("int64")
+    rollup["day_date"] = pd.to_datetime(rollup["day_date"])
+    return rollup.sort_values(["event_id", "day_date"], ignore_index=True)
+
+
+def signatures(connection: Connection) -> pd.DataFrame:
+    """The signature of every event with registrations, indexed by event id
+
+    :param connection: The connection to the database
+    :type connection: Connection
+    :return: The signatures
+    :rtype: pd.DataFrame"""
+
+    frame = pd.read_sql(text(SIGNATURES), connection)
+    frame["last_registration"] = pd.to_datetime(frame["last_registration"])
+    frame["last_reaction"] = pd.to_datetime(frame["last_reaction"])
+    return frame.set_index("event_id").sort_index()
+
+
+def changed_events(old: pd.DataFrame, new: pd.DataFrame) -> list[int]:
+    """The events whose signature is different, including new and deleted events
+
+    :param old: The signatures of the last refresh
+    :type old: pd.DataFrame
+    :param new: The current signatures
+    :type new: pd.DataFrame
+    :return: The ids of the events that changed
+    :rtype: list[int]"""
+
+    old, new = old.align(new, join="outer")
+    different = (old != new) & ~(old.isna() & new.isna())
+    return [int(event_id) for event_id in different.index[different.any(axis=1)]]
+
+
+class Rollup:
+    """The rollup of all the events, kept up to date with :meth:`refresh`"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.frame: pd.DataFrame | None = None
+        self.signatures: pd.DataFrame | None = None
+        self.refreshed_at: datetime | None = None
+
+    def refresh(
+        self, connection: Connection, max_age: timedelta | None = None
+    ) -> list[int] | None:
+        """Compute again the events that changed since the last refresh
+
+        :param connection: The connection to the database
+        :type connection: Connection
+        :param max_age: Skip the refresh if the rollup was refreshed more recently
+        :type max_age: timedelta | None
+        :return: The ids of the events computed again, ``None`` if all of them were
+        :rtype: list[int] | None"""
+
+        with self.lock:
+            if (
+                max_age is not None
+                and self.refreshed_at is not None
+                and datetime.now() - self.refreshed_at < max_age
+            ):
+                return []
+
+            current = signatures(connection)
+
+            changed = None
+            if self.frame is not None and self.signatures is not None:
+                changed = changed_events(self.signatures, current)
+
+            if changed is None or len(changed) > MAX_INCREMENTAL_EVENTS:
+                changed = None
+                self.frame = compute(connection)
+            elif changed:
+                kept = self.frame[~self.frame["event_id"].isin(changed)]
+                self.frame = pd.concat(
+                    [kept, compute(connection, changed)], ignore_index=True
+                ).sort_values(["event_id", "day_date"], ignore_index=True)
+
+            self.signatures = current
+            self.refreshed_at = datetime.now()
+            return changed
@@ -0,0 +1,294 @@
+"""Parquet snapshots of the database, written by ``python -m dashboard.snapshot`` and read with DuckDB."""
+import argparse
+import json
+import threading
+import weakref
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+
+from dashboard import cli
+
+MANIFEST = "snapshot.json"
+
+_NO_DATETIME = datetime(1970, 1, 1)
+
+# Rows of each row group, the smallest unit DuckDB skips
+ROW_GROUP_SIZE = 100_000
+
+ARROW_TYPES = {
+    "int": pa.int64(),
+    "str": pa.string(),
+    "date": pa.date32(),
+    "time": pa.time64("us"),
+    "datetime": pa.timestamp("us"),
+}
+
+
+class SnapshotTable(NamedTuple):
+    """A table copied to the snapshot"""
+
+    name: str
+    # The copied columns and their types, from ``ARROW_TYPES``
+    columns: dict[str, str]
+    # The rows are sorted by these columns, the first ones are the filters of the queries
+    sort: tuple[str, ...]
+    # The changed rows replace the rows with the same key
+    key: tuple[str, ...] = ()
+    # The rows changed since the last run, ``None`` to copy the whole table
+    changes: str | None = None
+
+
+TABLES = (
+    SnapshotTable(
+        "event",
+        {
+            "id": "int", "name": "str", "location": "str", "capacity": "int",
+            "capacity_type": "str", "created_at": "datetime", "is_cancelled": "int",
+            "is_published": "int", "organizer_id": "int",
+        },
+        sort=("id",),
+    ),
+    SnapshotTable(
+        "eventdate",
+        {
+            "id": "int", "event_id": "int", "day_date": "date", "start_time": "time",
+            "end_time": "time", "deleted": "int",
+        },
+        sort=("event_id", "day_date"),
+    ),
+    SnapshotTable(
+        "registration",
+        {
+            "id": "int", "event_id": "int", "assistant_id": "int", "companion_id": "int",
+            "companion_type": "str", "created_at": "datetime", "reaction": "str",
+            "reaction_date": "datetime",
+        },
+        sort=("event_id", "id"),
+        key=("id",),
+        changes="id > :last_id OR created_at >= :last_change OR reaction_date >= :last_change",
+    ),
+    SnapshotTable(
+        "attendance",
+        {"event_date_id": "int", "registration_id": "int", "arrival_time": "time"},
+        sort=("event_date_id", "registration_id"),
+        key=("event_date_id", "registration_id"),
+        changes="event_date_id IN (SELECT id FROM eventdate WHERE day_date >= :last_date)",
+    ),
+    SnapshotTable(
+        "assistant",
+        {
+            "user_id": "int", "id_number": "str", "id_number_type": "str", "phone": "str",
+            "gender": "str", "date_of_birth": "date",
+        },
+        sort=("user_id",),
+        key=("user_id",),
+        changes="user_id > :last_id",
+    ),
+    SnapshotTable(
+        "user",
+        {"id": "int", "email": "str", "first_name": "str", "last_name": "str", "created_at": "datetime"},
+        sort=("id",),
+        key=("id",),
+        changes="id > :last_id",
+    ),
+)
+
+
+def arrow_array(values: pd.Series, kind: str) -> pa.Array:
+    """A column as returned by the driver, in the Arrow type of its kind
+
+    :param values: The column, as read by ``pd.read_sql``
+    :type values: pd.Series
+    :param kind: The kind of the column, a key of ``ARROW_TYPES``
+    :type kind: str
+    :return: The column
+    :rtype: pa.Array"""
+
+    if kind == "int":
+        return pa.array(pd.to_numeric(values).astype("Int64"), type=pa.int64(), from_pandas=True)
+    if kind == "str":
+        return pa.array(values.astype("string"), type=pa.string(), from_pandas=True)
+    if kind == "time":
+        # MySQL returns TIME columns as timedeltas and SQLite as strings
+        microseconds = pd.to_timedelta(values.astype("string")).dt.total_seconds() * 1_000_000
+        return pa.array(microseconds.round().astype("Int64"), from_pandas=True).cast(pa.time64("us"))
+
+    timestamps = pa.array(pd.to_datetime(values), from_pandas=True).cast(pa.timestamp("us"))
+    return timestamps.cast(pa.date32()) if kind == "date" else timestamps
+
+
+def _schema(table: SnapshotTable) -> pa.Schema:
+    return pa.schema([(column, ARROW_TYPES[kind]) for column, kind in table.columns.items()])
+
+
+def _fetch(connection: Connection, table: SnapshotTable, condition: str | None, params: dict) -> pa.Table:
+    """The rows of a table in the source database, in the types of the snapshot"""
+
+    quote = connection.dialect.identifier_preparer.quote
+    sql = f"SELECT {', '.join(map(quote, table.columns))} FROM {quote(table.name)}"
+    if condition is not None:
+        sql += f" WHERE {condition}"
+
+    rows = pd.read_sql(text(sql), connection, params=params)
+    return pa.Table.from_arrays(
+        [arrow_array(rows[column], kind) for column, kind in table.columns.items()],
+        schema=_schema(table),
+    )
+
+
+def _marks(table: SnapshotTable, existing: pa.Table, refreshed_at: datetime) -> dict:
+    """The parameters of ``table.changes``, from the rows of the last run"""
+
+    def greatest(column: str, default):
+        value = pc.max(existing[column]).as_py() if column in existing.column_names else None
+        return default if value is None else value
+
+    return {
+        # The check-ins of a date are recorded that day, one day more covers
+        # the time zone of the server
+        "last_date": (refreshed_at - timedelta(days=1)).date(),
+        "last_id": greatest(table.key[0], 0),
+        "last_change": max(
+            greatest("created_at", _NO_DATETIME), greatest("reaction_date", _NO_DATETIME)
+        ),
+    }
+
+
+def _merge(table: SnapshotTable, existing: pa.Table, changed: pa.Table) -> pa.Table:
+    """The rows of the last run, with the changed rows instead of the old ones"""
+
+    old_keys = pd.MultiIndex.from_frame(existing.select(list(table.key)).to_pandas())
+    new_keys = pd.MultiIndex.from_frame(changed.select(list(table.key)).to_pandas())
+    kept = existing.filter(pa.array(~old_keys.isin(new_keys)))
+    return pa.concat_tables([kept, changed])
+
+
+def _write(table: pa.Table, path: Path) -> None:
+    partial = path.with_name(f".{path.name}.partial")
+    pq.write_table(table, partial, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+    partial.replace(path)
+
+
+def _manifest(directory: Path) -> dict:
+    path = directory / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def refresh(source: Engine, directory: Path, full: bool = False) -> dict[str, int]:
+    """Copy the tables the dashboard uses to Parquet files
+
+    :param source: The database of the registration app
+    :type source: Engine
+    :param directory: The directory of the snapshot, created if it does not exist
+    :type directory: Path
+    :param full: Whether to copy every table whole, instead of the changed rows.
+        Deleted rows and changed people are only seen by a full copy
+    :type full: bool
+    :return: The rows fetched from each table
+    :rtype: dict[str, int]"""
+
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = _manifest(directory)
+    started_at = datetime.now()
+
+    fetched = {}
+    with source.connect() as connection:
+        for table in TABLES:
+            path = directory / f"{table.name}.parquet"
+            incremental = (
+                not full and table.changes is not None and path.exists() and "refreshed_at" in manifest
+            )
+
+            if incremental:
+                existing = pq.read_table(path, memory_map=True)
+                marks = _marks(table, existing, datetime.fromisoformat(manifest["refreshed_at"]))
+                changed = _fetch(connection, table, table.changes, marks)
+                rows = _merge(table, existing, changed)
+            else:
+                changed = rows = _fetch(connection, table, None, {})
+
+            fetched[table.name] = changed.num_rows
+            _write(rows.sort_by([(column, "ascending") for column in table.sort]), path)
+
+    # The next run fetches the changes since this one started
+    manifest = {"refreshed_at": started_at.isoformat(timespec="seconds"), "fetched": fetched}
+    (directory / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    return fetched
+
+
+def refreshed_at(directory: Path | str) -> datetime | None:
+    """When the snapshot was taken
+
+    :param directory: The directory of the snapshot
+    :type directory: Path | str
+    :return: When the last run started, ``None`` if there is no snapshot
+    :rtype: datetime | None"""
+
+    manifest = _manifest(Path(directory))
+    return datetime.fromisoformat(manifest["refreshed_at"]) if "refreshed_at" in manifest else None
+
+
+# The views created in the connections of every attached engine
+_attached_views: weakref.WeakKeyDictionary[Engine, list[str]] = weakref.WeakKeyDictionary()
+_attached_lock = threading.Lock()
+
+
+def attach(engine: Engine, directory: Path | str) -> None:
+    """Make every table of the snapshot a view in each connection of a DuckDB engine
+
+    The engine must be ``duckdb:///:memory:``, the views read the files when
+    the queries run, so a new snapshot is seen without reconnecting. The
+    listener is added once per engine, attaching it again only changes the
+    directory of the next connections.
+
+    :param engine: The DuckDB engine
+    :type engine: Engine
+    :param directory: The directory of the snapshot
+    :type directory: Path | str"""
+
+    directory = Path(directory).resolve()
+    views = [
+        f"""CREATE OR REPLACE VIEW "{table.name}" AS SELECT * FROM read_parquet('{str(directory / f"{table.name}.parquet").replace("'", "''")}')"""
+        for table in TABLES
+    ]
+
+    with _attached_lock:
+        attached = _attached_views.get(engine)
+        if attached is not None:
+            attached[:] = views
+            return
+        _attached_views[engine] = views
+
+    def create_views(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for view in views:
+            cursor.execute(view)
+        cursor.close()
+
+    event.listen(engine, "connect", create_views)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m dashboard.snapshot",
+        description="Copy the tables the dashboard uses to Parquet files.",
+    )
+    parser.add_argument("directory", type=Path, help="Directory of the snapshot")
+    cli.add_database_arguments(parser)
+    parser.add_argument("--full", action="store_true", help="Copy every table whole")
+    args = parser.parse_args()
+
+    fetched = refresh(cli.database_engine(args), args.directory, full=args.full)
+    print(", ".join(f"{rows} {table}" for table, rows in fetched.items()))
+
+
+if __name__ == "__main__":
+    main()
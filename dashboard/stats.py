@@ -0,0 +1,86 @@
+"""Statistics of an event computed by the database.
+
+Instead of loading one row per registration and counting with pandas, every
+function runs a ``GROUP BY`` query so only the aggregated rows travel over the
+connection. The statistics of a date come from a single query, the cube of
+:func:`cube`, and every chart of the page is a slice of it computed by
+:mod:`dashboard.analysis`.
+"""
+from datetime import timedelta
+
+import pandas as pd
+from streamlit.connections import SQLConnection
+
+from dashboard import analysis, db, queries
+
+
+def cube(
+    conn: SQLConnection, event_id: int, day_date, ttl: timedelta = db.STATS_TTL
+) -> pd.DataFrame:
+    """The registrations of an event date counted by attendance, gender, age,
+    reaction and hour of arrival, every chart of the date is a slice of it
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param event_id: The id of the event
+    :type event_id: int
+    :param day_date: The date of the event to analyze
+    :param ttl: How long the result is kept in the cache
+    :type ttl: timedelta
+    :return: The cube, see :func:`dashboard.analysis.cube`
+    :rtype: pd.DataFrame"""
+
+    frame = db.run_query(
+        conn,
+        queries.attendee_cube(conn.engine.dialect.name),
+        db.event_params(event_id, day_date),
+        ttl=ttl,
+    )
+    return analysis.typed_cube(frame)
+
+
+def prefetch_date(
+    conn: SQLConnection, event_id: int, day_date, ttl: timedelta = db.STATS_TTL
+) -> None:
+    """Start loading the statistics of a date in the background, the functions
+    of this module find them in the cache
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param event_id: The id of the event
+    :type event_id: int
+    :param day_date: The date of the event
+    :param ttl: How long the results are kept in the cache
+    :type ttl: timedelta"""
+
+    params = db.event_params(event_id, day_date)
+    db.prefetch(conn, queries.attendee_cube(conn.engine.dialect.name), params, ttl=ttl)
+
+
+def date_counts(conn: SQLConnection, event_id: int, ttl: timedelta = db.STATS_TTL) -> pd.DataFrame:
+    """Number of attendees of every date of an event by gender, age and hour of arrival
+
+    All the dates come from one grouped query, the statistics of each date are
+    sums over the rows of that date.
+
+    :param conn: The connection to the database
+    :type conn: SQLConnection
+    :param event_id: The id of the event
+    :type event_id: int
+    :param ttl: How long the result is kept in the cache
+    :type ttl: timedelta
+    :return: The columns ``day_date``, ``gender``, ``age``, ``hour`` and ``total``
+    :rtype: pd.DataFrame"""
+
+    frame = db.run_query(
+        conn,
+        queries.date_counts(conn.engine.dialect.name),
+        db.event_params(event_id),
+        ttl=ttl,
+    )
+    return frame.assign(
+        day_date=pd.to_datetime(frame["day_date"]),
+        age=frame["age"].astype("Int16"),
+        hour=frame["hour"].astype("Int8"),
+        total=frame["total"].astype(int),
+    )
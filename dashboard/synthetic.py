@@ -0,0 +1,302 @@
+"""Synthetic database with the schema of the registration app, for benchmarks.
+
+The schema is the one documented at the top of ``pages/specific_event.py``.
+The data follows the shape of the real events: a few big events and many
+small ones, one to three dates per event, people who come back to several
+events, most arrivals around the start of each date and more young adults
+than older people. The same seed always builds the same database::
+
+    python -m dashboard.synthetic bench.db --registrations 100000
+
+The database is SQLite by default, ``--url`` writes to any other database
+with an empty schema (for example a local MySQL-compatible server).
+"""
+import argparse
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import (
+    Column, Date, DateTime, Engine, Integer, LargeBinary, MetaData, String, Table, Text, Time,
+    create_engine,
+)
+
+from dashboard import indexes
+
+metadata = MetaData()
+
+Table(
+    "user", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("email", String(255)),
+    Column("first_name", String(255)),
+    Column("last_name", String(255)),
+    Column("hashed_password", LargeBinary),
+    Column("created_at", DateTime),
+    Column("is_active", Integer),
+    Column("role", String(20)),
+)
+Table(
+    "assistant", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("id_number", String(10)),
+    Column("id_number_type", String(20)),
+    Column("phone", String(255)),
+    Column("gender", String(10)),
+    Column("date_of_birth", Date),
+    Column("accepted_terms", Integer),
+    Column("image_uuid", String(32)),
+)
+Table(
+    "event", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(255)),
+    Column("description", Text),
+    Column("location", String(255)),
+    Column("maps_link", String(255)),
+    Column("capacity", Integer),
+    Column("capacity_type", String(20)),
+    Column("created_at", DateTime),
+    Column("image_uuid", String(32)),
+    Column("is_cancelled", Integer),
+    Column("is_published", Integer),
+    Column("organizer_id", Integer),
+)
+Table(
+    "eventdate", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("day_date", Date),
+    Column("start_time", Time),
+    Column("end_time", Time),
+    Column("deleted", Integer),
+    Column("event_id", Integer),
+)
+Table(
+    "registration", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("event_id", Integer),
+    Column("assistant_id", Integer),
+    Column("companion_id", Integer),
+    Column("companion_type", String(20)),
+    Column("created_at", DateTime),
+    Column("reaction", String(20)),
+    Column("reaction_date", DateTime),
+)
+Table(
+    "attendance", metadata,
+    Column("event_date_id", Integer, primary_key=True),
+    Column("registration_id", Integer, primary_key=True),
+    Column("arrival_time", Time),
+)
+Table(
+    "staffeventlink", metadata,
+    Column("staff_id", Integer),
+    Column("event_id", Integer),
+)
+
+GENDERS = {"MALE": 0.47, "FEMALE": 0.49, "OTHER": 0.04}
+REACTIONS = {"NO_REACTION": 0.55, "LIKE": 0.35, "DISLIKE": 0.10}
+FIRST_NAMES = np.array(["Ana", "Luis", "María", "José", "Sofía", "Carlos", "Lucía", "Diego", "Valentina", "Andrés"])
+LAST_NAMES = np.array(["Pérez", "García", "Torres", "Vásquez", "Mora", "Castro", "Flores", "Romero", "Salazar", "Vega"])
+
+# Registrations per event, on average
+EVENT_SIZE = 250
+
+
+def _datetimes(values: pd.Series) -> pd.Series:
+    return values.dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _times(seconds: np.ndarray) -> np.ndarray:
+    seconds = seconds.astype(int)
+    return np.char.mod("%02d:", seconds // 3600) + np.char.mod("%02d:", seconds // 60 % 60) + np.char.mod("%02d", seconds % 60)
+
+
+def generate(
+    registrations: int,
+    events: int | None = None,
+    seed: int = 0,
+    today: date | None = None,
+) -> dict[str, pd.DataFrame]:
+    """Build the rows of every table
+
+    :param registrations: The number of registrations, about
+    :type registrations: int
+    :param events: The number of events, one per ``EVENT_SIZE`` registrations by default
+    :type events: int | None
+    :param seed: The seed of the random numbers
+    :type seed: int
+    :param today: The date the events are placed around, today by default
+    :type today: date | None
+    :return: The rows of each table, by table name
+    :rtype: dict[str, pd.DataFrame]"""
+
+    rng = np.random.default_rng(seed)
+    today = today or date.today()
+    events = events or max(1, registrations // EVENT_SIZE)
+    people = max(1, int(registrations * 0.6))
+
+    # People, the ages are a mix of students and older adults
+    user_ids = np.arange(1, people + 1)
+    ages = np.where(rng.random(people) < 0.7, rng.normal(27, 7, people), rng.normal(50, 12, people))
+    births = pd.Timestamp(today) - pd.to_timedelta(np.clip(ages, 14, 90) * 365.25, unit="D")
+    births = births.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    births[rng.random(people) < 0.01] = None
+
+    user = pd.DataFrame({
+        "id": user_ids,
+        "email": [f"persona{user_id}@example.com" for user_id in user_ids],
+        "first_name": rng.choice(FIRST_NAMES, people),
+        "last_name": rng.choice(LAST_NAMES, people),
+        "hashed_password": [b""] * people,
+        "created_at": _datetimes(pd.Series(pd.Timestamp(today) - pd.to_timedelta(rng.integers(0, 1000, people), unit="D"))),
+        "is_active": 1,
+        "role": "ASSISTANT",
+    })
+    assistant = pd.DataFrame({
+        "user_id": user_ids,
+        "id_number": [f"{user_id:010d}" for user_id in user_ids],
+        "id_number_type": "CEDULA",
+        "phone": [f"09{user_id:08d}" for user_id in user_ids],
+        "gender": rng.choice(list(GENDERS), people, p=list(GENDERS.values())),
+        "date_of_birth": births,
+        "accepted_terms": 1,
+        "image_uuid": "",
+    })
+
+    # Events, a few big ones and many small ones, over two years
+    event_ids = np.arange(1, events + 1)
+    weights = rng.lognormal(0, 1, events)
+    sizes = np.maximum(1, np.round(weights / weights.sum() * registrations)).astype(int)
+    first_dates = pd.Timestamp(today) + pd.to_timedelta(rng.integers(-700, 60, events), unit="D")
+    event = pd.DataFrame({
+        "id": event_ids,
+        "name": [f"Evento {event_id}" for event_id in event_ids],
+        "description": "",
+        "location": "Campus",
+        "maps_link": "",
+        "capacity": np.ceil(sizes * rng.uniform(1.0, 1.5, events)).astype(int),
+        "capacity_type": "LIMIT_OF_SPACES",
+        "created_at": _datetimes(pd.Series(first_dates - pd.to_timedelta(60, unit="D"))),
+        "image_uuid": "",
+        "is_cancelled": (rng.random(events) < 0.03).astype(int),
+        "is_published": (rng.random(events) < 0.95).astype(int),
+        "organizer_id": 1,
+    })
+
+    # One to three consecutive dates per event
+    dates_per_event = rng.choice([1, 2, 3], events, p=[0.6, 0.3, 0.1])
+    date_event = np.repeat(event_ids, dates_per_event)
+    date_number = np.concatenate([np.arange(count) for count in dates_per_event])
+    start_hours = np.repeat(rng.integers(8, 18, events), dates_per_event)
+    eventdate = pd.DataFrame({
+        "id": np.arange(1, len(date_event) + 1),
+        "day_date": (first_dates[date_event - 1] + pd.to_timedelta(date_number, unit="D")).strftime("%Y-%m-%d"),
+        "start_time": _times(start_hours * 3600),
+        "end_time": _times((start_hours + 3) * 3600),
+        "deleted": 0,
+        "event_id": date_event,
+    })
+
+    # Registrations, the same people come back to several events
+    # A person registers once per event, so more rows than needed are drawn
+    # and the repeated ones dropped
+    registration_event = np.repeat(event_ids, sizes * 2)
+    popularity = 1 / (np.arange(people) + 100) ** 0.7
+    companions = rng.choice(user_ids, len(registration_event), p=popularity / popularity.sum())
+    registration = pd.DataFrame({"event_id": registration_event, "companion_id": companions})
+    registration = registration.drop_duplicates()
+    registration = registration[registration.groupby("event_id").cumcount() < sizes[registration["event_id"] - 1]]
+    registration = registration.reset_index(drop=True)
+    count = len(registration)
+
+    event_first_date = first_dates[registration["event_id"].to_numpy() - 1]
+    created_at = event_first_date - pd.to_timedelta(rng.exponential(10, count) + 0.1, unit="D")
+    reactions = rng.choice(list(REACTIONS), count, p=list(REACTIONS.values()))
+    reaction_date = pd.Series(
+        event_first_date + pd.to_timedelta(rng.exponential(1, count) + 0.5, unit="D")
+    ).where(reactions != "NO_REACTION")
+    registration = registration.assign(
+        id=np.arange(1, count + 1),
+        assistant_id=registration["companion_id"],
+        companion_type=np.where(rng.random(count) < 0.9, "SELF", "COMPANION"),
+        created_at=_datetimes(pd.Series(created_at)),
+        reaction=reactions,
+        reaction_date=_datetimes(reaction_date).where(reaction_date.notna(), None),
+    )[["id", "event_id", "assistant_id", "companion_id", "companion_type", "created_at", "reaction", "reaction_date"]]
+
+    # Attendance to each date, most people arrive around the start
+    per_date = registration[["id", "event_id"]].merge(
+        eventdate[["id", "event_id", "start_time"]].rename(columns={"id": "event_date_id"}),
+        on="event_id",
+    )
+    attendance_rate = rng.beta(6, 3, events)[per_date["event_id"].to_numpy() - 1]
+    per_date = per_date[rng.random(len(per_date)) < attendance_rate]
+    start = pd.to_timedelta(per_date["start_time"]).dt.total_seconds().to_numpy()
+    arrival = np.clip(start + rng.normal(-600, 1800, len(per_date)), start - 5400, start + 3 * 3600)
+    attendance = pd.DataFrame({
+        "event_date_id": per_date["event_date_id"].to_numpy(),
+        "registration_id": per_date["id"].to_numpy(),
+        "arrival_time": _times(np.clip(arrival, 0, 86399)),
+    })
+
+    return {
+        "user": user,
+        "assistant": assistant,
+        "event": event,
+        "eventdate": eventdate,
+        "registration": registration,
+        "attendance": attendance,
+        "staffeventlink": pd.DataFrame({"staff_id": [1], "event_id": [1]}),
+    }
+
+
+def build(engine: Engine, tables: dict[str, pd.DataFrame], with_indexes: bool = True) -> None:
+    """Create the schema and insert the rows
+
+    :param engine: The empty database
+    :type engine: Engine
+    :param tables: The rows of each table, as returned by :func:`generate`
+    :type tables: dict[str, pd.DataFrame]
+    :param with_indexes: Whether to create the indexes the dashboard needs
+    :type with_indexes: bool"""
+
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        for name, rows in tables.items():
+            rows.to_sql(name, connection, if_exists="append", index=False, chunksize=50_000)
+
+    if with_indexes:
+        with engine.connect() as connection:
+            missing = indexes.missing_indexes(connection)
+        indexes.apply(engine, missing)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m dashboard.synthetic",
+        description="Build a database with synthetic events, registrations and attendances.",
+    )
+    parser.add_argument("output", type=Path, nargs="?", help="The SQLite file to create")
+    parser.add_argument("--url", help="URL of an empty database, instead of a SQLite file")
+    parser.add_argument("--registrations", type=int, default=10_000)
+    parser.add_argument("--events", type=int, help=f"By default one every {EVENT_SIZE} registrations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-indexes", action="store_true", help="Do not create the indexes of the dashboard")
+    args = parser.parse_args()
+
+    if args.url is None:
+        if args.output is None:
+            parser.error("the output file or --url is required")
+        args.output.unlink(missing_ok=True)
+        args.url = f"sqlite:///{args.output}"
+
+    tables = generate(args.registrations, args.events, args.seed)
+    build(create_engine(args.url), tables, with_indexes=not args.no_indexes)
+
+    print(", ".join(f"{len(rows)} {name}" for name, rows in tables.items()))
+
+
+if __name__ == "__main__":
+    main()
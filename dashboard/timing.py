@@ -0,0 +1,243 @@
+"""Timings of the queries, the sections and the figures of the pages."""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+from dashboard.cache import sizeof
+
+logger = logging.getLogger(__name__)
+
+# The kinds of measurement, in the order the panel shows them
+KINDS = ("page", "query", "section", "figure", "render")
+
+
+class Measurement(NamedTuple):
+    """One measured query, section or figure"""
+
+    kind: str
+    name: str
+    seconds: float
+    rows: int
+    bytes: int
+
+
+class TimingStats(NamedTuple):
+    """The measurements of a kind and name, added up since the server started"""
+
+    kind: str
+    name: str
+    count: int
+    total_seconds: float
+    max_seconds: float
+    rows: int
+    bytes: int
+
+
+# The measurements of the current run of the page, ``None`` outside of a run.
+# The threads of the prefetched queries do not have one.
+_current_run: contextvars.ContextVar[list[Measurement] | None] = contextvars.ContextVar(
+    "current_run", default=None
+)
+
+
+class Timer:
+    """A measurement in progress, recorded by :meth:`stop`"""
+
+    def __init__(self, timings: "Timings", kind: str, name: str) -> None:
+        self._timings = timings
+        self.kind = kind
+        self.name = name
+        self.rows = 0
+        self.bytes = 0
+        self._start = time.perf_counter()
+        self._stopped = False
+
+    def count(self, value: Any) -> None:
+        """Count the rows and the bytes of a fetched frame
+
+        :param value: The frame, or any value with a length
+        :type value: Any"""
+
+        self.rows += len(value)
+        self.bytes += sizeof(value)
+
+    def stop(self) -> float:
+        """Record the measurement, only the first call counts
+
+        :return: The measured time, in seconds
+        :rtype: float"""
+
+        seconds = time.perf_counter() - self._start
+        if not self._stopped:
+            self._stopped = True
+            self._timings.record(Measurement(self.kind, self.name, seconds, self.rows, self.bytes))
+        return seconds
+
+    def __enter__(self) -> "Timer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class Timings:
+    """Measurements of the queries, sections and figures of the pages"""
+
+    def __init__(
+        self,
+        log: bool = False,
+        prometheus_file: Path | str | None = None,
+        dump_interval: float = 15,
+    ) -> None:
+        self.log = log
+        self.prometheus_file = None if prometheus_file is None else Path(prometheus_file)
+        self.dump_interval = dump_interval
+        self._lock = threading.Lock()
+        self._dump_lock = threading.Lock()
+        self._last_dump = 0.0
+        self._totals: dict[tuple[str, str], TimingStats] = {}
+
+        if log and not logger.handlers:
+            # Streamlit only configures its own loggers
+            logger.addHandler(logging.StreamHandler())
+            logger.setLevel(logging.INFO)
+
+    def start_run(self) -> list[Measurement]:
+        """Keep apart the measurements of this run of the page, from this thread
+
+        :return: The list the measurements of the run are added to
+        :rtype: list[Measurement]"""
+
+        run: list[Measurement] = []
+        _current_run.set(run)
+        return run
+
+    def end_run(self) -> None:
+        """Stop keeping apart the measurements of this thread.
+
+        The fragments of a page rerun alone in the same thread, after the run
+        ended their measurements are only added to the totals."""
+
+        _current_run.set(None)
+
+    def start(self, kind: str, name: str) -> Timer:
+        """Start measuring, until :meth:`Timer.stop` is called
+
+        :param kind: The kind of measurement, one of ``KINDS``
+        :type kind: str
+        :param name: What is measured, the name of the query, section or figure
+        :type name: str
+        :return: The measurement in progress
+        :rtype: Timer"""
+
+        return Timer(self, kind, name)
+
+    def measure(self, kind: str, name: str) -> Timer:
+        """Measure a ``with`` block, same as :meth:`start`"""
+
+        return self.start(kind, name)
+
+    def timed(self, kind: str, name: str) -> Callable[[Callable], Callable]:
+        """Decorator that measures every call of a function
+
+        :param kind: The kind of measurement, one of ``KINDS``
+        :type kind: str
+        :param name: What is measured
+        :type name: str
+        :return: The decorator
+        :rtype: Callable[[Callable], Callable]"""
+
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.measure(kind, name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def record(self, measurement: Measurement) -> None:
+        """Add a measurement to the totals and to the current run
+
+        :param measurement: The measurement
+        :type measurement: Measurement"""
+
+        key = (measurement.kind, measurement.name)
+        with self._lock:
+            previous = self._totals.get(key)
+            if previous is None:
+                previous = TimingStats(measurement.kind, measurement.name, 0, 0.0, 0.0, 0, 0)
+            self._totals[key] = TimingStats(
+                kind=measurement.kind,
+                name=measurement.name,
+                count=previous.count + 1,
+                total_seconds=previous.total_seconds + measurement.seconds,
+                max_seconds=max(previous.max_seconds, measurement.seconds),
+                rows=previous.rows + measurement.rows,
+                bytes=previous.bytes + measurement.bytes,
+            )
+
+        run = _current_run.get()
+        if run is not None:
+            run.append(measurement)
+
+        if self.log:
+            logger.info(json.dumps(measurement._asdict(), ensure_ascii=False))
+
+        if self.prometheus_file is not None and time.monotonic() - self._last_dump >= self.dump_interval:
+            self.dump()
+
+    def stats(self) -> list[TimingStats]:
+        """The totals of every kind and name, the slowest first
+
+        :return: The totals
+        :rtype: list[TimingStats]"""
+
+        with self._lock:
+            return sorted(self._totals.values(), key=lambda stats: stats.total_seconds, reverse=True)
+
+    def prometheus(self) -> str:
+        """The totals in the text format of Prometheus
+
+        :return: The metrics
+        :rtype: str"""
+
+        metrics = {
+            "dashboard_measurements_total": ("counter", "Number of measurements", "count"),
+            "dashboard_seconds_total": ("counter", "Total time, in seconds", "total_seconds"),
+            "dashboard_max_seconds": ("gauge", "Slowest measurement, in seconds", "max_seconds"),
+            "dashboard_fetched_rows_total": ("counter", "Rows fetched by the queries", "rows"),
+            "dashboard_fetched_bytes_total": ("counter", "Bytes of the fetched frames", "bytes"),
+        }
+        stats = self.stats()
+
+        lines = []
+        for metric, (metric_type, description, field) in metrics.items():
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {metric_type}"]
+            for measured in stats:
+                name = measured.name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+                lines.append(f'{metric}{{kind="{measured.kind}",name="{name}"}} {getattr(measured, field)}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self) -> None:
+        """Rewrite the Prometheus file, if there is one and no other thread is writing it"""
+
+        if self.prometheus_file is None or not self._dump_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_dump = time.monotonic()
+            # Readers never see a half written file
+            partial = self.prometheus_file.with_name(f".{self.prometheus_file.name}.{os.getpid()}")
+            partial.write_text(self.prometheus())
+            partial.replace(self.prometheus_file)
+        except OSError:
+            logger.exception("Can not write the timings to %s", self.prometheus_file)
+        finally:
+            self._dump_lock.release()
@@ -1,8 +1,286 @@
+from datetime import timedelta
+
+import pandas as pd
+import streamlit as st
+from bokeh.models import ColumnDataSource, FactorRange
 from bokeh.plotting import figure
 from streamlit_bokeh import streamlit_bokeh  # type: ignore
 
-import streamlit as st
+from dashboard import db, events, rollup
+from dashboard.charts import figure_config
+
+# How long the rollup is used before looking for events that changed
+ROLLUP_MAX_AGE = timedelta(minutes=5)
+
+
+@st.cache_resource
+def shared_rollup() -> rollup.Rollup:
+    """The rollup of all the events, shared by all the sessions"""
+
+    return rollup.Rollup()
+
 
 st.title("Estadísticas de todos los eventos")
 
 st.sidebar.title("Estadísticas de todos los eventos 📊")
+
+reload_data = st.sidebar.button("Recargar datos")
+
+conn = db.get_connection()
+
+event_rollup = shared_rollup()
+
+with db.connect(conn) as connection:
+    event_rollup.refresh(
+        connection, max_age=None if reload_data else ROLLUP_MAX_AGE
+    )
+
+event_index = events.event_index(conn)
+
+summary = event_rollup.frame.join(
+    event_index[["name", "is_published", "is_cancelled"]], on="event_id"
+)
+
+# region Filters
+############################################################################
+# Filters of the events included in the statistics
+############################################################################
+
+published_only = st.sidebar.toggle("Solo eventos publicados")
+include_cancelled = st.sidebar.toggle("Incluir eventos cancelados", value=False)
+
+if published_only:
+    summary = summary[summary["is_published"] == True]  # noqa: E712, the column can have NaN
+if not include_cancelled:
+    summary = summary[summary["is_cancelled"] != True]  # noqa: E712
+
+if summary["day_date"].notna().any():
+    first_date = summary["day_date"].min().date()
+    last_date = summary["day_date"].max().date()
+
+    selected_dates = st.sidebar.date_input(
+        "Fechas de los eventos",
+        value=(first_date, last_date),
+        min_value=first_date,
+        max_value=last_date,
+    )
+
+    # The range is incomplete while the user is picking the second date
+    if len(selected_dates) == 2:
+        summary = summary[summary["day_date"].between(
+            pd.Timestamp(selected_dates[0]), pd.Timestamp(selected_dates[1])
+        )]
+
+if summary.empty:
+    st.info("No hay eventos con fechas para los filtros seleccionados.")
+    st.stop()
+
+# The registrations and reactions are repeated in every date of an event
+summary_by_event = summary.groupby("event_id").agg(
+    name=("name", "first"),
+    first_date=("day_date", "min"),
+    last_date=("day_date", "max"),
+    dates=("day_date", "size"),
+    registered=("registered", "first"),
+    attended=("attended", "sum"),
+    expected=("registered", "sum"),
+    likes=("likes", "first"),
+    dislikes=("dislikes", "first"),
+    no_reaction=("no_reaction", "first"),
+)
+summary_by_event["attendance_rate"] = (
+    summary_by_event["attended"] / summary_by_event["expected"].where(summary_by_event["expected"] > 0) * 100
+)
+
+# endregion
+# region Totals
+############################################################################
+# Section with the totals of all the events
+#
+# This section answers the following questions:
+#     •	How many events are included?
+#     •	How many people registered to them and how many attended?
+#     •	What is the attendance rate across all the events?
+############################################################################
+
+events_col, registered_col, attended_col, rate_col = st.columns(4)
+
+with events_col:
+    st.metric(label="Eventos", value=len(summary_by_event), border=True)
+
+with registered_col:
+    st.metric(
+        label="Registros",
+        value=int(summary_by_event["registered"].sum()),
+        border=True,
+    )
+
+with attended_col:
+    st.metric(
+        label="Asistencias",
+        value=int(summary_by_event["attended"].sum()),
+        border=True,
+    )
+
+with rate_col:
+    expected = summary_by_event["expected"].sum()
+    st.metric(
+        label="Porcentaje de asistencia",
+        value=f"{summary_by_event['attended'].sum() / expected * 100:.2f}%" if expected else "-",
+        border=True,
+    )
+
+st.divider()
+# endregion
+# region Over time
+############################################################################
+# Section to analyze the registrations and attendance over time
+############################################################################
+
+st.subheader("Registros y asistencia en el tiempo")
+
+by_month = summary.groupby(summary["day_date"].dt.to_period("M")).agg(
+    expected=("registered", "sum"),
+    attended=("attended", "sum"),
+).reset_index()
+by_month["month"] = by_month["day_date"].dt.to_timestamp()
+
+month_source = ColumnDataSource(by_month[["month", "expected", "attended"]])
+
+over_time_chart = figure(
+    title="Registros y asistencias por mes",
+    x_axis_type="datetime",
+    x_axis_label="Mes",
+    y_axis_label="Cantidad",
+    tools="hover,save,reset,help",
+    tooltips=[("Mes", "@month{%Y-%m}"), ("Registros", "@expected"), ("Asistencias", "@attended")],
+    height=350,
+)
+over_time_chart.hover.formatters = {"@month": "datetime"}
+
+over_time_chart.line(x="month", y="expected", source=month_source,
+                     color="gray", line_width=2, legend_label="Registros")
+over_time_chart.line(x="month", y="attended", source=month_source,
+                     color="green", line_width=2, legend_label="Asistencias")
+
+figure_config(over_time_chart)
+over_time_chart.y_range.start = 0
+over_time_chart.legend.location = "top_left"
+
+streamlit_bokeh(over_time_chart)
+
+st.divider()
+# endregion
+# region Demographics
+############################################################################
+# Section to analyze the gender and age of the attendees of all the events
+############################################################################
+
+st.subheader("Género y edad de los asistentes")
+
+gender_range = ("HOMBRE", "MUJER", "OTRO")
+gender_source = ColumnDataSource(data=dict(
+    range=gender_range,
+    counts=[int(summary[column].sum()) for column in rollup.GENDER_COLUMNS.values()],
+    colors=("blue", "pink", "gray"),
+))
+
+gender_bar_chart = figure(
+    title="Género de los asistentes",
+    x_range=FactorRange(factors=gender_range),
+    y_axis_label="Cantidad de asistentes",
+    height=350,
+)
+gender_bar_chart.vbar(source=gender_source, x="range", top="counts",
+                      width=0.9, color="colors")
+
+figure_config(gender_bar_chart)
+gender_bar_chart.xgrid.grid_line_color = None
+gender_bar_chart.y_range.start = 0
+
+age_range = ("< 18", "18-25", "26-35", "36-50", "51-64", "65+")
+age_source = ColumnDataSource(data=dict(
+    range=age_range,
+    counts=[int(summary[column].sum()) for column, _, _ in rollup.AGE_BANDS],
+))
+
+age_bar_chart = figure(
+    title="Edad de los asistentes",
+    x_range=FactorRange(factors=age_range),
+    y_axis_label="Cantidad de asistentes",
+    height=350,
+)
+age_bar_chart.vbar(source=age_source, x="range", top="counts",
+                   width=0.9, color="blue")
+
+figure_config(age_bar_chart)
+age_bar_chart.xgrid.grid_line_color = None
+age_bar_chart.y_range.start = 0
+
+gender_col, age_col = st.columns(2)
+
+with gender_col:
+    streamlit_bokeh(gender_bar_chart)
+
+with age_col:
+    streamlit_bokeh(age_bar_chart)
+
+st.divider()
+# endregion
+# region Reactions
+############################################################################
+# Section to analyze the reactions to all the events
+############################################################################
+
+st.subheader("Likes vs Dislikes vs Sin reacción")
+
+reactions_range = ("LIKE", "DISLIKE", "SIN REACCIÓN")
+reaction_source = ColumnDataSource(data=dict(
+    range=reactions_range,
+    counts=[int(summary_by_event[column].sum()) for column in rollup.REACTION_COLUMNS.values()],
+    colors=("green", "red", "gray"),
+))
+
+reaction_bar_chart = figure(
+    title="Reacciones de los usuarios",
+    x_range=FactorRange(factors=reactions_range),
+    y_axis_label="Cantidad de usuarios",
+    height=350,
+)
+reaction_bar_chart.vbar(source=reaction_source, x="range", top="counts",
+                        width=0.9, color="colors")
+
+figure_config(reaction_bar_chart)
+reaction_bar_chart.xgrid.grid_line_color = None
+reaction_bar_chart.y_range.start = 0
+
+streamlit_bokeh(reaction_bar_chart)
+
+st.divider()
+# endregion
+# region Events
+############################################################################
+# Table with the summary of each event
+############################################################################
+
+st.subheader("Resumen por evento")
+
+st.dataframe(
+    summary_by_event.sort_values("first_date", ascending=False)[[
+        "name", "first_date", "last_date", "dates", "registered", "attended", "attendance_rate",
+        "likes", "dislikes",
+    ]],
+    column_config={
+        "name": "Evento",
+        "first_date": st.column_config.DateColumn("Primera fecha"),
+        "last_date": st.column_config.DateColumn("Última fecha"),
+        "dates": "Fechas",
+        "registered": "Registros",
+        "attended": "Asistencias",
+        "attendance_rate": st.column_config.NumberColumn("% de asistencia", format="%.2f%%"),
+        "likes": "Likes",
+        "dislikes": "Dislikes",
+    },
+    hide_index=True,
+)
+# endregion
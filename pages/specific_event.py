@@ -72,54 +72,163 @@ Tabla: user
   - role (ENUM)
   Sin relaciones (Foreign Keys) (ENUM)
 """
+import functools
+from datetime import timedelta
 from math import pi, ceil
-import sqlalchemy
 import streamlit as st
 from bokeh.plotting import figure
+from bokeh.layouts import column
 from bokeh.models import FactorRange, ColumnDataSource, Whisker
+from bokeh.palettes import Category10_10
 from bokeh.transform import cumsum
 from streamlit_bokeh import streamlit_bokeh  # type: ignore
 import pandas as pd
 
+from dashboard import analysis, attendees, dataset, db, events, export, membership, queries, rollup, stats
+from dashboard.cache import Snapshot
+from dashboard.charts import figure_config, range_slider
+from dashboard.timing import Timer
+
+# How long the membership index is used before loading the new registrations
+MEMBERSHIP_MAX_AGE = timedelta(minutes=5)
+
+GENDER_LABELS = {"MALE": "HOMBRE", "FEMALE": "MUJER", "OTHER": "OTRO"}
+REACTION_LABELS = {"LIKE": "LIKE", "DISLIKE": "DISLIKE", "NO_REACTION": "SIN REACCIÓN"}
+AGE_BAND_LABELS = {
+    name: (
+        f"Menos de {highest + 1}" if lowest is None
+        else f"{lowest} o más" if highest is None
+        else f"{lowest}–{highest}"
+    )
+    for name, lowest, highest in rollup.AGE_BANDS
+}
 
-def figure_config(figure: figure):
-    """The basic configuration of all the figures in the app
 
-    :param figure: The figure to configure
-    :type figure: figure"""
+@st.cache_resource
+def shared_membership() -> membership.MembershipIndex:
+    """The people of every event, shared by all the sessions"""
 
-    figure.toolbar.logo = None
-    figure.toolbar.autohide = True
-    figure.toolbar_location = "below"
+    return membership.MembershipIndex()
 
 
 st.title("Estadísticas de eventos específicos")
 
 st.sidebar.title("Estadísticas de eventos específicos 📈")
 
-if st.sidebar.button("Recargar datos"):
-    st.cache_data.clear()
-    # st.rerun()
+reload_data = st.sidebar.button("Recargar datos")
+
+conn = db.get_connection()
+
+# The queries, sections and figures of this run are measured for the
+# performance panel at the end of the page
+timings = db.timings()
+page_timings = timings.start_run()
+page_timer = timings.start("page", "specific_event")
+
+
+def selected_alphas(categories: tuple[str, ...], selected: tuple[str, ...]) -> list[float]:
+    """The opacity of the bar of every category, the selected ones stand out"""
+
+    return [1.0 if not selected or category in selected else 0.3 for category in categories]
+
+
+def show_chart(chart, build: Timer) -> None:
+    """Show a Bokeh figure or layout, measuring how long it took to build and to send
 
-conn = st.connection("sql")
+    :param chart: The figure or layout
+    :param build: The measurement started before building the chart, its name
+        is used for the render too
+    :type build: Timer"""
 
-events = conn.query("SELECT * FROM event")
+    build.stop()
+    with timings.measure("render", build.name):
+        streamlit_bokeh(chart)
 
-event_names = events["name"]
 
-selected_event = st.sidebar.selectbox(
+live_mode = st.sidebar.toggle(
+    "Modo en vivo",
+    help="Actualiza la asistencia y la hora de llegada automáticamente durante el evento.",
+)
+
+if live_mode:
+    live_interval = st.sidebar.select_slider(
+        "Actualizar cada (segundos)",
+        options=(10, 30, 60, 120),
+        value=30,
+    )
+
+    incremental_reload = st.sidebar.toggle(
+        "Recarga incremental",
+        value=True,
+        help="Al recargar solo se traen los registros, reacciones y asistencias nuevas.",
+    )
+
+    # The sections are rerun alone every interval, fetching only the
+    # registrations and check-ins that changed since the last refresh
+    live_fragment = st.fragment(run_every=live_interval)
+else:
+    # Only the live mode keeps the registrations to refresh them, any other
+    # reload is a full one
+    incremental_reload = False
+    live_fragment = st.fragment
+
+if reload_data:
+    # The list of events is reloaded too, with or without a selected event
+    db.invalidate_event(None)
+
+event_index = events.event_index(conn)
+
+event_search = st.sidebar.text_input("Buscar evento por nombre")
+
+with st.sidebar.expander("Filtrar eventos"):
+    published_only = st.toggle("Solo eventos publicados")
+    include_cancelled = st.toggle("Incluir eventos cancelados", value=True)
+    upcoming_only = st.toggle("Solo eventos próximos")
+
+matching_events = events.search_events(
+    event_index,
+    event_search,
+    published_only=published_only,
+    include_cancelled=include_cancelled,
+    upcoming_only=upcoming_only,
+)
+
+if len(matching_events) > events.MAX_OPTIONS:
+    st.sidebar.caption(
+        f"Mostrando {events.MAX_OPTIONS} de {len(matching_events)} eventos, "
+        "usa la búsqueda para encontrar el resto."
+    )
+    matching_events = matching_events.iloc[:events.MAX_OPTIONS]
+
+event_labels = {
+    event_id: events.event_label(event) for event_id, event in matching_events.iterrows()
+}
+
+# The events are selected by id, two events can have the same name
+selected_event_id = st.sidebar.selectbox(
     "Selecciona un evento",
-    event_names,
+    list(event_labels),
+    format_func=event_labels.get,
     index=None,
     placeholder="Selecciona un evento",
 )
 
 
-if selected_event:
-    event_id = events[events["name"] == selected_event]["id"].values[0]
+if selected_event_id is not None:
+    event_id = selected_event_id
+
+    if reload_data:
+        # Only the cached data of the selected event is reloaded
+        db.invalidate_event(event_id)
 
-    event_dates = conn.query(
-        f"SELECT * FROM eventdate WHERE event_id = {event_id}"
+        if not incremental_reload:
+            dataset.discard_event(event_id)
+
+    event_dates = db.run_query(
+        conn,
+        queries.EVENT_DATES,
+        db.event_params(event_id),
+        ttl=db.EVENT_DATES_TTL,
     )
 
     # AttributeError: Can only use .dt accessor with datetimelike values
@@ -128,61 +237,252 @@ if selected_event:
 
     st.sidebar.write("Fechas del evento")
 
-    selected_event_date = st.sidebar.selectbox(
-        "Selecciona una fecha del evento",
-        event_date_names,
-        index=None,
-        placeholder="Selecciona una fecha del evento",
+    compare_dates = st.sidebar.toggle(
+        "Comparar todas las fechas",
+        disabled=len(event_dates) < 2,
+        help="Muestra la asistencia, la hora de llegada y los asistentes de todas las fechas lado a lado.",
     )
+    compare_dates = compare_dates and len(event_dates) > 1
+
+    selected_event_date = None
+    if not compare_dates:
+        selected_event_date = st.sidebar.selectbox(
+            "Selecciona una fecha del evento",
+            event_date_names,
+            index=None,
+            placeholder="Selecciona una fecha del evento",
+        )
 
-    if selected_event_date:
-        people_registered = conn.query(
-            f"""
-            SELECT
-                r.id AS registration_id,
-                r.event_id,
-                r.assistant_id,
-                r.companion_id,
-                r.companion_type,
-                r.created_at AS registration_created_at,
-                r.reaction,
-                r.reaction_date,
-                u.created_at AS user_created_at,
-                u.email,
-                u.first_name,
-                u.last_name,
-                u.is_active,
-                u.role,
-                a.id_number,
-                a.id_number_type,
-                a.phone,
-                a.gender,
-                a.date_of_birth,
-                att.arrival_time,
-                ed.day_date
-            FROM registration AS r
-            JOIN user AS u ON u.id = r.companion_id
-            JOIN assistant AS a ON a.user_id = u.id
-            LEFT JOIN attendance AS att ON r.id = att.registration_id
-            LEFT JOIN eventdate AS ed ON att.event_date_id = ed.id
-            WHERE r.event_id = {event_id} AND (ed.day_date = '{selected_event_date}' OR ed.day_date IS NULL)
-            """
-            # f"""SELECT *
-            # FROM assistant
-            # JOIN registration ON assistant.user_id = registration.companion_id
-            # WHERE registration.event_id = '{event_id}'"""
+    # The statistics of every date are loaded in the background, the selected
+    # date first, so choosing another date finds them in the cache
+    for day_date in sorted(event_date_names, key=lambda day_date: day_date != selected_event_date):
+        stats.prefetch_date(conn, event_id, day_date)
+
+    if compare_dates:
+        # region Dates comparison
+        ############################################################################
+        # Section to compare the dates of a multi-day event
+        #
+        # All the dates come from one grouped query and one query of attended dates,
+        # choosing the dates to compare does not run any query.
+        #
+        # This section answers the following questions:
+        #     •	How many people attended each date?
+        #     •	At what hour did the people arrive each date?
+        #     •	What are the gender and age of the attendees of each date?
+        #     •	Which dates did each person attend?
+        ############################################################################
+
+        event_date_counts = stats.date_counts(conn, event_id)
+        attendance_matrix = attendees.attendance_matrix(conn, event_id, event_dates["day_date"])
+        date_labels = list(attendance_matrix.columns[2:])
+        event_date_counts = event_date_counts.assign(
+            day_date=event_date_counts["day_date"].dt.strftime("%Y-%m-%d")
         )
 
-        people_registered["age"] = pd.to_datetime("today").year - pd.to_datetime(
-            people_registered["date_of_birth"]
-        ).dt.year
+        @st.fragment
+        @timings.timed("section", "dates_comparison")
+        def dates_comparison_section():
+            """Charts and metrics of every date of the event side by side"""
+
+            st.subheader("Comparación de las fechas del evento")
+
+            compared_dates = st.multiselect(
+                "Fechas a comparar", date_labels, default=date_labels
+            )
+
+            if not compared_dates:
+                st.info("Selecciona al menos una fecha.")
+                return
+
+            compared_dates = sorted(compared_dates)
+            date_colors = {
+                day_date: Category10_10[number % len(Category10_10)]
+                for number, day_date in enumerate(date_labels)
+            }
+            counts = event_date_counts[event_date_counts["day_date"].isin(compared_dates)]
+
+            # Attendance of each date
+            attended_by_date = counts.groupby("day_date")["total"].sum().reindex(
+                compared_dates, fill_value=0
+            )
+            total_people_registered = len(attendance_matrix)
+
+            for date_col, (day_date, attended) in zip(
+                st.columns(len(compared_dates)), attended_by_date.items()
+            ):
+                with date_col:
+                    st.metric(
+                        label=f"Asistentes el {day_date}",
+                        value=f"{attended} ({attended / max(total_people_registered, 1) * 100:.2f}%)",
+                        border=True,
+                    )
+
+            # Arrival hour curves of each date
+            hours = counts.dropna(subset=["hour"]).pivot_table(
+                index="hour", columns="day_date", values="total", aggfunc="sum", fill_value=0
+            ).reindex(index=range(24), columns=compared_dates, fill_value=0)
+
+            hours_chart_build = timings.start("figure", "hours_by_date")
+            hours_chart = figure(
+                title="Hora de llegada por fecha",
+                x_axis_label="Hora",
+                y_axis_label="Cantidad de asistentes",
+                x_range=(0, 23),
+                tools="hover,save,reset,help",
+                tooltips=[("Hora", "@hour"), ("Asistentes", "@total")],
+            )
 
-        people_who_attended = people_registered[
-            people_registered["arrival_time"].notna()
-        ]
+            for day_date in compared_dates:
+                hours_chart.line(
+                    source=ColumnDataSource(data=dict(hour=hours.index, total=hours[day_date])),
+                    x="hour",
+                    y="total",
+                    line_width=2,
+                    color=date_colors[day_date],
+                    legend_label=day_date,
+                )
+
+            figure_config(hours_chart)
+            hours_chart.y_range.start = 0
+
+            show_chart(hours_chart, hours_chart_build)
+
+            # Gender of the attendees of each date
+            genders = counts.pivot_table(
+                index="day_date", columns="gender", values="total", aggfunc="sum", fill_value=0
+            ).reindex(index=compared_dates, columns=["MALE", "FEMALE", "OTHER"], fill_value=0)
+
+            gender_names = ("HOMBRE", "MUJER", "OTRO")
+            gender_factors = [
+                (day_date, gender) for day_date in compared_dates for gender in gender_names
+            ]
+            dates_gender_source = ColumnDataSource(
+                data=dict(
+                    range=gender_factors,
+                    counts=genders.to_numpy().ravel().tolist(),
+                    colors=["blue", "pink", "gray"] * len(compared_dates),
+                )
+            )
+
+            dates_gender_chart_build = timings.start("figure", "gender_by_date")
+            dates_gender_chart = figure(
+                title="Género de los asistentes por fecha",
+                x_range=FactorRange(*gender_factors),
+                y_axis_label="Cantidad de asistentes",
+                tooltips=[("Fecha, género", "@range"), ("Asistentes", "@counts")],
+            )
+
+            dates_gender_chart.vbar(
+                source=dates_gender_source,
+                x="range",
+                top="counts",
+                width=0.9,
+                color="colors",
+            )
 
-        total_people_registered = len(people_registered)
-        total_people_who_attended = len(people_who_attended)
+            figure_config(dates_gender_chart)
+            dates_gender_chart.xgrid.grid_line_color = None
+            dates_gender_chart.y_range.start = 0
+            dates_gender_chart.xaxis.major_label_orientation = pi / 4
+            dates_gender_chart_build.stop()
+
+            # Age of the attendees of each date
+            ages = counts.dropna(subset=["age"]).groupby(["day_date", "age"])["total"].sum()
+            age_summaries = pd.DataFrame(
+                {
+                    day_date: analysis.age_summary(
+                        ages.loc[day_date] if day_date in ages.index else pd.Series(dtype=int)
+                    )._asdict()
+                    for day_date in compared_dates
+                }
+            ).T
+
+            dates_gender_col, dates_age_col = st.columns(2)
+
+            with dates_gender_col:
+                show_chart(dates_gender_chart, dates_gender_chart_build)
+
+            with dates_age_col:
+                st.write("Edad de los asistentes por fecha")
+                st.dataframe(
+                    age_summaries,
+                    column_config={
+                        "mean": st.column_config.NumberColumn("Promedio", format="%.2f"),
+                        "median": st.column_config.NumberColumn("Mediana", format="%.1f"),
+                        "min": "Mínima",
+                        "max": "Máxima",
+                        "q1": st.column_config.NumberColumn("Q1", format="%.1f"),
+                        "q3": st.column_config.NumberColumn("Q3", format="%.1f"),
+                    },
+                )
+
+            # Which dates each person attended
+            st.write("Fechas a las que asistió cada persona")
+
+            attended_dates = attendance_matrix[compared_dates]
+            days_attended = attended_dates.sum(axis=1)
+
+            matrix_col1, matrix_col2, matrix_col3 = st.columns(3)
+
+            with matrix_col1:
+                st.metric(
+                    label="Asistieron a todas las fechas",
+                    value=int((days_attended == len(compared_dates)).sum()),
+                    border=True,
+                )
+
+            with matrix_col2:
+                st.metric(
+                    label="Asistieron a algunas fechas",
+                    value=int(days_attended.between(1, len(compared_dates) - 1).sum()),
+                    border=True,
+                )
+
+            with matrix_col3:
+                st.metric(
+                    label="No asistieron a ninguna fecha",
+                    value=int((days_attended == 0).sum()),
+                    border=True,
+                )
+
+            st.dataframe(
+                attendance_matrix[["first_name", "last_name", *compared_dates]],
+                column_config={
+                    "first_name": "Nombre",
+                    "last_name": "Apellido",
+                    **{day_date: st.column_config.CheckboxColumn(day_date) for day_date in compared_dates},
+                },
+            )
+
+        dates_comparison_section()
+        # endregion
+    elif selected_event_date:
+        if reload_data and incremental_reload:
+            dataset.refresh_registrations(conn, event_id, selected_event_date)
+
+        def live_registrations() -> Snapshot:
+            """The registrations of the date with the changes since the last interval.
+
+            The refresh is shared by all the sessions, with many screens open on
+            the event there is still one query per interval, and all of them show
+            the same version of the registrations."""
+
+            dataset.refresh_registrations(
+                conn,
+                event_id,
+                selected_event_date,
+                max_age=timedelta(seconds=live_interval),
+            )
+            return dataset.snapshot(conn, event_id, selected_event_date)
+
+        # One grouped query counts the registrations of the date by every
+        # dimension, the charts and the filters of the sections are slices of it
+        attendee_cube = stats.cube(conn, event_id, selected_event_date)
+
+        unfiltered_counts = analysis.cube_counts(attendee_cube)
+        total_people_registered = unfiltered_counts.registered
+        total_people_who_attended = unfiltered_counts.attended
         # region Calculator
         ############################################################################
         # Calculator for the number of staff needed for the event
@@ -268,12 +568,14 @@ if selected_event:
         # Section to show the data of the people registered for the event
 
         # This section shows the data of the people registered for the event or the people who attended the event
-        # depending on the checkbox selected by the user
+        # depending on the checkbox selected by the user. Only the current page of the table is fetched.
         ############################################################################
 
-        show_data = st.toggle("Mostrar datos de los asistentes")
+        @st.fragment
+        @timings.timed("section", "attendee_table")
+        def attendee_table():
+            """Table of the people registered, fetched one page at a time"""
 
-        if show_data:
             data_to_show = st.radio(
                 "Selecciona el tipo de datos que quieres ver",
                 ("Gente registrada", "Gente que asistió"),
@@ -281,504 +583,924 @@ if selected_event:
                 horizontal=True,
             )
 
+            attendee_columns = st.multiselect(
+                "Columnas que quieres ver",
+                list(queries.ATTENDEE_COLUMNS),
+                default=attendees.DEFAULT_COLUMNS,
+            )
+
+            search_col, sort_col, order_col, page_size_col = st.columns(4)
+
+            with search_col:
+                search = st.text_input("Buscar por nombre, correo o cédula")
+
+            with sort_col:
+                sort_column = st.selectbox(
+                    "Ordenar por", queries.ATTENDEE_SORT_COLUMNS
+                )
+
+            with order_col:
+                descending = st.toggle("Orden descendente")
+
+            with page_size_col:
+                page_size = st.selectbox(
+                    "Filas por página", (25, 50, 100), index=1
+                )
+
+            # The cursors of the pages visited so far, to be able to go back.
+            # They are only valid for the same filters and order.
+            table_filters = (
+                event_id, selected_event_date, data_to_show, search, sort_column, descending, page_size
+            )
+            if st.session_state.get("attendee_table_filters") != table_filters:
+                st.session_state.attendee_table_filters = table_filters
+                st.session_state.attendee_table_cursors = [None]
+
+            cursors = st.session_state.attendee_table_cursors
+
+            attendees_page, next_cursor = attendees.fetch_page(
+                conn,
+                event_id,
+                selected_event_date,
+                columns=attendee_columns,
+                sort_column=sort_column,
+                descending=descending,
+                attended_only=data_to_show == "Gente que asistió",
+                search=search,
+                after=cursors[-1],
+                page_size=page_size,
+            )
+
             if data_to_show == "Gente registrada":
                 st.subheader("Datos de los registrados")
-                st.dataframe(people_registered)
             elif data_to_show == "Gente que asistió":
                 st.subheader("Datos de los asistentes")
-                st.dataframe(people_who_attended)
+
+            st.dataframe(attendees_page, hide_index=True)
+
+            previous_page_col, page_number_col, next_page_col = st.columns(3)
+
+            with previous_page_col:
+                st.button(
+                    "Página anterior",
+                    disabled=len(cursors) == 1,
+                    on_click=cursors.pop,
+                )
+
+            with page_number_col:
+                st.write(f"Página {len(cursors)}")
+
+            with next_page_col:
+                st.button(
+                    "Página siguiente",
+                    disabled=next_cursor is None,
+                    on_click=cursors.append,
+                    args=(next_cursor,),
+                )
+
+            # The export has every row of the table, not only the current page.
+            # It is written in chunks when the button is clicked.
+            with st.expander("Exportar datos"):
+                format_col, ages_col = st.columns(2)
+
+                with format_col:
+                    export_format = st.selectbox(
+                        "Formato",
+                        list(export.FORMATS),
+                        format_func=lambda name: export.FORMATS[name].label,
+                    )
+
+                with ages_col:
+                    ages = st.slider("Edad de las personas", 0, 120, (0, 120))
+
+                file_format = export.FORMATS[export_format]
+                st.download_button(
+                    f"Descargar {file_format.label}",
+                    functools.partial(
+                        attendees.export_file,
+                        conn,
+                        event_id,
+                        selected_event_date,
+                        columns=attendee_columns,
+                        format=export_format,
+                        attended_only=data_to_show == "Gente que asistió",
+                        search=search,
+                        # The people without date of birth are only left out by a narrower range
+                        ages=None if ages == (0, 120) else ages,
+                    ),
+                    file_name=f"asistentes_{event_id}_{selected_event_date}.{file_format.extension}",
+                    mime=file_format.mime,
+                    on_click="ignore",
+                    disabled=not attendee_columns,
+                )
+
+        show_data = st.toggle("Mostrar datos de los asistentes")
+
+        if show_data:
+            attendee_table()
 
         # endregion
-        # region Registered vs Attended
-        ############################################################################
-        # Section to analyze the people registered for the event vs the people who attended the event
-        #
-        # This section answers the following questions:
-        #     •	How many people registered for the event?
-        #     •	How many people attended the event?
-        #     •	How many people did not attend the event?
-        #     •	What is the percentage of people who attended the event vs the people who registered for the event?
-        ############################################################################
 
-        st.subheader("Asistencia vs Registro")
-
-        # Pie chart to compare the number of people registered for the event vs the number of people who attended the event
-        attendance_pie_chart_data = pd.Series({
-            "Asistieron": total_people_who_attended,
-            "No asistieron": total_people_registered - total_people_who_attended,
-        }).reset_index(name="value").rename(columns={
-            "index": "Asistencia"
-        })
-
-        attendance_pie_chart_data['angle'] = attendance_pie_chart_data.value / \
-            attendance_pie_chart_data.value.sum() * 2 * pi
-        attendance_pie_chart_data['percentage'] = attendance_pie_chart_data.value / \
-            attendance_pie_chart_data.value.sum() * 100
-        attendance_pie_chart_data['color'] = ["green", "red"]
-
-        assistant_pie_chart = figure(
-            title="Gente registrada vs gente que asistió",
-            tools="hover,tap,save,reset,help",
-            tooltips="@Asistencia: @value (@percentage{0.2f}%)",
-            x_range=(-0.5, 1.0),
-        )
+        # The people of the previous events do not depend on the filters, they
+        # are loaded once per run of the page. Their section is shown between
+        # the sections of the filters, so it is part of the fragment too.
+        event_membership = shared_membership()
+
+        if reload_data and not incremental_reload:
+            event_membership.reset()
+
+        # No connection is checked out while the index is recent
+        membership_max_age = None if reload_data else MEMBERSHIP_MAX_AGE
+        if not event_membership.is_recent(membership_max_age):
+            with timings.measure("query", "membership_refresh"), db.connect(conn) as connection:
+                event_membership.refresh(connection, max_age=membership_max_age)
 
-        assistant_pie_chart.wedge(
-            x=0,
-            y=1,
-            radius=0.4,
-            start_angle=cumsum("angle", include_zero=True),
-            end_angle=cumsum("angle"),
-            line_color=None,
-            fill_color="color",
-            legend_field="Asistencia",
-            source=attendance_pie_chart_data,
+        event_first_date = event_index.loc[event_id, "first_date"]
+        previous_event_ids = event_index.index[event_index["first_date"] < event_first_date]
+
+        previous_registrations = event_membership.previous_event_counts(event_id, previous_event_ids)
+        previous_attendances = event_membership.previous_event_counts(
+            event_id, previous_event_ids, attended=True
         )
 
-        figure_config(assistant_pie_chart)
-        assistant_pie_chart.axis.axis_label = None
-        assistant_pie_chart.axis.visible = False
-        assistant_pie_chart.grid.grid_line_color = None
+        @st.fragment
+        def statistics():
+            """The filters and the sections they drive, changing a filter only reruns them"""
+
+            # region Filters
+            ############################################################################
+            # Filters of the statistics of the sections below
+            #
+            # Every chart shows the people who match the filters of the other charts,
+            # e.g. the genders of the attendees from 18 to 25 years old or the reactions
+            # of the people who arrived late. The counts are slices of the cube of the
+            # date, filtering does not run any query.
+            ############################################################################
+
+            with st.container(border=True):
+                st.subheader("Filtrar las estadísticas")
+
+                gender_filter_col, age_filter_col = st.columns(2)
+
+                with gender_filter_col:
+                    gender_filter = st.pills(
+                        "Género",
+                        analysis.GENDERS,
+                        selection_mode="multi",
+                        format_func=GENDER_LABELS.get,
+                    )
 
-        # Display all the statistics
-        total_registrations_col, total_attendance_col = st.columns(2)
+                with age_filter_col:
+                    age_band_filter = st.pills(
+                        "Edad",
+                        [name for name, _, _ in rollup.AGE_BANDS],
+                        selection_mode="multi",
+                        format_func=AGE_BAND_LABELS.get,
+                    )
 
-        with total_registrations_col:
-            streamlit_bokeh(assistant_pie_chart)
+                reaction_filter_col, hour_filter_col = st.columns(2)
 
-        with total_attendance_col:
-            st.metric(
-                label="Total de Personas que Asistieron al Evento",
-                value=total_people_who_attended,
-                border=True,
-            )
+                with reaction_filter_col:
+                    reaction_filter = st.pills(
+                        "Reacción",
+                        analysis.REACTIONS,
+                        selection_mode="multi",
+                        format_func=REACTION_LABELS.get,
+                    )
 
-            st.metric(
-                label="Total de Personas Registradas al Evento",
-                value=total_people_registered,
-                border=True,
-            )
+                with hour_filter_col:
+                    hour_filter = st.slider("Hora de llegada", 0, 23, (0, 23))
 
-            try:
-                st.badge(
-                    f"Por lo tanto, el porcentaje de asistencia es del **{total_people_who_attended / total_people_registered * 100:.2f}%**"
-                )
-            except ZeroDivisionError:
-                st.badge(
-                    "Aún no hay gente inscrita en el evento."
+                cross_filter = analysis.CubeFilter(
+                    genders=tuple(gender_filter),
+                    age_bands=tuple(age_band_filter),
+                    reactions=tuple(reaction_filter),
+                    # The whole day keeps the people who did not attend
+                    hours=None if hour_filter == (0, 23) else hour_filter,
                 )
 
-        st.divider()
-        # endregion
-        # region Age of the assistants
-        ############################################################################
-        # Section to analyze the age of the assistants of the event
-        #
-        # This section answers the following questions:
-        #     •	What is the age distribution of the assistants of the event?
-        #     •	What is the average age of the assistants of the event?
-        #     •	What is the median age of the assistants of the event?
-        #     •	What is the age of the youngest assistant of the event?
-        #     •	What is the age of the oldest assistant of the event?
-        ############################################################################
+            # Every section is a slice of the cube, with the filters applied
+            section_counts = analysis.cube_counts(attendee_cube, cross_filter)
 
-        st.subheader("Edad de los asistentes")
+            def live_counts(registrations: Snapshot) -> analysis.EventCounts:
+                """The counts of the sections from the latest registrations.
 
-        # Bar chart to show the age distribution of the assistants
-        age_range = st.slider(
-            "Selecciona el rango de edad que quieres analizar",
-            value=(0, 150),
-            step=1,
-        )
+                Both live sections run every interval, the counts are computed by
+                the first one and reused by the other while the registrations are
+                the same."""
 
-        age_counts = people_who_attended["age"].value_counts()
-        age_counts = age_counts[age_counts.index >= age_range[0]]
-        age_counts = age_counts[age_counts.index <= age_range[1]]
-        age_counts = age_counts.sort_index()
-        age_counts = age_counts.reset_index()
-        age_counts.columns = ["Edad", "Cantidad"]
-        age_counts["Edad"] = age_counts["Edad"].astype(str)
-        age_counts["Cantidad"] = age_counts["Cantidad"].astype(int)
-        age_counts["color"] = "blue"
-
-        age_bar_chart = figure(
-            title="Distribución de Edad de los que asistieron al evento",
-            x_axis_label="Edad",
-            y_axis_label="Cantidad",
-            x_range=age_counts["Edad"].tolist(),
-            height=350,
-        )
+                key = (
+                    event_id, selected_event_date, registrations.version, registrations.loaded_at, cross_filter
+                )
+                if st.session_state.get("live_counts_key") != key:
+                    st.session_state.live_counts_key = key
+                    st.session_state.live_counts = analysis.cube_counts(
+                        analysis.cube(registrations.value), cross_filter
+                    )
+                return st.session_state.live_counts
+
+            # endregion
+            # region Registered vs Attended
+            ############################################################################
+            # Section to analyze the people registered for the event vs the people who attended the event
+            #
+            # This section answers the following questions:
+            #     •	How many people registered for the event?
+            #     •	How many people attended the event?
+            #     •	How many people did not attend the event?
+            #     •	What is the percentage of people who attended the event vs the people who registered for the event?
+            ############################################################################
+
+            @timings.timed("section", "attendance")
+            def attendance_section():
+                """Pie chart and metrics of the people who attended vs registered"""
+
+                if live_mode:
+                    # Only this live section shows the version, both run every interval
+                    registrations = live_registrations()
+                    st.caption(
+                        f"Versión {registrations.version} de los registros, "
+                        f"actualizada a las {registrations.loaded_at:%H:%M:%S}"
+                    )
+                    counts = live_counts(registrations)
+                else:
+                    counts = section_counts
+                attendance = analysis.attendance_split(counts.registered, counts.attended)
+
+                st.subheader("Asistencia vs Registro")
+
+                # Pie chart to compare the number of people registered for the event vs the number of people who attended the event
+                attendance_pie_chart_data = pd.DataFrame({
+                    "Asistencia": ["Asistieron", "No asistieron"],
+                    "value": [attendance.attended, attendance.absent],
+                    "color": ["green", "red"],
+                })
+                attendance_pie_chart_data["angle"] = attendance_pie_chart_data["value"] / max(attendance.registered, 1) * 2 * pi
+                attendance_pie_chart_data["percentage"] = attendance_pie_chart_data["value"] / max(attendance.registered, 1) * 100
+
+                assistant_pie_chart_build = timings.start("figure", "attendance")
+                assistant_pie_chart = figure(
+                    title="Gente registrada vs gente que asistió",
+                    tools="hover,save,reset,help",
+                    tooltips="@Asistencia: @value (@percentage{0.2f}%)",
+                    x_range=(-0.5, 1.0),
+                )
 
-        age_bar_chart.vbar(
-            x="Edad",
-            top="Cantidad",
-            width=0.9,
-            color="color",
-            source=age_counts,
-        )
+                assistant_pie_chart.wedge(
+                    x=0,
+                    y=1,
+                    radius=0.4,
+                    start_angle=cumsum("angle", include_zero=True),
+                    end_angle=cumsum("angle"),
+                    line_color=None,
+                    fill_color="color",
+                    legend_field="Asistencia",
+                    source=attendance_pie_chart_data,
+                )
 
-        figure_config(age_bar_chart)
-        age_bar_chart.xgrid.grid_line_color = None
-        age_bar_chart.xaxis.major_label_orientation = "vertical"
-
-        # Boxplot to show the age distribution of the assistants
-        ages = people_who_attended["age"]
-
-        # Calcular estadísticas necesarias para el boxplot
-        q1 = ages.quantile(0.25)  # Primer cuartil
-        q2 = ages.median()        # Mediana
-        q3 = ages.quantile(0.75)  # Tercer cuartil
-        iqr = q3 - q1             # Rango intercuartílico (IQR)
-        lower_bound = max(ages.min(), q1 - 1.5 * iqr)  # Límite inferior
-        upper_bound = min(ages.max(), q3 + 1.5 * iqr)  # Límite superior
-
-        # Crear un DataFrame con los datos para el boxplot
-        boxplot_data = pd.DataFrame({
-            "category": ["Edades"],
-            "q1": [q1],
-            "q2": [q2],
-            "q3": [q3],
-            "lower": [lower_bound],
-            "upper": [upper_bound]
-        })
-
-        # Fuente de datos para Bokeh
-        source = ColumnDataSource(boxplot_data)
-
-        # Crear la figura del boxplot
-        boxplot = figure(
-            title="Distribución de Edades de los Asistentes",
-            y_range=["Edades"],  # Cambiar a y_range para un gráfico horizontal
-            x_axis_label="Edad",
-            x_range=age_range,
-            height=150
-        )
+                figure_config(assistant_pie_chart)
+                assistant_pie_chart.axis.axis_label = None
+                assistant_pie_chart.axis.visible = False
+                assistant_pie_chart.grid.grid_line_color = None
 
-        # Dibujar las cajas del boxplot (horizontal)
-        boxplot.hbar(y="category", height=0.4, left="q2", right="q3",
-                     source=source, color="blue", line_color="black")
-        boxplot.hbar(y="category", height=0.4, left="q1", right="q2",
-                     source=source, color="blue", line_color="black")
-
-        # Dibujar los bigotes (whiskers)
-        whisker = Whisker(base="category", upper="upper",
-                          lower="lower", dimension="width", source=source)
-        whisker.upper_head.size = whisker.lower_head.size = 10
-        boxplot.add_layout(whisker)
-
-        # Opciones de estilo
-        figure_config(boxplot)
-        boxplot.ygrid.grid_line_color = None
-        boxplot.yaxis.major_label_orientation = "horizontal"
-
-        # Display the statistics of the age of the assistants
-        age_statistics_col1, age_statistics_col2 = st.columns(2)
-
-        with age_statistics_col1:
-            streamlit_bokeh(age_bar_chart)
-
-        with age_statistics_col2:
-            st.metric(
-                label="Edad promedio de los asistentes",
-                value=people_who_attended["age"].mean(),
-                border=True,
-            )
-            st.metric(
-                label="Edad mediana de los asistentes",
-                value=people_who_attended["age"].median(),
-                border=True,
-            )
-            st.metric(
-                label="Edad de la persona más joven",
-                value=people_who_attended["age"].min(),
-                border=True,
-            )
-            st.metric(
-                label="Edad de la persona más vieja",
-                value=people_who_attended["age"].max(),
-                border=True,
-            )
+                # Display all the statistics
+                total_registrations_col, total_attendance_col = st.columns(2)
 
-        streamlit_bokeh(boxplot)
+                with total_registrations_col:
+                    show_chart(assistant_pie_chart, assistant_pie_chart_build)
 
-        st.divider()
-        # endregion
-        # region Gender of the assistants
-        ############################################################################
-        # Section to analyze the gender of the assistants of the event
-        #
-        # This section answers the following questions:
-        #     •	How many males, females, and others attended the event?
-        #     •	What is the percentage of each gender in relation to the total attendees?
-        ############################################################################
+                with total_attendance_col:
+                    st.metric(
+                        label="Total de Personas que Asistieron al Evento",
+                        value=attendance.attended,
+                        border=True,
+                    )
 
-        st.subheader("Género de los asistentes")
+                    st.metric(
+                        label="Total de Personas Registradas al Evento",
+                        value=attendance.registered,
+                        border=True,
+                    )
 
-        # Bar chart to visualize the number of attendees by gender
-        gender_counts = people_who_attended['gender'].value_counts()
-        gender_counts = (
-            gender_counts.get("MALE", 0),
-            gender_counts.get("FEMALE", 0),
-            gender_counts.get("OTHER", 0),
-        )
+                    if attendance.rate is None:
+                        st.badge(
+                            "Aún no hay gente inscrita en el evento."
+                        )
+                    else:
+                        st.badge(
+                            f"Por lo tanto, el porcentaje de asistencia es del **{attendance.rate:.2f}%**"
+                        )
+
+            live_fragment(attendance_section)()
+
+            st.divider()
+            # endregion
+            # region Age of the assistants
+            ############################################################################
+            # Section to analyze the age of the assistants of the event
+            #
+            # This section answers the following questions:
+            #     •	What is the age distribution of the assistants of the event?
+            #     •	What is the average age of the assistants of the event?
+            #     •	What is the median age of the assistants of the event?
+            #     •	What is the age of the youngest assistant of the event?
+            #     •	What is the age of the oldest assistant of the event?
+            ############################################################################
+
+            # Loaded outside of the fragment, rerunning it only rebuilds the charts
+            attendees_by_age = section_counts.ages
+            age_statistics = analysis.age_summary(attendees_by_age)
+            age_boxplot = analysis.boxplot(age_statistics)
+
+            @st.fragment
+            @timings.timed("section", "age")
+            def age_section():
+                """Bar chart, boxplot and metrics of the age of the attendees"""
+
+                st.subheader("Edad de los asistentes")
+
+                # Bar chart to show the age distribution of the assistants. Every
+                # age is sent to the browser, the slider below filters them there.
+                age_counts = attendees_by_age.sort_index()
+                age_counts = age_counts.reset_index()
+                age_counts.columns = ["Edad", "Cantidad"]
+                age_counts["Edad"] = age_counts["Edad"].astype(str)
+                age_counts["Cantidad"] = age_counts["Cantidad"].astype(int)
+                age_counts["color"] = "blue"
+                age_source = ColumnDataSource(age_counts)
+
+                age_charts_build = timings.start("figure", "age")
+                age_bar_chart = figure(
+                    title="Distribución de Edad de los que asistieron al evento",
+                    x_axis_label="Edad",
+                    y_axis_label="Cantidad",
+                    x_range=age_counts["Edad"].tolist(),
+                    height=350,
+                )
 
-        gender_range = ("HOMBRE", "MUJER", "OTRO")
-        gender_colors = ("blue", "pink", "gray")
-        gender_source = ColumnDataSource(
-            data=dict(
-                range=gender_range,
-                counts=gender_counts,
-                colors=gender_colors,
-            )
-        )
+                age_bar_chart.vbar(
+                    x="Edad",
+                    top="Cantidad",
+                    width=0.9,
+                    color="color",
+                    source=age_source,
+                )
 
-        gender_bar_chart = figure(
-            title="Género de los asistentes",
-            x_axis_label="Cantidad de asistentes",
-            y_axis_label="Género",
-            x_range=FactorRange(factors=gender_range),
-        )
+                figure_config(age_bar_chart)
+                age_bar_chart.xgrid.grid_line_color = None
+                age_bar_chart.xaxis.major_label_orientation = "vertical"
+
+                # Boxplot to show the age distribution of the assistants
+                # Crear un DataFrame con los datos para el boxplot
+                boxplot_data = pd.DataFrame({
+                    "category": ["Edades"],
+                    "q1": [age_boxplot.q1],
+                    "q2": [age_boxplot.median],
+                    "q3": [age_boxplot.q3],
+                    "lower": [age_boxplot.lower],
+                    "upper": [age_boxplot.upper]
+                })
+
+                # Fuente de datos para Bokeh
+                source = ColumnDataSource(boxplot_data)
+
+                # Crear la figura del boxplot
+                boxplot = figure(
+                    title="Distribución de Edades de los Asistentes",
+                    y_range=["Edades"],  # Cambiar a y_range para un gráfico horizontal
+                    x_axis_label="Edad",
+                    x_range=(0, 150),
+                    height=150
+                )
 
-        gender_bar_chart.vbar(
-            source=gender_source,
-            x="range",
-            top="counts",
-            width=0.9,
-            color="colors",
-            legend_field="range",
-        )
+                # Dibujar las cajas del boxplot (horizontal)
+                boxplot.hbar(y="category", height=0.4, left="q2", right="q3",
+                             source=source, color="blue", line_color="black")
+                boxplot.hbar(y="category", height=0.4, left="q1", right="q2",
+                             source=source, color="blue", line_color="black")
+
+                # Dibujar los bigotes (whiskers)
+                whisker = Whisker(base="category", upper="upper",
+                                  lower="lower", dimension="width", source=source)
+                whisker.upper_head.size = whisker.lower_head.size = 10
+                boxplot.add_layout(whisker)
+
+                # Opciones de estilo
+                figure_config(boxplot)
+                boxplot.ygrid.grid_line_color = None
+                boxplot.yaxis.major_label_orientation = "horizontal"
+
+                age_slider = range_slider(
+                    "Rango de edad que quieres analizar",
+                    0,
+                    150,
+                    age_bar_chart,
+                    age_source,
+                    "Edad",
+                    linked_figures=(boxplot,),
+                )
 
-        gender_bar_chart.xgrid.grid_line_color = None
-        gender_bar_chart.toolbar.logo = None
-        gender_bar_chart.add_tools("tap")
+                # Display the statistics of the age of the assistants
+                age_statistics_col1, age_statistics_col2 = st.columns(2)
 
-        # Display the statistics of gender attendance
-        streamlit_bokeh(gender_bar_chart)
+                with age_statistics_col1:
+                    # The slider and the charts it filters must be in the same document
+                    show_chart(
+                        column(age_slider, age_bar_chart, boxplot, sizing_mode="stretch_width"),
+                        age_charts_build,
+                    )
 
-        gender_statistics_col1, gender_statistics_col2, gender_statistics_col3 = st.columns(
-            3)
+                with age_statistics_col2:
+                    st.metric(
+                        label="Edad promedio de los asistentes",
+                        value=age_statistics.mean,
+                        border=True,
+                    )
+                    st.metric(
+                        label="Edad mediana de los asistentes",
+                        value=age_statistics.median,
+                        border=True,
+                    )
+                    st.metric(
+                        label="Edad de la persona más joven",
+                        value=age_statistics.min,
+                        border=True,
+                    )
+                    st.metric(
+                        label="Edad de la persona más vieja",
+                        value=age_statistics.max,
+                        border=True,
+                    )
 
-        with gender_statistics_col1:
-            try:
-                st.metric(
-                    label="Cantidad de hombres",
-                    value=f"{gender_counts[0]} ({(gender_counts[0] / sum(gender_counts) * 100):.2f}%)",
-                    border=True,
+            age_section()
+
+            st.divider()
+            # endregion
+            # region Gender of the assistants
+            ############################################################################
+            # Section to analyze the gender of the assistants of the event
+            #
+            # This section answers the following questions:
+            #     •	How many males, females, and others attended the event?
+            #     •	What is the percentage of each gender in relation to the total attendees?
+            ############################################################################
+
+            attendees_by_gender = section_counts.genders
+
+            @st.fragment
+            @timings.timed("section", "gender")
+            def gender_section():
+                """Bar chart and metrics of the gender of the attendees"""
+
+                st.subheader("Género de los asistentes")
+
+                # Bar chart to visualize the number of attendees by gender
+                genders = analysis.category_counts(attendees_by_gender, analysis.GENDERS)
+
+                gender_range = tuple(GENDER_LABELS[gender] for gender in analysis.GENDERS)
+                gender_colors = ("blue", "pink", "gray")
+                gender_source = ColumnDataSource(
+                    data=dict(
+                        range=gender_range,
+                        counts=genders.counts,
+                        colors=gender_colors,
+                        alphas=selected_alphas(analysis.GENDERS, cross_filter.genders),
+                    )
                 )
-            except ZeroDivisionError:
-                st.metric(
-                    label="Cantidad de hombres",
-                    value="0 (0.00%)",
-                    border=True,
+
+                gender_bar_chart_build = timings.start("figure", "gender")
+                gender_bar_chart = figure(
+                    title="Género de los asistentes",
+                    x_axis_label="Cantidad de asistentes",
+                    y_axis_label="Género",
+                    x_range=FactorRange(factors=gender_range),
                 )
 
-        with gender_statistics_col2:
-            try:
-                st.metric(
-                    label="Cantidad de mujeres",
-                    value=f"{gender_counts[1]} ({(gender_counts[1] / sum(gender_counts) * 100):.2f}%)",
-                    border=True,
+                gender_bar_chart.vbar(
+                    source=gender_source,
+                    x="range",
+                    top="counts",
+                    width=0.9,
+                    color="colors",
+                    fill_alpha="alphas",
+                    legend_field="range",
                 )
-            except ZeroDivisionError:
-                st.metric(
-                    label="Cantidad de mujeres",
-                    value="0 (0.00%)",
-                    border=True,
+
+                gender_bar_chart.xgrid.grid_line_color = None
+                gender_bar_chart.toolbar.logo = None
+
+                # Display the statistics of gender attendance
+                show_chart(gender_bar_chart, gender_bar_chart_build)
+
+                gender_statistics_col1, gender_statistics_col2, gender_statistics_col3 = st.columns(
+                    3)
+
+                with gender_statistics_col1:
+                    st.metric(
+                        label="Cantidad de hombres",
+                        value=f"{genders.counts[0]} ({genders.percentages[0]:.2f}%)",
+                        border=True,
+                    )
+
+                with gender_statistics_col2:
+                    st.metric(
+                        label="Cantidad de mujeres",
+                        value=f"{genders.counts[1]} ({genders.percentages[1]:.2f}%)",
+                        border=True,
+                    )
+
+                with gender_statistics_col3:
+                    st.metric(
+                        label="Cantidad de otros",
+                        value=f"{genders.counts[2]} ({genders.percentages[2]:.2f}%)",
+                        border=True,
+                    )
+
+            gender_section()
+
+            st.divider()
+            # endregion
+            # region People who registered to previous events
+            ############################################################################
+            # Section to analyze the people who registered for previous events
+            #
+            # This section answers the following questions:
+            #     •	How many people registered for previous events?
+            #     •	How many people are new and how many are returning?
+            #     •	To how many previous events did the people register?
+            #     •	How many people do this event and another one have in common?
+            ############################################################################
+
+            @st.fragment
+            @timings.timed("section", "previous_events")
+            def previous_events_section():
+                """Metrics and bar chart of the people who came to previous events"""
+
+                st.subheader("Personas que vienen de eventos anteriores")
+
+                returning = analysis.returning_people(previous_registrations, previous_attendances)
+
+                previous_events_col1, previous_events_col2, previous_events_col3 = st.columns(3)
+
+                with previous_events_col1:
+                    st.metric(
+                        label="Cantidad de personas registradas en eventos anteriores",
+                        value=f"{returning.returning} ({returning.returning / max(returning.registered, 1) * 100:.2f}%)",
+                        border=True,
+                    )
+
+                with previous_events_col2:
+                    st.metric(
+                        label="Cantidad de personas nuevas",
+                        value=f"{returning.new} ({returning.new / max(returning.registered, 1) * 100:.2f}%)",
+                        border=True,
+                    )
+
+                with previous_events_col3:
+                    st.metric(
+                        label="Asistentes que ya asistieron a eventos anteriores",
+                        value=f"{returning.returning_attendees} ({returning.returning_attendees / max(returning.attendees, 1) * 100:.2f}%)",
+                        border=True,
+                    )
+
+                # Bar chart with the number of people by number of previous events
+                events_counts = previous_registrations.value_counts().sort_index()
+                events_range = [str(events) for events in events_counts.index]
+
+                previous_events_source = ColumnDataSource(
+                    data=dict(
+                        range=events_range,
+                        counts=events_counts.to_list(),
+                    )
                 )
 
-        with gender_statistics_col3:
-            try:
-                st.metric(
-                    label="Cantidad de otros",
-                    value=f"{gender_counts[2]} ({(gender_counts[2] / sum(gender_counts) * 100):.2f}%)",
-                    border=True,
+                previous_events_bar_chart_build = timings.start("figure", "previous_events")
+                previous_events_bar_chart = figure(
+                    title="Eventos anteriores de las personas registradas",
+                    x_axis_label="Cantidad de eventos anteriores",
+                    y_axis_label="Cantidad de personas",
+                    x_range=FactorRange(factors=events_range),
+                    tooltips=[("Eventos anteriores", "@range"), ("Personas", "@counts")],
                 )
-            except ZeroDivisionError:
-                st.metric(
-                    label="Cantidad de otros",
-                    value="0 (0.00%)",
-                    border=True,
+
+                previous_events_bar_chart.vbar(
+                    source=previous_events_source,
+                    x="range",
+                    top="counts",
+                    width=0.9,
+                    color="blue",
                 )
 
-        st.divider()
-        # endregion
-        # region People who registered to previous events
-        ############################################################################
-        # Section to analyze the people who registered for previous events
-        #
-        # This section answers the following questions:
-        #     •	How many people registered for previous events?
-        ############################################################################
-        # id_all_assistants = people_registered["companion_id"]
-        # try:
-        #     registrations_for_other_events = conn.query(
-        #         f"""SELECT * FROM registration WHERE companion_id IN ({','.join(map(str, id_all_assistants))}) AND event_id != '{event_id}'"""
-        #     )
-        # except sqlalchemy.exc.ProgrammingError:
-        #     registrations_for_other_events = pd.DataFrame()
-
-        # try:
-        #     count_people_registered_previous_events = len(
-        #         registrations_for_other_events["companion_id"].unique()
-        #     )
-        # except KeyError:
-        #     count_people_registered_previous_events = 0
-
-        # st.metric(
-        #     label="Cantidad de personas registradas en eventos anteriores",
-        #     value=count_people_registered_previous_events,
-        #     border=True,
-        # )
-        # st.divider()
-        # endregion
-        # region Assistance hour
-        ############################################################################
-        # Section to analyze the attendance hour of the assistants of the event
-        #
-        # This section answers the following questions:
-        #     •	What is the attendance hour of the assistants of the event?
-        #     •	What is the average attendance hour of the assistants of the event?
-        #     •	What is the most common attendance hour of the assistants of the event?
-        #     •	What is the least common attendance hour of the assistants of the event?
-        ############################################################################
+                figure_config(previous_events_bar_chart)
+                previous_events_bar_chart.xgrid.grid_line_color = None
+                previous_events_bar_chart.y_range.start = 0
 
-        st.subheader("Hora de asistencia")
+                show_chart(previous_events_bar_chart, previous_events_bar_chart_build)
 
-        hour_range = st.slider(
-            "Selecciona el rango de hora que quieres analizar",
-            min_value=0,
-            max_value=24,
-            value=(0, 24),
-        )
+                # People in common with another event
+                other_event_id = st.selectbox(
+                    "Comparar con otro evento",
+                    [other for other in event_labels if other != event_id],
+                    format_func=event_labels.get,
+                    index=None,
+                    placeholder="Selecciona un evento",
+                )
 
-        # Bar chart to show the attendance hour of the assistants
-        try:
-            attendance_hour_counts = people_registered["arrival_time"].dt.components.hours.value_counts(
-            )
-        except AttributeError:
-            attendance_hour_counts = pd.Series(dtype=int)
-
-        attendance_hour_counts = attendance_hour_counts[
-            attendance_hour_counts.index >= hour_range[0]]
-        attendance_hour_counts = attendance_hour_counts[
-            attendance_hour_counts.index <= hour_range[1]]
-        attendance_hour_counts = attendance_hour_counts.sort_index()
-        attendance_hour_counts = attendance_hour_counts.reset_index()
-        attendance_hour_counts.columns = ["Hora", "Cantidad"]
-        attendance_hour_counts["Hora"] = attendance_hour_counts["Hora"].astype(
-            str)
-        attendance_hour_counts["Cantidad"] = attendance_hour_counts["Cantidad"].astype(
-            int)
-        attendance_hour_counts["color"] = "blue"
-
-        hour_bar_chart = figure(
-            title="Distribución de Hora de Asistencia de los asistentes",
-            x_axis_label="Hora",
-            y_axis_label="Cantidad",
-            x_range=attendance_hour_counts["Hora"].tolist(),
-            height=350,
-        )
+                if other_event_id is not None:
+                    overlap_col1, overlap_col2 = st.columns(2)
+
+                    with overlap_col1:
+                        st.metric(
+                            label="Personas registradas en ambos eventos",
+                            value=event_membership.overlap(event_id, other_event_id),
+                            border=True,
+                        )
+
+                    with overlap_col2:
+                        st.metric(
+                            label="Personas que asistieron a ambos eventos",
+                            value=event_membership.overlap(event_id, other_event_id, attended=True),
+                            border=True,
+                        )
+
+            previous_events_section()
+
+            st.divider()
+            # endregion
+            # region Assistance hour
+            ############################################################################
+            # Section to analyze the attendance hour of the assistants of the event
+            #
+            # This section answers the following questions:
+            #     •	What is the attendance hour of the assistants of the event?
+            #     •	What is the average attendance hour of the assistants of the event?
+            #     •	What is the most common attendance hour of the assistants of the event?
+            #     •	What is the least common attendance hour of the assistants of the event?
+            ############################################################################
+
+            @timings.timed("section", "arrival_hour")
+            def arrival_hour_section():
+                """Bar chart and metrics of the hour of arrival of the attendees"""
+
+                st.subheader("Hora de asistencia")
+
+                # Bar chart to show the attendance hour of the assistants
+                if live_mode:
+                    attendees_by_hour = live_counts(live_registrations()).arrival_hours
+                else:
+                    attendees_by_hour = section_counts.arrival_hours
+
+                attendance_hour_counts = attendees_by_hour.sort_index()
+                attendance_hour_counts = attendance_hour_counts.reset_index()
+                attendance_hour_counts.columns = ["Hora", "Cantidad"]
+                attendance_hour_counts["Hora"] = attendance_hour_counts["Hora"].astype(
+                    str)
+                attendance_hour_counts["Cantidad"] = attendance_hour_counts["Cantidad"].astype(
+                    int)
+                attendance_hour_counts["color"] = "blue"
+                attendance_hour_source = ColumnDataSource(attendance_hour_counts)
+
+                hour_bar_chart_build = timings.start("figure", "arrival_hour")
+                hour_bar_chart = figure(
+                    title="Distribución de Hora de Asistencia de los asistentes",
+                    x_axis_label="Hora",
+                    y_axis_label="Cantidad",
+                    x_range=attendance_hour_counts["Hora"].tolist(),
+                    height=350,
+                )
 
-        hour_bar_chart.vbar(
-            x="Hora",
-            top="Cantidad",
-            width=0.9,
-            color="color",
-            source=attendance_hour_counts,
-        )
+                hour_bar_chart.vbar(
+                    x="Hora",
+                    top="Cantidad",
+                    width=0.9,
+                    color="color",
+                    source=attendance_hour_source,
+                )
 
-        figure_config(hour_bar_chart)
-        hour_bar_chart.xgrid.grid_line_color = None
-        hour_bar_chart.xaxis.major_label_orientation = "vertical"
-        hour_bar_chart.y_range.start = 0
+                figure_config(hour_bar_chart)
+                hour_bar_chart.xgrid.grid_line_color = None
+                hour_bar_chart.xaxis.major_label_orientation = "vertical"
+                hour_bar_chart.y_range.start = 0
+
+                # Display the statistics of the attendance hour of the assistants
+                hour_statistics_col1, hour_statistics_col2 = st.columns(2)
+
+                hour_slider = range_slider(
+                    "Rango de hora que quieres analizar",
+                    0,
+                    24,
+                    hour_bar_chart,
+                    attendance_hour_source,
+                    "Hora",
+                )
 
-        # Display the statistics of the attendance hour of the assistants
-        hour_statistics_col1, hour_statistics_col2 = st.columns(2)
+                with hour_statistics_col1:
+                    show_chart(
+                        column(hour_slider, hour_bar_chart, sizing_mode="stretch_width"),
+                        hour_bar_chart_build,
+                    )
 
-        with hour_statistics_col1:
-            streamlit_bokeh(hour_bar_chart)
+                arrival = analysis.arrival_summary(attendees_by_hour)
+
+                with hour_statistics_col2:
+                    if arrival.mean_hour is None:
+                        st.metric(
+                            label="Hora promedio de asistencia",
+                            value="No disponible",
+                            border=True,
+                        )
+                        st.metric(
+                            label="Hora más concurrida de asistencia",
+                            value="No disponible",
+                            border=True,
+                        )
+                    else:
+                        st.metric(
+                            label="Hora promedio de asistencia",
+                            value=arrival.mean_hour,
+                            border=True,
+                        )
+                        st.metric(
+                            label="Hora más concurrida de asistencia",
+                            value=arrival.busiest_hour,
+                            border=True,
+                        )
+
+            live_fragment(arrival_hour_section)()
+
+            st.divider()
+            # endregion
+            # region Reactions of the assistants
+            ############################################################################
+            # Section to analyze reactions of the assistants of the event
+            ############################################################################
+
+            registrations_by_reaction = section_counts.reactions
+
+            @st.fragment
+            @timings.timed("section", "reactions")
+            def reaction_section():
+                """Bar chart and total of the reactions of the registered people"""
+
+                st.subheader("Likes vs Dislikes vs Sin reacción")
+
+                # Total number of registrations, this only includes LIKE, DISLIKE because NO_REACTION means that the user has not reacted yet
+                reactions = analysis.category_counts(registrations_by_reaction, analysis.REACTIONS)
 
-        with hour_statistics_col2:
-            try:
                 st.metric(
-                    label="Hora promedio de asistencia",
-                    value=people_registered["arrival_time"].dt.components.hours.mean(
-                    ),
-                    border=True,
+                    label="Total de reacciones",
+                    value=reactions.count("LIKE") + reactions.count("DISLIKE"),
                 )
-            except AttributeError:
-                st.metric(
-                    label="Hora promedio de asistencia",
-                    value="No disponible",
-                    border=True,
+                reactions_range = tuple(REACTION_LABELS[reaction] for reaction in analysis.REACTIONS)
+                reaction_colors = ("green", "red", "gray")
+                reaction_source = ColumnDataSource(
+                    data=dict(
+                        range=reactions_range,
+                        counts=reactions.counts,
+                        colors=reaction_colors,
+                        alphas=selected_alphas(analysis.REACTIONS, cross_filter.reactions),
+                    )
                 )
 
-            try:
-                st.metric(
-                    label="Hora más concurrida de asistencia",
-                    value=people_registered["arrival_time"].dt.components.hours.mode()[
-                        0],
-                    border=True,
+                reaction_bar_chart_build = timings.start("figure", "reactions")
+                reaction_bar_chart = figure(
+                    title="Reacciones de los usuarios",
+                    x_axis_label="Reacciones",
+                    y_axis_label="Cantidad de usuarios",
+                    x_range=FactorRange(factors=reactions_range),
                 )
-            except AttributeError:
-                st.metric(
-                    label="Hora más concurrida de asistencia",
-                    value="No disponible",
-                    border=True,
+
+                reaction_bar_chart.vbar(
+                    source=reaction_source,
+                    x="range",
+                    top="counts",
+                    width=0.9,
+                    color="colors",
+                    fill_alpha="alphas",
+                    legend_field="range",
                 )
 
-        st.divider()
-        # endregion
-        ############################################################################
-        # Section to analyze reactions of the assistants of the event
-        ############################################################################
+                reaction_bar_chart.xgrid.grid_line_color = None
+                reaction_bar_chart.toolbar.logo = None
 
-        st.subheader("Likes vs Dislikes vs Sin reacción")
+                show_chart(reaction_bar_chart, reaction_bar_chart_build)
 
-        # Total number of registrations, this only includes LIKE, DISLIKE because NO_REACTION means that the user has not reacted yet
-        st.metric(
-            label="Total de reacciones",
-            value=people_registered[
-                people_registered["reaction"].isin(("LIKE", "DISLIKE"))
-            ].shape[0],
-        )
+            reaction_section()
 
-        reaction_counts = people_registered["reaction"].value_counts()
-        reaction_counts = (
-            reaction_counts.get("LIKE", 0),
-            reaction_counts.get("DISLIKE", 0),
-            reaction_counts.get("NO_REACTION", 0),
-        )
-        reactions_range = ("LIKE", "DISLIKE", "SIN REACCIÓN")
-        reaction_colors = ("green", "red", "gray")
-        reaction_source = ColumnDataSource(
-            data=dict(
-                range=reactions_range,
-                counts=reaction_counts,
-                colors=reaction_colors,
-            )
-        )
+            st.divider()
+            # endregion
 
-        reaction_bar_chart = figure(
-            title="Reacciones de los usuarios",
-            x_axis_label="Reacciones",
-            y_axis_label="Cantidad de usuarios",
-            x_range=FactorRange(factors=reactions_range),
-        )
+        statistics()
+# region Cache
+############################################################################
+# Debug panels with the memory and the counters of the shared cache, the
+# state of the connection pool and the timings of the page
+############################################################################
 
-        reaction_bar_chart.vbar(
-            source=reaction_source,
-            x="range",
-            top="counts",
-            width=0.9,
-            color="colors",
-            legend_field="range",
-        )
+with st.sidebar.expander("Caché de datos"):
+    cache_stats = db.shared_cache().stats()
+    requests = cache_stats.hits + cache_stats.misses
+
+    st.metric(
+        label="Memoria usada",
+        value=f"{cache_stats.bytes / 2**20:.1f} MB",
+        delta=f"de {cache_stats.max_bytes / 2**20:.0f} MB" if cache_stats.max_bytes else None,
+        delta_color="off",
+    )
+    st.metric(label="Resultados en caché", value=cache_stats.entries)
+    st.metric(
+        label="Aciertos",
+        value=f"{cache_stats.hits} ({cache_stats.hits / max(requests, 1) * 100:.1f}%)",
+    )
+    st.metric(label="Fallos", value=cache_stats.misses)
+    st.metric(label="Desalojos", value=cache_stats.evictions)
 
-        reaction_bar_chart.xgrid.grid_line_color = None
-        reaction_bar_chart.toolbar.logo = None
-        reaction_bar_chart.add_tools("tap")
+    cache_entries = pd.DataFrame(db.shared_cache().entries(), columns=["key", "bytes", "version", "loaded_at"])
+    # The keys are tuples with the query, its parameters and the generation
+    cache_entries["key"] = cache_entries["key"].map(
+        lambda key: " ".join(" ".join(map(str, key)).split())[:120]
+    )
+    st.dataframe(
+        cache_entries.sort_values("bytes", ascending=False),
+        column_config={
+            "key": "Consulta",
+            "bytes": st.column_config.NumberColumn("Bytes", format="%d"),
+            "version": "Versión",
+            "loaded_at": st.column_config.DatetimeColumn("Cargada", format="HH:mm:ss"),
+        },
+        hide_index=True,
+    )
+
+with st.sidebar.expander("Conexiones a la base de datos"):
+    pool_status = db.pool_metrics().status(conn.engine)
+
+    st.metric(
+        label="Conexiones en uso",
+        value=pool_status.checked_out if pool_status.checked_out is not None else "-",
+        delta=f"tamaño del pool {pool_status.size}" if pool_status.size else None,
+        delta_color="off",
+    )
+    st.metric(label="Conexiones abiertas", value=pool_status.connections_opened)
+    st.metric(
+        label="Espera por una conexión",
+        value=f"{pool_status.mean_wait * 1000:.1f} ms",
+        delta=f"máxima {pool_status.max_wait * 1000:.1f} ms",
+        delta_color="off",
+    )
+    st.metric(label="Errores de conexión", value=pool_status.errors)
 
-        streamlit_bokeh(reaction_bar_chart)
+page_timer.stop()
+# The reruns of the fragments must not be added to the measurements of this run
+timings.end_run()
+
+show_timings = st.sidebar.toggle(
+    "Mostrar tiempos de la página",
+    help="Tiempo de cada consulta, sección y gráfico. Los tiempos de esta ejecución "
+    "no incluyen las consultas precargadas en segundo plano ni las secciones que se "
+    "actualizan solas.",
+)
 
-        st.divider()
+if show_timings:
+    with st.sidebar.expander("Rendimiento", expanded=True):
+        run_timings = pd.DataFrame(page_timings, columns=["kind", "name", "seconds", "rows", "bytes"])
+        run_totals = run_timings.groupby("kind")["seconds"].sum()
+
+        st.metric(label="Tiempo de la página", value=f"{run_totals.get('page', 0) * 1000:.0f} ms")
+        st.metric(
+            label="Consultas a la base de datos",
+            value=f"{run_totals.get('query', 0) * 1000:.0f} ms",
+            delta=f"{(run_timings['kind'] == 'query').sum()} consultas, "
+            f"{run_timings['bytes'].sum() / 2**20:.1f} MB",
+            delta_color="off",
+        )
+        st.metric(label="Construcción de gráficos", value=f"{run_totals.get('figure', 0) * 1000:.0f} ms")
+        st.metric(label="Envío de gráficos", value=f"{run_totals.get('render', 0) * 1000:.0f} ms")
+
+        timing_columns = {
+            "kind": "Tipo",
+            "name": "Nombre",
+            "count": "Veces",
+            "seconds": st.column_config.NumberColumn("Segundos", format="%.3f"),
+            "total_seconds": st.column_config.NumberColumn("Total (s)", format="%.3f"),
+            "max_seconds": st.column_config.NumberColumn("Máximo (s)", format="%.3f"),
+            "rows": "Filas",
+            "bytes": st.column_config.NumberColumn("Bytes", format="%d"),
+        }
+
+        st.write("Esta ejecución")
+        st.dataframe(
+            run_timings.sort_values("seconds", ascending=False),
+            column_config=timing_columns,
+            hide_index=True,
+        )
+
+        st.write("Desde que inició el servidor")
+        st.dataframe(pd.DataFrame(timings.stats()), column_config=timing_columns, hide_index=True)
+
+        st.download_button(
+            "Descargar métricas (Prometheus)",
+            timings.prometheus(),
+            file_name="dashboard_metrics.prom",
+            mime="text/plain",
+        )
+# endregion
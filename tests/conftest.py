@@ -0,0 +1,50 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from dashboard import synthetic
+
+TODAY = date(2024, 6, 1)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """A small synthetic database, new for every test so they can change it"""
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    synthetic.build(engine, synthetic.generate(2000, seed=0, today=TODAY))
+    yield engine
+    engine.dispose()
+
+
+def add_registration(engine, event_id: int, companion_id: int, created_at: str) -> int:
+    """Insert a registration and return its id"""
+
+    with engine.begin() as connection:
+        registration_id = connection.execute(text("SELECT MAX(id) + 1 FROM registration")).scalar()
+        connection.execute(
+            text(
+                "INSERT INTO registration (id, event_id, assistant_id, companion_id, companion_type,"
+                " created_at, reaction, reaction_date) VALUES (:id, :event_id, :companion_id,"
+                " :companion_id, 'SELF', :created_at, 'NO_REACTION', NULL)"
+            ),
+            {"id": registration_id, "event_id": event_id, "companion_id": companion_id, "created_at": created_at},
+        )
+    return registration_id
+
+
+def first_date(engine, event_id: int) -> str:
+    """The first date of an event"""
+
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT MIN(day_date) FROM eventdate WHERE event_id = :event_id"),
+            {"event_id": event_id},
+        ).scalar()
+
+
+def read(engine, sql: str, params: dict | None = None) -> pd.DataFrame:
+    with engine.connect() as connection:
+        return pd.read_sql(text(sql), connection, params=params)
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from dashboard.age import age_at
+from dashboard.queries import sql_function
+
+
+@pytest.mark.parametrize(
+    ("date_of_birth", "reference_date", "age"),
+    [
+        ("1990-06-15", "2020-06-14", 29),
+        ("1990-06-15", "2020-06-15", 30),
+        ("1990-12-31", "2021-01-01", 30),
+        # Born on a leap day, one year older on March 1 of the other years
+        ("2000-02-29", "2001-02-28", 0),
+        ("2000-02-29", "2001-03-01", 1),
+        ("2000-02-29", "2004-02-28", 3),
+        ("2000-02-29", "2004-02-29", 4),
+        # The reference is a leap day
+        ("1999-03-01", "2004-02-29", 4),
+        ("1999-02-28", "2004-02-29", 5),
+    ],
+)
+def test_age_at(date_of_birth, reference_date, age):
+    assert age_at([date_of_birth], reference_date).tolist() == [age]
+
+
+def test_age_at_missing_dates():
+    ages = age_at(pd.Series(["2000-01-01", None], index=[10, 20]), "2020-01-01")
+
+    assert ages.index.tolist() == [10, 20]
+    assert ages.iloc[0] == 20
+    assert pd.isna(ages.iloc[1])
+
+
+def test_age_at_one_date_per_person():
+    ages = age_at(["2000-02-29", "2000-02-29"], ["2001-02-28", "2001-03-01"])
+
+    assert ages.tolist() == [0, 1]
+
+
+def test_age_at_matches_sqlite():
+    births = ["1990-06-15", "2000-02-29", "2000-02-29", "1999-03-01", "1980-01-01"]
+    references = ["2020-06-14", "2001-02-28", "2004-02-29", "2004-02-29", "2023-12-31"]
+    sql = f"SELECT {sql_function('sqlite', 'age', ':birth', ':reference')}"
+
+    with create_engine("sqlite://").connect() as connection:
+        expected = [
+            connection.execute(text(sql), {"birth": birth, "reference": reference}).scalar()
+            for birth, reference in zip(births, references)
+        ]
+
+    assert age_at(births, references).tolist() == expected
@@ -0,0 +1,121 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard import analysis, queries
+from dashboard.analysis import CubeFilter
+from tests.conftest import first_date, read
+
+
+def _counts(values) -> pd.Series:
+    return pd.Series(values).value_counts().sort_index()
+
+
+@pytest.mark.parametrize("q", [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1])
+def test_weighted_quantile_matches_raw_values(q):
+    values = [18, 18, 19, 21, 21, 21, 25, 40, 40, 67]
+
+    assert analysis.weighted_quantile(_counts(values), q) == pytest.approx(pd.Series(values).quantile(q))
+
+
+def test_weighted_quantile_without_values():
+    assert math.isnan(analysis.weighted_quantile(pd.Series([0, 0], index=[20, 30]), 0.5))
+
+
+def test_age_summary_and_boxplot():
+    values = [18, 19, 19, 20, 20, 20, 21, 22, 23, 80]
+    summary = analysis.age_summary(_counts(values))
+    raw = pd.Series(values)
+
+    assert summary.mean == pytest.approx(raw.mean())
+    assert summary.median == pytest.approx(raw.median())
+    assert (summary.min, summary.max) == (18, 80)
+    assert summary.q1 == pytest.approx(raw.quantile(0.25))
+    assert summary.q3 == pytest.approx(raw.quantile(0.75))
+
+    box = analysis.boxplot(summary)
+    # The lower whisker stops at the youngest attendee, the upper one before the outlier
+    assert box.lower == 18
+    assert box.upper == pytest.approx(summary.q3 + 1.5 * (summary.q3 - summary.q1))
+
+
+def test_attendance_split():
+    assert analysis.attendance_split(200, 150) == analysis.AttendanceSplit(200, 150, 50, 75.0)
+    assert analysis.attendance_split(0, 0).rate is None
+
+
+def test_category_counts_fills_missing_categories():
+    counts = analysis.category_counts(pd.Series({"FEMALE": 3, "MALE": 1}), analysis.GENDERS)
+
+    assert counts.counts == (1, 3, 0)
+    assert counts.percentages == (25.0, 75.0, 0.0)
+    assert counts.count("OTHER") == 0
+
+
+def test_returning_people():
+    returning = analysis.returning_people(pd.Series([0, 1, 3, 0]), pd.Series([2, 0]))
+
+    assert returning == analysis.ReturningPeople(
+        registered=4, returning=2, new=2, attendees=2, returning_attendees=1
+    )
+
+
+def _registrations() -> pd.DataFrame:
+    frame = pd.DataFrame({
+        "registration_id": [1, 2, 3, 4, 5],
+        "companion_id": [10, 11, 12, 13, 14],
+        "registration_created_at": ["2024-01-01 10:00:00"] * 5,
+        "reaction": ["LIKE", "LIKE", "DISLIKE", "NO_REACTION", "LIKE"],
+        "reaction_date": ["2024-01-02 10:00:00", "2024-01-02 11:00:00", "2024-01-02 12:00:00", None, "2024-01-03 10:00:00"],
+        "gender": ["FEMALE", "MALE", "FEMALE", "OTHER", "FEMALE"],
+        "date_of_birth": ["2000-02-29", "1990-06-15", None, "1980-01-01", "2004-03-01"],
+        "arrival_time": ["09:15:00", "10:05:00", "09:45:00", None, None],
+        "day_date": ["2024-02-28"] * 5,
+    })
+    return analysis.typed(frame, "2024-02-28")
+
+
+def test_event_counts():
+    counts = analysis.event_counts(_registrations())
+
+    assert (counts.registered, counts.attended) == (5, 3)
+    assert counts.genders.to_dict() == {"MALE": 1, "FEMALE": 2}
+    assert counts.reactions.to_dict() == {"LIKE": 3, "DISLIKE": 1, "NO_REACTION": 1}
+    # The ages of the attendees, the one without date of birth is left out
+    assert counts.ages.to_dict() == {23: 1, 33: 1}
+    assert counts.arrival_hours.to_dict() == {9: 2, 10: 1}
+
+
+def test_cube_counts_filters_every_chart_but_its_own():
+    cube = analysis.cube(_registrations())
+    counts = analysis.cube_counts(cube, CubeFilter(genders=("FEMALE",), hours=(9, 9)))
+
+    assert (counts.registered, counts.attended) == (2, 2)
+    # The genders are only filtered by the hours
+    assert counts.genders.to_dict() == {"FEMALE": 2}
+    assert counts.arrival_hours.to_dict() == {9: 2}
+    assert counts.reactions.to_dict() == {"LIKE": 1, "DISLIKE": 1}
+
+    counts = analysis.cube_counts(cube, CubeFilter(age_bands=("age_18_25",)))
+    assert (counts.registered, counts.attended) == (2, 1)
+    assert counts.ages.to_dict() == {23: 1, 33: 1}
+
+
+def test_cube_query_matches_registrations(engine):
+    day_date = first_date(engine, 1)
+    params = {"event_id": 1, "day_date": day_date}
+
+    registrations = analysis.typed(read(engine, queries.REGISTRATIONS, params), day_date)
+    from_query = analysis.typed_cube(read(engine, queries.attendee_cube("sqlite"), params))
+
+    expected = analysis.event_counts(registrations)
+    counts = analysis.cube_counts(from_query)
+    assert (counts.registered, counts.attended) == (expected.registered, expected.attended)
+    for field in ("genders", "reactions", "ages", "arrival_hours"):
+        pd.testing.assert_series_equal(
+            getattr(counts, field), getattr(expected, field), check_index_type=False, check_names=False
+        )
+    assert counts.registered == len(registrations)
+    assert counts.attended == int(np.count_nonzero(registrations["arrival_time"].notna()))
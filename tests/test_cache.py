@@ -0,0 +1,158 @@
+import threading
+import time
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from dashboard.cache import SharedCache, sizeof
+
+
+def test_get_loads_once():
+    cache = SharedCache()
+    loads = []
+
+    first = cache.get("key", lambda: loads.append(1) or "value")
+    second = cache.get("key", lambda: loads.append(1) or "other")
+
+    assert first.value == second.value == "value"
+    assert first.version == second.version == 1
+    assert len(loads) == 1
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (1, 1)
+
+
+def test_get_loads_again_when_expired():
+    cache = SharedCache()
+
+    cache.get("key", lambda: "old", ttl=timedelta(milliseconds=50))
+    time.sleep(0.1)
+    assert "key" not in cache
+
+    snapshot = cache.get("key", lambda: "new", ttl=timedelta(milliseconds=50))
+    assert (snapshot.value, snapshot.version) == ("new", 2)
+
+
+def test_failed_first_load_is_not_kept():
+    cache = SharedCache()
+
+    def fail():
+        raise RuntimeError("database is down")
+
+    with pytest.raises(RuntimeError):
+        cache.get("key", fail)
+
+    assert "key" not in cache
+    assert cache.stats().entries == 0
+    assert cache.get("key", lambda: "value").version == 1
+
+
+def test_one_load_in_flight_per_key():
+    cache = SharedCache()
+    loads = []
+    started = threading.Event()
+
+    def load():
+        loads.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("key", load))) for _ in range(8)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert {snapshot.value for snapshot in results} == {"value"}
+
+
+def test_least_recently_used_entry_is_dropped():
+    cache = SharedCache(max_entries=2)
+
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: 1)
+    cache.get("c", lambda: 3)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert [entry.key for entry in cache.entries()] == ["c", "a"]
+    assert cache.stats().evictions == 1
+
+
+def test_entries_are_dropped_past_max_bytes():
+    frame = pd.DataFrame({"value": range(1000)})
+    size = sizeof(frame)
+    cache = SharedCache(max_bytes=int(size * 2.5))
+
+    cache.get("a", frame.copy)
+    cache.get("b", frame.copy)
+    assert cache.stats().bytes == 2 * size
+
+    cache.get("c", frame.copy)
+    stats = cache.stats()
+    assert "a" not in cache
+    assert (stats.entries, stats.bytes, stats.evictions) == (2, 2 * size, 1)
+
+
+def test_most_recent_entry_is_kept_over_max_bytes():
+    cache = SharedCache(max_bytes=10)
+
+    cache.get("small", lambda: 1)
+    cache.get("big", lambda: pd.DataFrame({"value": range(1000)}))
+
+    assert "big" in cache
+    assert "small" not in cache
+
+
+def test_refresh_keeps_the_version_when_nothing_changed():
+    cache = SharedCache()
+    value = ["row"]
+    loaded = cache.get("key", lambda: value)
+
+    same = cache.refresh("key", lambda current: current)
+    assert same.value is value
+    assert same.version == 1
+    assert same.loaded_at >= loaded.loaded_at
+
+    changed = cache.refresh("key", lambda current: current + ["new row"])
+    assert changed.value == ["row", "new row"]
+    assert changed.version == 2
+    assert cache.get("key", lambda: None).value == ["row", "new row"]
+
+
+def test_refresh_skips_missing_and_recent_values():
+    cache = SharedCache()
+    refreshes = []
+
+    assert cache.refresh("missing", lambda current: refreshes.append(1)) is None
+
+    cache.get("key", lambda: "value")
+    assert cache.refresh("key", lambda current: refreshes.append(1), max_age=timedelta(hours=1)) is None
+    assert refreshes == []
+
+
+def test_refresh_keeps_the_ttl():
+    cache = SharedCache()
+    cache.get("key", lambda: "value", ttl=timedelta(milliseconds=50))
+
+    assert cache.refresh("key", lambda current: "new").version == 2
+    time.sleep(0.1)
+    assert "key" not in cache
+
+
+def test_discard():
+    cache = SharedCache()
+    for event_id in (1, 2):
+        cache.get(("registrations", event_id), lambda: event_id)
+
+    cache.discard(lambda key: key[1] == 1)
+
+    assert ("registrations", 1) not in cache
+    assert ("registrations", 2) in cache
+    assert cache.stats().bytes == sizeof(2)
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pandas as pd
+
+from dashboard import analysis, queries
+from dashboard.dataset import merge_changes, watermarks
+from tests.conftest import add_registration, first_date, read
+
+
+def _typed(rows: list[dict]) -> pd.DataFrame:
+    frame = pd.DataFrame(rows, columns=[
+        "registration_id", "companion_id", "registration_created_at", "reaction",
+        "reaction_date", "gender", "date_of_birth", "arrival_time", "day_date",
+    ])
+    return analysis.typed(frame, "2024-03-01")
+
+
+def _row(registration_id: int, reaction_date=None, arrival_time=None) -> dict:
+    return {
+        "registration_id": registration_id,
+        "companion_id": registration_id * 10,
+        "registration_created_at": f"2024-02-{registration_id:02d} 10:00:00",
+        "reaction": "NO_REACTION" if reaction_date is None else "LIKE",
+        "reaction_date": reaction_date,
+        "gender": "FEMALE",
+        "date_of_birth": "2000-01-01",
+        "arrival_time": arrival_time,
+        "day_date": "2024-03-01",
+    }
+
+
+def test_watermarks():
+    frame = _typed([
+        _row(1, "2024-03-01 12:00:00", "09:05:07"),
+        _row(2, None, "10:30:00"),
+        _row(3),
+    ])
+
+    assert watermarks(frame) == {
+        "created_since": datetime(2024, 2, 3, 10),
+        "reaction_since": datetime(2024, 3, 1, 12),
+        "arrival_since": "10:30:00",
+    }
+
+
+def test_watermarks_of_an_empty_frame():
+    assert watermarks(_typed([])) == {
+        "created_since": datetime(1970, 1, 1),
+        "reaction_since": datetime(1970, 1, 1),
+        "arrival_since": "00:00:00",
+    }
+
+
+def test_merge_changes_without_changes_returns_the_frame():
+    frame = _typed([_row(1), _row(2, None, "10:30:00")])
+
+    # The marks fetch the last rows again, with the same missing values
+    assert merge_changes(frame, _typed([_row(2, None, "10:30:00")])) is frame
+    assert merge_changes(frame, _typed([])) is frame
+
+
+def test_merge_changes_replaces_and_adds_rows():
+    frame = _typed([_row(1), _row(2)])
+
+    merged = merge_changes(frame, _typed([_row(2, "2024-03-01 11:00:00", "09:00:00"), _row(3)]))
+
+    assert merged["registration_id"].tolist() == [1, 2, 3]
+    changed = merged.set_index("registration_id").loc[2]
+    assert changed["reaction"] == "LIKE"
+    assert changed["arrival_time"] == pd.Timedelta(hours=9)
+    # The categoricals survive the merge
+    assert isinstance(merged["reaction"].dtype, pd.CategoricalDtype)
+    assert len(frame) == 2
+
+
+def test_changes_query_matches_a_full_load(engine):
+    day_date = first_date(engine, 1)
+    params = {"event_id": 1, "day_date": day_date}
+    loaded = analysis.typed(read(engine, queries.REGISTRATIONS, params), day_date)
+
+    # Every row changed since the marks is fetched, the last rows included
+    add_registration(engine, 1, 1, "2030-01-01 00:00:00")
+    changes = analysis.typed(
+        read(engine, queries.REGISTRATIONS_CHANGES, params | watermarks(loaded)), day_date
+    )
+    merged = merge_changes(loaded, changes)
+
+    expected = analysis.typed(read(engine, queries.REGISTRATIONS, params), day_date)
+    assert len(merged) == len(loaded) + 1
+    pd.testing.assert_frame_equal(
+        merged.sort_values("registration_id", ignore_index=True),
+        expected.sort_values("registration_id", ignore_index=True),
+    )
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from dashboard import indexes, synthetic
+from dashboard.indexes import REQUIRED_INDEXES
+from tests.conftest import TODAY
+
+
+@pytest.fixture
+def bare_engine(tmp_path):
+    """A synthetic database without the indexes of the dashboard"""
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'bare.db'}")
+    synthetic.build(engine, synthetic.generate(200, seed=0, today=TODAY), with_indexes=False)
+    yield engine
+    engine.dispose()
+
+
+def test_primary_keys_cover_indexes(bare_engine):
+    with bare_engine.connect() as connection:
+        missing = indexes.missing_indexes(connection)
+
+    # The primary keys of assistant and attendance start with the columns of two of them
+    assert [required.name for required in missing] == [
+        "ix_registration_event_id_companion_id",
+        "ix_attendance_registration_id_event_date_id",
+        "ix_eventdate_event_id_day_date",
+    ]
+
+
+def test_index_with_more_columns_covers(bare_engine):
+    with bare_engine.begin() as connection:
+        connection.execute(text("CREATE INDEX wider ON registration (event_id, companion_id, created_at)"))
+        connection.execute(text("CREATE INDEX reversed ON eventdate (day_date, event_id)"))
+        missing = indexes.missing_indexes(connection)
+
+    tables = [required.table for required in missing]
+    assert "registration" not in tables
+    assert "eventdate" in tables
+
+
+def test_apply_creates_the_missing_indexes(engine, bare_engine):
+    with engine.connect() as connection:
+        assert indexes.missing_indexes(connection) == []
+
+    with bare_engine.connect() as connection:
+        missing = indexes.missing_indexes(connection)
+    indexes.apply(bare_engine, missing)
+    indexes.apply(bare_engine, missing)
+
+    with bare_engine.connect() as connection:
+        assert indexes.missing_indexes(connection) == []
+
+
+def test_migration_can_run_twice(bare_engine):
+    with bare_engine.connect() as connection:
+        migration = indexes.migration(bare_engine, indexes.missing_indexes(connection))
+
+    assert migration.count("CREATE INDEX IF NOT EXISTS") == 3
+    raw = bare_engine.raw_connection()
+    try:
+        raw.executescript(migration)
+        raw.executescript(migration)
+    finally:
+        raw.close()
+
+    with bare_engine.connect() as connection:
+        assert indexes.missing_indexes(connection) == []
+
+
+def test_mysql_migration_checks_information_schema():
+    pytest.importorskip("pymysql")
+    engine = create_engine("mysql+pymysql://user@localhost/registrations")
+
+    migration = indexes.migration(engine, list(REQUIRED_INDEXES[:1]))
+
+    assert "IF NOT EXISTS" not in migration
+    assert "index_name = 'ix_registration_event_id_companion_id'" in migration
+    assert "'CREATE INDEX ix_registration_event_id_companion_id ON registration (event_id, companion_id)'" in migration
+    assert migration.count("PREPARE statement FROM @statement") == 1
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+import numpy as np
+
+from dashboard.membership import MembershipIndex
+from tests.conftest import add_registration, read
+
+ATTENDED = """
+    SELECT DISTINCT ed.event_id, r.companion_id
+    FROM attendance AS att
+    JOIN eventdate AS ed ON ed.id = att.event_date_id
+    JOIN registration AS r ON r.id = att.registration_id
+"""
+
+
+def _people(engine) -> tuple[dict, dict]:
+    registered = read(engine, "SELECT event_id, companion_id FROM registration")
+    attended = read(engine, ATTENDED)
+    return (
+        {event_id: set(rows) for event_id, rows in registered.groupby("event_id")["companion_id"]},
+        {event_id: set(rows) for event_id, rows in attended.groupby("event_id")["companion_id"]},
+    )
+
+
+def test_people_and_overlap(engine):
+    index = MembershipIndex()
+    with engine.connect() as connection:
+        assert index.refresh(connection) > 0
+
+    registered, attended = _people(engine)
+    for event_id in (1, 2, 3):
+        people = index.people(event_id)
+        assert np.all(people[:-1] < people[1:])
+        assert set(people) == registered[event_id]
+        assert set(index.people(event_id, attended=True)) == attended[event_id]
+
+    assert index.overlap(1, 2) == len(registered[1] & registered[2])
+    assert index.overlap(1, 2, attended=True) == len(attended[1] & attended[2])
+    assert len(index.people(10_000)) == 0
+
+
+def test_previous_event_counts(engine):
+    index = MembershipIndex()
+    with engine.connect() as connection:
+        index.refresh(connection)
+
+    registered, _ = _people(engine)
+    counts = index.previous_event_counts(5, [1, 2, 3, 4])
+
+    expected = {person: sum(person in registered[event_id] for event_id in (1, 2, 3, 4)) for person in registered[5]}
+    assert counts.to_dict() == expected
+    # The counts are kept until a refresh loads new rows
+    assert index.previous_event_counts(5, [4, 3, 2, 1]) is counts
+
+
+def test_refresh_loads_the_new_registrations(engine):
+    index = MembershipIndex()
+    with engine.connect() as connection:
+        index.refresh(connection)
+    counts = index.previous_event_counts(5, [1])
+    person = next(person for person in index.people(5) if person not in index.people(1))
+
+    add_registration(engine, 1, int(person), "2030-01-01 00:00:00")
+    with engine.connect() as connection:
+        assert index.refresh(connection) >= 1
+
+    assert person in index.people(1)
+    new_counts = index.previous_event_counts(5, [1])
+    assert new_counts is not counts
+    assert new_counts[person] == 1
+
+
+def test_reset(engine):
+    index = MembershipIndex()
+    with engine.connect() as connection:
+        index.refresh(connection)
+        assert index.is_recent(timedelta(hours=1))
+
+        index.reset()
+        assert not index.is_recent(timedelta(hours=1))
+        assert len(index.people(1)) == 0
+        assert index.refresh(connection) > 0
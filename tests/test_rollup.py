@@ -0,0 +1,46 @@
+import math
+from datetime import timedelta
+
+import pandas as pd
+
+from dashboard import rollup
+from tests.conftest import add_registration
+
+
+def _signatures(rows: dict[int, tuple]) -> pd.DataFrame:
+    return pd.DataFrame.from_dict(
+        rows, orient="index", columns=["registrations", "attendances", "last_reaction"]
+    ).rename_axis("event_id")
+
+
+def test_changed_events():
+    old = _signatures({1: (10, 5, math.nan), 2: (20, 10, 3.0), 3: (5, 0, math.nan)})
+    new = _signatures({1: (10, 5, math.nan), 2: (20, 11, 3.0), 4: (1, 0, math.nan)})
+
+    # A missing value equals a missing value, the new and the deleted events changed
+    assert rollup.changed_events(old, new) == [2, 3, 4]
+    assert rollup.changed_events(old, old.copy()) == []
+
+
+def test_refresh_computes_the_changed_events(engine):
+    totals = rollup.Rollup()
+
+    with engine.connect() as connection:
+        assert totals.refresh(connection) is None
+        pd.testing.assert_frame_equal(totals.frame, rollup.compute(connection))
+        assert totals.refresh(connection) == []
+
+    add_registration(engine, 3, 1, "2030-01-01 00:00:00")
+
+    with engine.connect() as connection:
+        assert totals.refresh(connection) == [3]
+        pd.testing.assert_frame_equal(totals.frame, rollup.compute(connection))
+
+
+def test_refresh_skips_recent_rollups(engine):
+    totals = rollup.Rollup()
+
+    with engine.connect() as connection:
+        totals.refresh(connection)
+        add_registration(engine, 3, 1, "2030-01-01 00:00:00")
+        assert totals.refresh(connection, max_age=timedelta(hours=1)) == []